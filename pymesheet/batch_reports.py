@@ -0,0 +1,280 @@
+"""
+Batch report generation for all Timesheets.
+Renders the weekly report, the report of a month, the time per Task, and the total time of every Timesheet in the
+'timesheets' folder to Markdown or static HTML files, using the same report builders as the menus.  Sheets are rendered
+in parallel over a process pool, and a sheet is only rendered again if its data, its settings, or the reported period
+changed since the last run.  Encrypted Timesheets are included if their passphrase is given in PYMESHEET_PASSPHRASE.
+
+Usage:
+    python batch_reports.py --format html --output reports
+    python batch_reports.py --month 2026-09 --day 2026-09-30
+"""
+import argparse, hashlib, html, json, multiprocessing, os, sys
+from os.path import join as pathjoin
+from string import Template
+import pandas as pd
+import pendulum
+from utilities import encryption, storage
+from utilities.encryption import EncryptedStore, ENCRYPTED_SUFFIX
+from utilities.archive import ARCHIVE_FOLDER, load_archived_totals, load_rollup
+from utilities.task_tree import TaskTree
+from utilities.utils import get_current_week_days
+from utilities.reports import report_weekly, report_total_time, report_time_per_task, report_query
+
+TEMPLATE_VERSION = 1  # bump when the templates change, so that all reports are rendered again
+MANIFEST = ".manifest.json"
+
+TEMPLATES = {
+    "md": {
+        "page": Template("# Timesheet '$name'\n\n_Generated on ${generated}._\n\n$sections"),
+        "section": Template("## $heading\n\n```\n$body\n```\n\n"),
+        "index": Template("# Timesheet reports\n\n_Generated on ${generated}._\n\n$entries\n"),
+        "entry": Template("- [$name]($file)\n"),
+    },
+    "html": {
+        "page": Template("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>Timesheet '$name'</title>\n"
+                         "<style>body { font-family: sans-serif; margin: 2em; } pre { background: #f4f4f4; "
+                         "padding: 1em; }</style>\n</head>\n<body>\n<h1>Timesheet '$name'</h1>\n"
+                         "<p><em>Generated on ${generated}.</em></p>\n$sections</body>\n</html>\n"),
+        "section": Template("<h2>$heading</h2>\n<pre>$body</pre>\n"),
+        "index": Template("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>Timesheet reports</title>"
+                          "\n</head>\n<body>\n<h1>Timesheet reports</h1>\n<p><em>Generated on ${generated}.</em></p>\n"
+                          "<ul>\n$entries</ul>\n</body>\n</html>\n"),
+        "entry": Template("<li><a href=\"$file\">$name</a></li>\n"),
+    },
+}
+
+
+def list_timesheets(path):
+    """
+    :param path: path of the 'timesheets' folder
+    :return: sorted list of the names of all Timesheets, encrypted or not
+    """
+    names = []
+    for entry in os.listdir(path):
+        if entry.endswith(".pkl"):
+            names.append(entry[:-4])
+        elif entry.endswith(ENCRYPTED_SUFFIX) and os.path.isdir(pathjoin(path, entry)):
+            names.append(entry[:-len(ENCRYPTED_SUFFIX)])
+    return sorted(names)
+
+
+def read_settings(config_path, name):
+    """
+    Reads all settings of a Timesheet from its config file
+    :param config_path: path of the config folder
+    :param name: name of Timesheet
+    :return: dictionary of setting to value string
+    """
+    settings = {}
+    try:
+        with open(pathjoin(config_path, "{}-config.data".format(name)), "r") as config:
+            for line in config.readlines():
+                if "=" in line:
+                    key, value = line.rstrip("\n").split("=", 1)
+                    settings[key] = value
+    except FileNotFoundError:
+        pass
+    return settings
+
+
+def load_settings(config_path, name):
+    """
+    Reads the settings of a Timesheet from its config file
+    :param config_path: path of the config folder
+    :param name: name of Timesheet
+    :return: workweek (int or ""), and baseline string
+    """
+    settings = read_settings(config_path, name)
+    workweek = settings.get("workweek", "")
+    return (int(workweek) if workweek != "" else ""), settings.get("baseline", "")
+
+
+def fingerprint(path, config_path, name, fmt, day, month):
+    """
+    Fingerprint of everything a sheet's report depends on.  Files are compared by size and modification time, so
+    nothing has to be read to tell whether a sheet changed.
+    """
+    files = [pathjoin(path, name + ".pkl"), pathjoin(config_path, "{}-config.data".format(name)),
+             pathjoin(path, ARCHIVE_FOLDER, "{}-totals.pkl".format(name)),
+             pathjoin(path, ARCHIVE_FOLDER, "{}-rollup.pkl".format(name))]
+    folder = pathjoin(path, name + ENCRYPTED_SUFFIX)
+    if os.path.isdir(folder):
+        files += [pathjoin(folder, chunk) for chunk in sorted(os.listdir(folder))]
+    stats = []
+    for file in files:
+        try:
+            stat = os.stat(file)
+            stats.append([file, stat.st_size, stat.st_mtime_ns])
+        except FileNotFoundError:
+            stats.append([file, None, None])
+    week = get_current_week_days(pendulum.parse(day))[-1]
+    key = json.dumps([TEMPLATE_VERSION, fmt, week, month, stats])
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def open_store(path, name):
+    """
+    :param path: path of the 'timesheets' folder
+    :param name: name of Timesheet
+    :return: the unlocked EncryptedStore of an encrypted Timesheet, or None if it is not encrypted
+    """
+    if not os.path.isdir(pathjoin(path, name + ENCRYPTED_SUFFIX)):
+        return None
+    passphrase = os.environ.get("PYMESHEET_PASSPHRASE")
+    if passphrase is None or not encryption.available():
+        raise RuntimeError("encrypted, set PYMESHEET_PASSPHRASE to include it")
+    store = EncryptedStore(path, name)
+    store.unlock(passphrase)
+    return store
+
+
+def load_data(path, name, store=None, start=None, end=None):
+    """
+    Loads a Timesheet, encrypted or not
+    :param path: path of the 'timesheets' folder
+    :param name: name of Timesheet
+    :param store: unlocked EncryptedStore of the Timesheet, see open_store; opened here if not given
+    :param start: first day (YYYY-MM-DD) that is needed, or None; only the months of an encrypted Timesheet from the
+                  first to the last day needed are decrypted, an unencrypted one is loaded whole
+    :param end: last day (YYYY-MM-DD) that is needed, or None
+    :return: timesheet dataframe
+    """
+    if store is None:
+        store = open_store(path, name)
+    if store is not None:
+        return store.load(start, end)
+    return storage.load(pathjoin(path, name + ".pkl"))
+
+
+def build_sections(data, name, archived, workweek, baseline, day, month, rollup=None):
+    """
+    Builds the reports of one sheet
+    :param rollup: rolled-up history of the sheet (see utilities.archive.load_rollup), or None
+    :return: list of (heading, lines)
+    """
+    first = pendulum.parse(month + "-01")
+    last = first.add(months=1).subtract(days=1)
+    totals = dict(archived)
+    rolled = rollup["totals"] if rollup is not None else data.iloc[:, :0]
+    for task, seconds in pd.concat([rolled.sum(axis=1), data.sum(axis=1)]).items():
+        totals[task] = totals.get(task, 0) + seconds
+    tree = TaskTree.build(totals.items())
+    per_task = []
+    for task, _ in tree.subtasks(""):
+        per_task += report_time_per_task(tree, task, task in archived and task not in data.index) + [""]
+    monthly = report_query(data, "between {} and {} group by task".format(first.to_date_string(),
+                                                                          last.to_date_string()), rollup)
+    week = get_current_week_days(pendulum.parse(day))[-1]
+    return [("Week of {}".format(week), report_weekly(data, pendulum.parse(day), workweek)),
+            ("{}".format(first.format("MMMM YYYY")), monthly[2:]),  # without the title of the query
+            ("Time per Task", per_task[:-1] if len(per_task) > 0 else ["No Tasks."]),
+            ("Total time", report_total_time(data, sum(archived.values()) + int(rolled.values.sum()), baseline, name,
+                                             rollup["days"] if rollup is not None else 0))]
+
+
+def render(name, sections, fmt, generated):
+    """
+    Renders the reports of one sheet with the templates of the format
+    :return: string
+    """
+    templates = TEMPLATES[fmt]
+    escape = html.escape if fmt == "html" else str
+    body = "".join(templates["section"].substitute(heading=escape(heading),
+                                                   body=escape("\n".join(lines).expandtabs(8).strip("\n")))
+                   for heading, lines in sections)
+    return templates["page"].substitute(name=escape(name), generated=generated, sections=body)
+
+
+def render_sheet(job):
+    """
+    Loads one sheet and writes its report file.  Runs in a worker process.
+    :param job: timesheets path, config path, sheet name, format, day, month, output folder
+    :return: sheet name, and None or an error message
+    """
+    path, config_path, name, fmt, day, month, output = job
+    try:
+        store = open_store(path, name)
+        data = load_data(path, name, store)
+        workweek, baseline = load_settings(config_path, name)
+        sections = build_sections(data, name, load_archived_totals(path, name, store), workweek, baseline, day, month,
+                                  load_rollup(path, name, store))
+        with open(pathjoin(output, "{}.{}".format(name, fmt)), "w") as f:
+            f.write(render(name, sections, fmt, pendulum.now().to_datetime_string()))
+        return name, None
+    except Exception as e:  # one broken sheet should not stop the batch
+        return name, str(e)
+
+
+def generate_reports(path, config_path, output, fmt="md", day=None, month=None, processes=None, force=False):
+    """
+    Renders the reports of all sheets that changed since the last run
+    :param path: path of the 'timesheets' folder
+    :param config_path: path of the config folder
+    :param output: folder to write the reports to
+    :param fmt: 'md' or 'html'
+    :param day: day of the weekly report (YYYY-MM-DD), defaults to today
+    :param month: month of the monthly report (YYYY-MM), defaults to the month of day
+    :param processes: number of worker processes, defaults to the number of CPUs
+    :param force: render all sheets, changed or not
+    :return: lists of rendered sheets, skipped sheets, and (sheet, error) pairs
+    """
+    day = day or pendulum.today().to_date_string()
+    month = month or day[:7]
+    os.makedirs(output, exist_ok=True)
+    try:
+        with open(pathjoin(output, MANIFEST), "r") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+    names = list_timesheets(path)
+    files = {name: "{}.{}".format(name, fmt) for name in names}
+    prints = {name: fingerprint(path, config_path, name, fmt, day, month) for name in names}
+    todo = [name for name in names if force or manifest.get(files[name]) != prints[name] or
+            not os.path.exists(pathjoin(output, files[name]))]
+    jobs = [(path, config_path, name, fmt, day, month, output) for name in todo]
+    if processes == 1 or len(jobs) <= 1:
+        results = [render_sheet(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(render_sheet, jobs)
+    rendered, failed = [], []
+    for name, error in results:
+        if error is None:
+            rendered.append(name)
+            manifest[files[name]] = prints[name]
+        else:
+            failed.append((name, error))
+            manifest.pop(files[name], None)
+    with open(pathjoin(output, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    templates = TEMPLATES[fmt]
+    entries = "".join(templates["entry"].substitute(name=html.escape(name), file=files[name])
+                      for name in names if files[name] in manifest)
+    with open(pathjoin(output, "index.{}".format(fmt)), "w") as f:
+        f.write(templates["index"].substitute(generated=pendulum.now().to_datetime_string(), entries=entries))
+    return rendered, [name for name in names if name not in todo], failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the reports of all Timesheets to Markdown or HTML")
+    parser.add_argument("--format", choices=["md", "html"], default="md")
+    parser.add_argument("--output", default="reports", help="folder to write the reports to")
+    parser.add_argument("--path", default=os.getcwd(), help="folder containing the 'timesheets' folder")
+    parser.add_argument("--config", default=".config", help="config folder")
+    parser.add_argument("--day", help="day of the weekly report (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--month", help="month of the monthly report (YYYY-MM), defaults to the month of --day")
+    parser.add_argument("--processes", type=int, help="number of worker processes, defaults to the number of CPUs")
+    parser.add_argument("--force", action="store_true", help="render all sheets, even if they did not change")
+    args = parser.parse_args(argv)
+
+    rendered, skipped, failed = generate_reports(pathjoin(args.path, "timesheets"), args.config, args.output,
+                                                 args.format, args.day, args.month, args.processes, args.force)
+    print("Rendered {} sheet(s), {} unchanged, to '{}'.".format(len(rendered), len(skipped), args.output))
+    for name, error in failed:
+        print("[ERROR] '{}': {}".format(name, error))
+    return 1 if len(failed) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
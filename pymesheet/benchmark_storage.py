@@ -0,0 +1,88 @@
+"""
+Benchmark of the on-disk formats of Timesheets.
+Compares the size and the save and load times of the plain pickle with the compact format (utilities.storage) under
+each codec, on a synthetic Timesheet or on saved ones.
+
+Usage:
+    python benchmark_storage.py --tasks 200 --days 3650 --density 0.02
+    python benchmark_storage.py --sheet timesheets/work.pkl
+"""
+import argparse, os, sys, tempfile, time
+import numpy as np
+import pandas as pd
+from utilities import storage
+from utilities.layout import SECONDS_DTYPE
+
+FORMATS = ["pickle", "none", "zlib", "lzma"]
+
+
+def synthetic(tasks, days, density, seed=0):
+    """
+    A Timesheet with time logged on the given share of its cells
+    :return: timesheet dataframe
+    """
+    rng = np.random.default_rng(seed)
+    values = (rng.random((tasks, days)) < density) * rng.integers(60, 4 * 3600, (tasks, days))
+    columns = pd.date_range("2020-01-01", periods=days).strftime("%Y-%m-%d").tolist()
+    return pd.DataFrame(values.astype(SECONDS_DTYPE), index=pd.Index(["task{}".format(i) for i in range(tasks)],
+                                                                      dtype=object), columns=columns)
+
+
+def measure(data, fmt, repeat, folder):
+    """
+    :return: size in bytes, and the best save and load times in seconds
+    """
+    path = os.path.join(folder, "benchmark-{}.pkl".format(fmt))
+    saves, loads = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        storage.save(path, data, fmt)
+        saves.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        loaded = storage.load(path)
+        loads.append(time.perf_counter() - start)
+    if not loaded.equals(data):
+        raise AssertionError("'{}' did not load the Timesheet it saved".format(fmt))
+    size = os.path.getsize(path)
+    os.remove(path)
+    return size, min(saves), min(loads)
+
+
+def benchmark(data, repeat=5):
+    """
+    :return: lines with the size and speed of every format
+    """
+    lines = ["{} tasks x {} days, {:.2%} of the cells with time".format(
+        data.shape[0], data.shape[1], (data.to_numpy() != 0).mean() if data.size > 0 else 0.0), ""]
+    lines.append("{:<10}{:>14}{:>10}{:>12}{:>12}".format("Format", "Bytes", "Ratio", "Save (ms)", "Load (ms)"))
+    with tempfile.TemporaryDirectory() as folder:
+        results = {fmt: measure(data, fmt, repeat, folder) for fmt in FORMATS}
+    baseline = results["pickle"][0]
+    for fmt, (size, save, load) in results.items():
+        lines.append("{:<10}{:>14,}{:>9.1f}x{:>12.2f}{:>12.2f}".format(fmt, size, baseline / size, 1000 * save,
+                                                                     1000 * load))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the on-disk formats of Timesheets")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--density", type=float, default=0.02, help="share of the cells with time logged")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per format; the best one is reported")
+    parser.add_argument("--sheet", action="append", help="benchmark a saved Timesheet instead (repeatable)")
+    args = parser.parse_args(argv)
+
+    sheets = [(path, storage.load(path)) for path in args.sheet] if args.sheet else \
+        [("synthetic", synthetic(args.tasks, args.days, args.density))]
+    for i, (name, data) in enumerate(sheets):
+        if i > 0:
+            print("")
+        print(name)
+        for line in benchmark(data, args.repeat):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""
+Integrity checker for Timesheets, their backups, configs, and state files.
+Every Timesheet and backup is loaded and checked in parallel over a process pool: that it loads, that its tasks and
+days are unique and its days are dates, that no time is negative or more than a day, and that it uses the compact
+layout.  Checksums and modification times of clean files are kept in '.fsck.json' in the 'timesheets' folder, so files
+that did not change since the last run are skipped; with --full, every file is read again and a file whose content
+changed while its size and modification time did not is reported as corrupt.  Configs and state files are checked for
+missing settings, unreadable values, and Timesheets that no longer exist, and backups for being older than their
+Timesheet.
+
+With --repair, the safe repairs are made: unreadable or orphaned state files are deleted, orphaned configs are moved to
+'.config/orphaned', missing config settings are added, Timesheets are converted to the compact layout (the original is
+kept as '<file>.orig'), and stale or broken backups are refreshed from their Timesheet.  Negative time is only
+reported, since only the user can tell what it should have been.
+
+Usage:
+    python fsck.py
+    python fsck.py --full --repair --processes 8
+"""
+import argparse, functools, hashlib, json, multiprocessing, os, shutil, sys, time
+from os.path import join as pathjoin
+import numpy as np
+import pandas as pd
+from utilities import encryption, storage
+from utilities.encryption import EncryptedStore, ENCRYPTED_SUFFIX
+from utilities.duration import Duration
+from utilities.layout import compact, is_compact
+from utilities.registry import TaskRegistry
+
+CACHE = ".fsck.json"
+BACKUP_FOLDER = ".backup"
+SECONDS_PER_DAY = 24 * 60 * 60
+REQUIRED_SETTINGS = ["workweek", "baseline"]
+
+
+def _fingerprint(path):
+    """
+    :return: size and modification time of a file, or of all files of an encrypted folder
+    """
+    if os.path.isdir(path):
+        stats = [os.stat(pathjoin(path, entry)) for entry in sorted(os.listdir(path))]
+        return sum(stat.st_size for stat in stats), max([stat.st_mtime_ns for stat in stats] + [0])
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _read(path):
+    """
+    :return: checksum of a file, or of all files of an encrypted folder, and the content of a file
+    """
+    digest, payload = hashlib.sha256(), b""
+    files = [pathjoin(path, entry) for entry in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for file in files:
+        with open(file, "rb") as f:
+            payload = f.read()
+        digest.update(payload)
+    return digest.hexdigest(), payload
+
+
+@functools.lru_cache(maxsize=None)
+def _registry(folder):
+    """
+    :return: task registry of a folder of Timesheets, read once per process
+    """
+    return TaskRegistry(folder)
+
+
+def list_sheet_files(path):
+    """
+    :param path: path of the 'timesheets' folder
+    :return: list of (name, kind, file) of all Timesheets and backups; kind is 'sheet' or 'backup'
+    """
+    files = []
+    for kind, folder in [("sheet", path), ("backup", pathjoin(path, BACKUP_FOLDER))]:
+        if not os.path.isdir(folder):
+            continue
+        for entry in sorted(os.listdir(folder)):
+            if entry.endswith(".pkl"):
+                files.append((entry[:-4], kind, pathjoin(folder, entry)))
+            elif entry.endswith(ENCRYPTED_SUFFIX) and os.path.isdir(pathjoin(folder, entry)):
+                files.append((entry[:-len(ENCRYPTED_SUFFIX)], kind, pathjoin(folder, entry)))
+    return files
+
+
+################ Checks ################
+
+def check_data(data):
+    """
+    Checks the content of a Timesheet
+    :param data: timesheet dataframe
+    :return: list of (level, message, repair); repair is None or the name of a safe repair
+    """
+    problems = []
+    if not data.index.is_unique:
+        duplicates = data.index[data.index.duplicated()]
+        problems.append(("error", "duplicate tasks: {}".format(", ".join(map(str, duplicates))), None))
+    days = pd.Index(data.columns.astype(str))
+    if not days.is_unique:
+        problems.append(("error", "duplicate days: {}".format(", ".join(days[days.duplicated()])), None))
+    invalid = pd.to_datetime(days, format="%Y-%m-%d", errors="coerce").isna()
+    if invalid.any():
+        problems.append(("error", "columns that are not days: {}".format(", ".join(days[invalid])), None))
+    values = data.to_numpy(dtype=np.float64)
+    if np.isnan(values).any():
+        problems.append(("warning", "{} missing cells".format(int(np.isnan(values).sum())), "compact"))
+        values = np.nan_to_num(values)
+    elif not is_compact(data):
+        problems.append(("warning", "not in the compact layout ({})".format(
+            ", ".join(sorted(set(str(dtype) for dtype in data.dtypes)))), "compact"))
+    negative = values < 0
+    if negative.any():
+        tasks = data.index[negative.any(axis=1)]
+        problems.append(("error", "negative time in {} cell(s), of {}".format(
+            int(negative.sum()), ", ".join(map(str, tasks))), None))
+    long = values.sum(axis=0) > SECONDS_PER_DAY
+    if long.any():
+        problems.append(("warning", "more than 24 hours logged on {}".format(", ".join(days[long])), None))
+    return problems
+
+
+def check_file(job):
+    """
+    Loads and checks one Timesheet or backup.  Runs in a worker process.
+    :param job: name, kind, file, and the cache entry of the last clean check or None
+    :return: dictionary with the file, its fingerprint and checksum, and its problems
+    """
+    name, kind, file, previous = job
+    result = {"name": name, "kind": kind, "file": file, "problems": []}
+    try:
+        result["size"], result["mtime"] = _fingerprint(file)
+        result["checksum"], payload = _read(file)
+        if previous is not None and [result["size"], result["mtime"]] == previous[:2] and \
+                result["checksum"] != previous[2]:
+            result["problems"].append(("error", "content changed without its modification time changing", None))
+        if os.path.isdir(file):
+            passphrase = os.environ.get("PYMESHEET_PASSPHRASE")
+            if passphrase is None or not encryption.available():
+                result["problems"].append(("notice", "encrypted; set PYMESHEET_PASSPHRASE to check its content",
+                                           None))
+                return result
+            store = EncryptedStore(os.path.dirname(file), name)
+            store.unlock(passphrase)
+            data = store.load()
+        else:
+            data = storage.loads(payload, _registry(os.path.dirname(file)))
+        if not isinstance(data, pd.DataFrame):
+            raise ValueError("not a Timesheet")
+    except Exception as e:  # anything that keeps the file from loading is a finding, not a crash
+        result["problems"].append(("error", "does not load: {}".format(e), "refresh_backup" if kind == "backup"
+                                   else None))
+        return result
+    result["problems"] += check_data(data)
+    return result
+
+
+def check_configs(config_path, sheets):
+    """
+    :param config_path: path of the config folder
+    :param sheets: names of the existing Timesheets
+    :return: list of (file, level, message, repair)
+    """
+    findings = []
+    try:
+        with open(pathjoin(config_path, "config.data"), "r") as config:
+            settings = dict(line.rstrip("\n").split("=", 1) for line in config if "=" in line)
+        if settings.get("default_timesheet", "") not in [""] + sheets:
+            findings.append((pathjoin(config_path, "config.data"), "warning", "the default Timesheet '{}' does not "
+                             "exist".format(settings["default_timesheet"]), None))
+    except FileNotFoundError:
+        pass
+    if not os.path.isdir(config_path):
+        return findings
+    for entry in sorted(os.listdir(config_path)):
+        if not entry.endswith("-config.data"):
+            continue
+        file = pathjoin(config_path, entry)
+        if entry[:-len("-config.data")] not in sheets:
+            findings.append((file, "warning", "config of a Timesheet that does not exist", "move_config"))
+            continue
+        with open(file, "r") as config:
+            settings = dict(line.rstrip("\n").split("=", 1) for line in config if "=" in line)
+        missing = [key for key in REQUIRED_SETTINGS if key not in settings]
+        if len(missing) > 0:
+            findings.append((file, "error", "missing settings: {}".format(", ".join(missing)), "fix_config"))
+        if settings.get("workweek", "") != "" and not settings["workweek"].isdigit():
+            findings.append((file, "error", "invalid workweek '{}'".format(settings["workweek"]), None))
+        if settings.get("baseline", "") != "":
+            try:
+                Duration.parse(settings["baseline"])
+            except (ValueError, IndexError):
+                findings.append((file, "error", "invalid baseline '{}'".format(settings["baseline"]), None))
+    return findings
+
+
+def check_states(state_path, sheets, now):
+    """
+    :param state_path: folder of the state files
+    :param sheets: names of the existing Timesheets
+    :param now: current timestamp
+    :return: list of (file, level, message, repair)
+    """
+    findings = []
+    for entry in sorted(os.listdir(state_path)):
+        if not entry.startswith(".state-"):
+            continue
+        file = pathjoin(state_path, entry)
+        workday = entry.endswith("-workday")
+        name = entry[len(".state-"):-len("-workday")] if workday else entry[len(".state-"):]
+        if name not in sheets:
+            findings.append((file, "warning", "state of a Timesheet that does not exist", "delete_state"))
+            continue
+        try:
+            with open(file, "r") as state:
+                parts = state.read().rsplit("=", 1)
+            start = float(parts[0] if workday else parts[1])
+            if workday:
+                float(parts[1])
+        except (ValueError, IndexError):
+            findings.append((file, "error", "unreadable state", "delete_state"))
+            continue
+        if start > now:
+            findings.append((file, "warning", "started in the future", None))
+        elif now - start > 7 * SECONDS_PER_DAY:
+            findings.append((file, "warning", "{} has been running for {} days".format(
+                "workday" if workday else "timer", int((now - start) // SECONDS_PER_DAY)), None))
+    return findings
+
+
+def check_backups(results, max_age):
+    """
+    :param results: results of check_file
+    :param max_age: days a backup may be older than its Timesheet
+    :return: list of (file, level, message, repair)
+    """
+    sheets = {result["name"]: result for result in results if result["kind"] == "sheet"}
+    findings = []
+    for result in results:
+        sheet = sheets.get(result["name"])
+        if result["kind"] != "backup" or sheet is None or "mtime" not in result or "mtime" not in sheet:
+            continue
+        age = (sheet["mtime"] - result["mtime"]) / 1e9 / SECONDS_PER_DAY
+        if age > max_age:
+            findings.append((result["file"], "warning", "{:.0f} days older than its Timesheet".format(age),
+                             "refresh_backup"))
+    return findings
+
+
+################ Repairs ################
+
+def repair(file, action, path):
+    """
+    Makes a safe repair
+    :param file: file with the problem
+    :param action: name of the repair
+    :param path: path of the 'timesheets' folder
+    :return: description of what was done
+    """
+    if action == "delete_state":
+        os.remove(file)
+        return "deleted"
+    elif action == "move_config":
+        folder = pathjoin(os.path.dirname(file), "orphaned")
+        os.makedirs(folder, exist_ok=True)
+        shutil.move(file, pathjoin(folder, os.path.basename(file)))
+        return "moved to {}".format(folder)
+    elif action == "fix_config":
+        with open(file, "r") as config:
+            lines = [line.rstrip("\n") for line in config]
+        keys = [line.split("=")[0] for line in lines]
+        lines += ["{}=".format(key) for key in REQUIRED_SETTINGS if key not in keys]
+        with open(file, "w") as config:
+            config.write("\n".join(lines))
+        return "added the missing settings, empty"
+    elif action == "compact":
+        shutil.copy2(file, file + ".orig")
+        registry = TaskRegistry(os.path.dirname(file))
+        storage.save(file, compact(storage.load(file, registry)), registry=registry)
+        return "converted to the compact layout, original kept as {}".format(file + ".orig")
+    elif action == "refresh_backup":
+        name = os.path.basename(file)
+        source = pathjoin(path, name)
+        if not os.path.exists(source):
+            return "not repaired, its Timesheet is missing"
+        if os.path.isdir(source):
+            shutil.copytree(source, file, dirs_exist_ok=True)
+        else:  # saved again rather than copied, since the ids of its Tasks are those of the registry of its folder
+            storage.save(file, storage.load(source), registry=TaskRegistry(os.path.dirname(file)))
+        return "refreshed from its Timesheet"
+    raise ValueError("Unknown repair '{}'".format(action))
+
+
+################ Run ################
+
+def fsck(path, config_path, state_path, processes=None, full=False, repairs=False, max_age=7):
+    """
+    Checks all Timesheets, backups, configs, and state files
+    :param path: path of the 'timesheets' folder
+    :param config_path: path of the config folder
+    :param state_path: folder of the state files
+    :param processes: number of worker processes, defaults to the number of CPUs
+    :param full: check all files, also those that did not change since the last run
+    :param repairs: make the safe repairs
+    :param max_age: days a backup may be older than its Timesheet
+    :return: list of findings (file, level, message, repair, outcome), and statistics
+    """
+    started = time.perf_counter()
+    try:
+        with open(pathjoin(path, CACHE), "r") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+    files = list_sheet_files(path)
+    jobs, results = [], []
+    for name, kind, file in files:
+        previous = cache.get(file)
+        if not full and previous is not None and list(_fingerprint(file)) == previous[:2]:
+            results.append({"name": name, "kind": kind, "file": file, "size": previous[0], "mtime": previous[1],
+                            "checksum": previous[2], "problems": [], "skipped": True})
+        else:
+            jobs.append((name, kind, file, previous))
+    if processes == 1 or len(jobs) <= 1:
+        results += [check_file(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results += pool.map(check_file, jobs, chunksize=max(1, len(jobs) // (4 * (processes or os.cpu_count()))))
+
+    sheets = sorted(set(name for name, kind, _ in files if kind == "sheet"))
+    findings = [(result["file"], level, message, action) for result in results
+                for level, message, action in result["problems"]]
+    findings += check_backups(results, max_age)
+    findings += check_configs(config_path, sheets)
+    findings += check_states(state_path, sheets, time.time())
+
+    outcomes = {}
+    if repairs:
+        for file, level, message, action in findings:
+            if action is not None and (file, action) not in outcomes:
+                try:
+                    outcomes[(file, action)] = repair(file, action, path)
+                except OSError as e:
+                    outcomes[(file, action)] = "repair failed: {}".format(e)
+    repaired = set(file for file, action in outcomes)
+    for result in results:  # only files found clean, and not changed by a repair, are skipped next time
+        clean = all(level == "notice" for level, _, _ in result["problems"])
+        if clean and "checksum" in result and result["file"] not in repaired:
+            cache[result["file"]] = [result["size"], result["mtime"], result["checksum"]]
+        else:
+            cache.pop(result["file"], None)
+    for file in list(cache):
+        if not os.path.exists(file):
+            del cache[file]
+    if os.path.isdir(path):
+        with open(pathjoin(path, CACHE), "w") as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    stats = {"files": len(files), "checked": len(jobs), "skipped": len(files) - len(jobs),
+             "seconds": time.perf_counter() - started}
+    return [(file, level, message, action, outcomes.get((file, action))) for file, level, message, action in
+            findings], stats
+
+
+def report(findings, stats):
+    """
+    :return: lines of the report
+    """
+    counts = {level: sum(1 for finding in findings if finding[1] == level) for level in ["error", "warning"]}
+    lines = ["Checked {} of {} Timesheets and backups ({} unchanged) in {:.2f} s: {} error(s), {} warning(s).".format(
+        stats["checked"], stats["files"], stats["skipped"], stats["seconds"], counts["error"], counts["warning"])]
+    if len(findings) > 0:
+        lines.append("")
+    for file, level, message, action, outcome in sorted(findings, key=lambda finding: (finding[0], finding[1])):
+        line = "[{}] {}: {}".format(level.upper(), file, message)
+        if outcome is not None:
+            line += " -> {}".format(outcome)
+        elif action is not None:
+            line += " (repairable with --repair)"
+        lines.append(line)
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check Timesheets, backups, configs, and state files")
+    parser.add_argument("--path", default=os.getcwd(), help="folder containing the 'timesheets' folder")
+    parser.add_argument("--config", default=".config", help="config folder")
+    parser.add_argument("--state", default=".", help="folder of the state files")
+    parser.add_argument("--processes", type=int, help="number of worker processes, defaults to the number of CPUs")
+    parser.add_argument("--full", action="store_true", help="also check files that did not change since the last run")
+    parser.add_argument("--repair", action="store_true", help="make the safe repairs")
+    parser.add_argument("--backup-age", type=float, default=7, help="days a backup may be older than its Timesheet")
+    args = parser.parse_args(argv)
+
+    findings, stats = fsck(pathjoin(args.path, "timesheets"), args.config, args.state, args.processes, args.full,
+                           args.repair, args.backup_age)
+    for line in report(findings, stats):
+        print(line)
+    return 1 if any(level == "error" and outcome is None for _, level, _, _, outcome in findings) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Invoices of all Timesheets.
+Bills the time of every Timesheet in the 'timesheets' folder for a month or a range of days, with the hourly rates and
+the billing rounding set in each Timesheet's config, and writes one invoice per client (the top of the Task paths,
+e.g. 'client' of 'client/project').  All sheets are billed together in one vectorized pass, see utilities.invoicing.
+Encrypted Timesheets are included if their passphrase is given in PYMESHEET_PASSPHRASE.
+
+Usage:
+    python invoices.py --month 2026-09 --output invoices
+    python invoices.py --start 2026-09-01 --end 2026-09-15 --csv items.csv
+"""
+import argparse, os, re, sys
+from os.path import join as pathjoin
+import pendulum
+from batch_reports import list_timesheets, read_settings, load_data, open_store
+from utilities.archive import load_rollup
+from utilities.invoicing import invoice
+from utilities.reports import report_invoice
+from utilities.sync import Journal
+
+
+def load_sheets(path, config_path, start, end=None):
+    """
+    Loads every Timesheet with its settings, and its journal if it is rounded per entry.  Of encrypted Timesheets,
+    only the months of the billed days are decrypted.
+    :param path: path of the 'timesheets' folder
+    :param config_path: path of the config folder
+    :param start: first billed day, to warn about days that are only kept as totals
+    :param end: last billed day, or None
+    :return: list of sheets as taken by utilities.invoicing.invoice, and list of (sheet, problem)
+    """
+    sheets, problems = [], []
+    for name in list_timesheets(path):
+        settings = read_settings(config_path, name)
+        if settings.get("rate", "") == "" and settings.get("rates", "") == "":
+            continue  # nothing to bill
+        try:
+            store = open_store(path, name)
+            data = load_data(path, name, store, start, end)
+        except Exception as e:  # one broken sheet should not stop the others from being billed
+            problems.append((name, str(e)))
+            continue
+        cutoff = load_rollup(path, name, store)["cutoff"]
+        if start < cutoff:
+            problems.append((name, "the days before {} are only kept as totals and are not billed".format(cutoff)))
+        per_entry = settings.get("rounding", "").startswith("entry")
+        entries = Journal(path, name, None, store).intervals() if per_entry else None
+        sheets.append((name, data, settings, entries))
+    return sheets, problems
+
+
+def _file_name(client):
+    return re.sub(r"[^\w.-]+", "_", client) or "_"
+
+
+def write_invoices(items, start, end, output):
+    """
+    Writes a Markdown invoice per client
+    :return: list of the written files
+    """
+    os.makedirs(output, exist_ok=True)
+    files = []
+    for client, group in items.groupby("client", sort=False):
+        file = pathjoin(output, "{}-{}-{}.md".format(_file_name(client), start, end))
+        with open(file, "w") as f:
+            f.write("# Invoice for '{}'\n\n```\n{}\n```\n".format(client, "\n".join(
+                report_invoice(group, start, end)).expandtabs(8).strip("\n")))
+        files.append(file)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bill the time of all Timesheets per client")
+    parser.add_argument("--path", default=os.getcwd(), help="folder containing the 'timesheets' folder")
+    parser.add_argument("--config", default=".config", help="config folder")
+    parser.add_argument("--month", help="month to bill (YYYY-MM), defaults to the last month")
+    parser.add_argument("--start", help="first day to bill (YYYY-MM-DD), instead of a month")
+    parser.add_argument("--end", help="last day to bill (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--output", help="folder to write one invoice per client to; otherwise they are printed")
+    parser.add_argument("--csv", help="also write all billed Tasks to this CSV file")
+    args = parser.parse_args(argv)
+
+    if args.start is not None:
+        start, end = args.start, args.end or pendulum.today().to_date_string()
+    else:
+        first = pendulum.parse(args.month + "-01") if args.month else pendulum.today().start_of("month").subtract(
+            months=1)
+        start, end = first.to_date_string(), first.end_of("month").to_date_string()
+    path = pathjoin(args.path, "timesheets")
+    sheets, problems = load_sheets(path, args.config, start, end)
+    try:
+        items = invoice(sheets, start, end)
+    except ValueError as e:
+        print("[ERROR] {}".format(e))
+        return 1
+    if args.output is not None:
+        files = write_invoices(items, start, end, args.output)
+        print("Wrote {} invoice(s) for {} to {} to '{}'.".format(len(files), start, end, args.output))
+    else:
+        for line in report_invoice(items, start, end):
+            print(line)
+    if args.csv is not None:
+        items.assign(hours=items["billable"] / 3600).to_csv(args.csv, index=False)
+    for name, problem in problems:
+        print("[WARNING] '{}': {}".format(name, problem))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
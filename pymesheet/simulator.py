@@ -0,0 +1,299 @@
+"""
+Deterministic workload simulator for scale and soak testing.
+Generates a seeded synthetic workload (users logging time on their tasks over years of workdays, with workdays and
+reports in between) and drives headless TimesheetManagers with it, on a simulated clock so that years run in
+seconds.  Every user gets an own working folder, and users can be spread over several processes.  The workload can be
+recorded to a trace file and replayed later, e.g. before and after a storage change.  At the end, the throughput and
+the latency of every operation are reported, and the time in each Timesheet is checked against the workload.
+
+Usage:
+    python simulator.py --users 4 --tasks 40 --days 730 --processes 4 --record trace.jsonl
+    python simulator.py --replay trace.jsonl
+"""
+import argparse, contextlib, json, multiprocessing, os, random, shutil, sys, tempfile, time
+from collections import defaultdict
+import numpy as np
+import pendulum
+from timesheet_manager import TimesheetManager
+
+TRACE_VERSION = 1
+REPORTS = ["time_per_task", "time_per_day", "total_time", "weekly_report", "query", "trends", "overlaps"]
+
+
+class SimulatedClock:
+    """
+    Clock for TimesheetManager that only moves when told to
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+################ Workload ################
+
+def generate(users, tasks, days, seed, start="2020-01-06", report_rate=0.2):
+    """
+    Generates a workload.  The same arguments always give the same workload.
+    :param users: number of users, each with an own Timesheet
+    :param tasks: number of tasks per user
+    :param days: number of calendar days; weekends are skipped
+    :param seed: random seed
+    :param start: first day (YYYY-MM-DD)
+    :param report_rate: chance of a report after each logged interval
+    :return: list of events
+    """
+    rng = random.Random(seed)
+    first = pendulum.parse(start)
+    events = []
+    for user in range(users):
+        name = "user{:03d}".format(user)
+        names = ["project{}/task{}".format(i % 5, i) for i in range(tasks)]
+        events.append({"user": name, "op": "add_tasks", "tasks": names})
+        for d in range(days):
+            day = first.add(days=d)
+            if day.isoweekday() > 5:
+                continue
+            events.append({"user": name, "op": "day", "day": day.to_date_string()})
+            now = int(day.add(hours=rng.randint(7, 10)).timestamp())
+            workday = rng.random() < 0.8
+            if workday:
+                events.append({"user": name, "op": "start_workday", "at": now})
+            for _ in range(rng.randint(1, 6)):
+                now += rng.randint(0, 1800)
+                seconds = rng.randint(300, 7200)
+                events.append({"user": name, "op": "log", "task": rng.choice(names), "at": now, "seconds": seconds})
+                now += seconds
+                if rng.random() < report_rate:
+                    report = rng.choice(REPORTS)
+                    if report == "time_per_task":
+                        args = [rng.choice(names + ["project{}".format(rng.randrange(5))])]
+                    elif report == "time_per_day":
+                        args = [day.subtract(days=rng.randrange(30)).to_date_string()]
+                    elif report == "query":
+                        args = ["since {} group by task, week".format(day.subtract(days=90).to_date_string())]
+                    else:
+                        args = []
+                    events.append({"user": name, "op": "report", "report": report, "args": args})
+            if workday:
+                now += rng.randint(0, 3600)
+                events.append({"user": name, "op": "end_workday", "at": now})
+    return events
+
+
+def expected_totals(events):
+    """
+    Computes the time each task should have from the events of one user, independently of TimesheetManager
+    :param events: events of one user
+    :return: dictionary of task name to seconds
+    """
+    totals = defaultdict(int)
+    working, allocated = None, 0
+    for event in events:
+        if event["op"] == "add_tasks":
+            for task in event["tasks"]:
+                totals[task] += 0
+        elif event["op"] == "start_workday":
+            working, allocated = event["at"], 0
+        elif event["op"] == "log":
+            totals[event["task"]] += event["seconds"]
+            if working is not None and event["task"] != "General":
+                allocated += event["seconds"]
+        elif event["op"] == "end_workday":
+            if event["at"] - working - allocated >= 0:
+                totals["General"] += event["at"] - working - allocated
+            working = None
+    return dict(totals)
+
+
+def record(events, path, **parameters):
+    """
+    Writes a trace file: a header with the parameters of the workload, then one event per line
+    """
+    with open(path, "w") as f:
+        f.write(json.dumps({"version": TRACE_VERSION, "parameters": parameters}) + "\n")
+        for event in events:
+            f.write(json.dumps(event, sort_keys=True) + "\n")
+
+
+def replay(path):
+    """
+    Reads a trace file
+    :return: list of events
+    """
+    with open(path, "r") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != TRACE_VERSION:
+            raise ValueError("Unsupported trace version {}".format(header.get("version")))
+        return [json.loads(line) for line in f if line.strip() != ""]
+
+
+################ Execution ################
+
+def _apply(manager, clock, event):
+    op = event["op"]
+    if op == "add_tasks":
+        manager.add_task(event["tasks"], suppress=True)
+    elif op == "day":
+        clock.now = pendulum.parse(event["day"], tz=manager.calendar.tz).int_timestamp
+    elif op == "start_workday":
+        clock.now = event["at"]
+        manager.start_workday()
+    elif op == "log":
+        clock.now = event["at"]
+        manager.UI.timer = lambda task: setattr(clock, "now", clock.now + event["seconds"])
+        manager.start_task(event["task"])
+    elif op == "end_workday":
+        clock.now = event["at"]
+        manager.add_workday()
+    elif op == "report":
+        getattr(manager, event["report"])(*event["args"])
+    else:
+        raise ValueError("Unknown operation '{}'".format(op))
+
+
+def check(manager, events):
+    """
+    Checks that the time in a Timesheet, its roll-up totals, its trends, its journal, its logged intervals, and its
+    saved copy all agree with the workload
+    :return: list of errors
+    """
+    errors = []
+    totals = manager.data.sum(axis=1)
+    for task, seconds in expected_totals(events).items():
+        if int(totals.get(task, -1)) != seconds:
+            errors.append("{}: '{}' has {} seconds, expected {}".format(manager.name, task, totals.get(task), seconds))
+        elif manager.tree.total(task) != seconds:
+            errors.append("{}: roll-up of '{}' is {}, expected {}".format(
+                manager.name, task, manager.tree.total(task), seconds))
+    total = int(totals.sum())
+    if manager.analytics.total() != total:
+        errors.append("{}: trends total {}, expected {}".format(manager.name, manager.analytics.total(), total))
+    journal = sum(entry["seconds"] for entry in manager.journal.intervals())
+    if journal != total:
+        errors.append("{}: journal total {}, expected {}".format(manager.name, journal, total))
+    derived = manager.interval_index().to_timesheet()
+    if not derived.equals(manager.data.loc[derived.index, derived.columns]):
+        errors.append("{}: the per-day totals of the logged intervals differ from the Timesheet".format(manager.name))
+    saved = manager.load_timesheet(manager.name, only_data=True)
+    if not saved.equals(manager.data):
+        errors.append("{}: the saved Timesheet differs from the one in memory".format(manager.name))
+    return errors
+
+
+def run_user(job):
+    """
+    Runs the events of one user in an own working folder
+    :param job: user name, list of events, working folder
+    :return: dictionary with the latencies per operation, the wall time, and the errors found
+    """
+    name, events, workdir = job
+    path = os.path.join(workdir, name)
+    os.makedirs(path, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(path)  # the config and state files are kept in the working folder
+    if not os.path.exists(os.path.join(".config", "config.data")):  # days are UTC days, as in the workload
+        os.makedirs(".config", exist_ok=True)
+        with open(os.path.join(".config", "config.data"), "w") as config:
+            config.write("default_timesheet=\ntz=UTC")
+    latencies = defaultdict(list)
+    started = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            clock = SimulatedClock()
+            manager = TimesheetManager(name, path=path, headless=True, clock=clock)
+            for event in events:
+                operation = event["report"] if event["op"] == "report" else event["op"]
+                start = time.perf_counter()
+                _apply(manager, clock, event)
+                latencies[operation].append(time.perf_counter() - start)
+            errors = check(manager, events)
+    finally:
+        os.chdir(cwd)
+    return {"user": name, "latencies": dict(latencies), "seconds": time.perf_counter() - started, "errors": errors}
+
+
+def simulate(events, workdir, processes=1):
+    """
+    Runs a workload
+    :param events: list of events
+    :param workdir: folder for the working folders of the users
+    :param processes: number of processes to spread the users over
+    :return: list of results of run_user, and the wall time in seconds
+    """
+    by_user = defaultdict(list)
+    for event in events:
+        by_user[event["user"]].append(event)
+    jobs = [(user, user_events, workdir) for user, user_events in by_user.items()]
+    started = time.perf_counter()
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(run_user, jobs)
+    else:
+        results = [run_user(job) for job in jobs]
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    """
+    :return: lines with the throughput, the latency percentiles of every operation, and the errors
+    """
+    latencies = defaultdict(list)
+    for result in results:
+        for operation, values in result["latencies"].items():
+            latencies[operation] += values
+    count = sum(len(values) for values in latencies.values())
+    lines = ["{} operations of {} user(s) in {:.2f} s: {:.1f} operations/s".format(
+        count, len(results), elapsed, count / elapsed if elapsed > 0 else 0.0), ""]
+    lines.append("{:<16}{:>8}{:>11}{:>11}{:>11}{:>11}".format("Operation", "Count", "p50 (ms)", "p95 (ms)",
+                                                              "p99 (ms)", "Max (ms)"))
+    for operation, values in sorted(latencies.items()):
+        p50, p95, p99 = 1000 * np.percentile(values, [50, 95, 99])
+        lines.append("{:<16}{:>8}{:>11.2f}{:>11.2f}{:>11.2f}{:>11.2f}".format(
+            operation, len(values), p50, p95, p99, 1000 * max(values)))
+    errors = [error for result in results for error in result["errors"]]
+    lines.append("")
+    if len(errors) == 0:
+        lines.append("Consistency check passed: all totals match the workload.")
+    else:
+        lines.append("Consistency check FAILED:")
+        lines += ["\t" + error for error in errors]
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic workload simulator for Pymesheet")
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default="2020-01-06", help="first day of the workload (YYYY-MM-DD)")
+    parser.add_argument("--report-rate", type=float, default=0.2)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--record", help="write the workload to this trace file")
+    parser.add_argument("--replay", help="run the workload of this trace file instead of generating one")
+    parser.add_argument("--workdir", help="keep the Timesheets in this folder instead of a temporary one")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        events = replay(args.replay)
+    else:
+        events = generate(args.users, args.tasks, args.days, args.seed, args.start, args.report_rate)
+    if args.record:
+        record(events, args.record, users=args.users, tasks=args.tasks, days=args.days, seed=args.seed,
+               start=args.start, report_rate=args.report_rate)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="pymesheet-sim-")
+    try:
+        results, elapsed = simulate(events, os.path.abspath(workdir), args.processes)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    for line in summarize(results, elapsed):
+        print(line)
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+import os, sys
+
+# the modules of the package import each other relative to the package folder, as when running timesheet_manager.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from utilities.analytics import Analytics
+from utilities.reports import report_trends
+
+# 2026-01-05 is a Monday
+DATA = pd.DataFrame({"2026-01-05": [3600, 0], "2026-01-07": [0, 7200], "2026-01-12": [1800, 1800]}, index=["a", "b"])
+
+
+def test_from_data_fills_calendar_days():
+    analytics = Analytics.from_data(DATA, pd.DataFrame())
+    assert len(analytics) == 8
+    assert analytics.daily.tolist() == [3600, 0, 7200, 0, 0, 0, 0, 3600]
+    assert analytics.total() == int(DATA.values.sum())
+
+
+def test_record_matches_rebuild():
+    analytics = Analytics.from_data(DATA)
+    analytics.record("2026-01-14", 600)
+    analytics.record("2026-01-06", 60)
+    analytics.record("2026-01-01", 30)
+    rebuilt = Analytics.from_data(DATA, pd.DataFrame({"2026-01-14": [600], "2026-01-06": [60], "2026-01-01": [30]}))
+    assert analytics.start == rebuilt.start
+    assert analytics.daily.tolist() == rebuilt.daily.tolist()
+    assert analytics.cumulative.tolist() == np.cumsum(rebuilt.daily).tolist()
+    empty = Analytics()
+    empty.record("2026-01-05", 10)
+    empty.record("2026-01-06", 5)
+    assert empty.cumulative.tolist() == [10, 15]
+
+
+def test_weekday_distribution_and_balance():
+    analytics = Analytics.from_data(DATA)
+    totals, averages = analytics.weekday_distribution()
+    assert totals.tolist() == [7200, 0, 7200, 0, 0, 0, 0]
+    assert averages[0] == 3600
+    # 40 hour workweek: 8 hours expected on each of the 6 weekdays
+    assert analytics.balance(40)[-1] == 14400 - 6 * 8 * 3600
+
+
+def test_rolling_and_forecast():
+    analytics = Analytics.from_data(DATA)
+    assert analytics.rolling_weekly(1)[6] == 10800
+    worked, projected = analytics.forecast("2026-01-13", weeks=1)
+    assert worked == 3600
+    assert projected == 3600 + 7200  # the Wednesday of the week before
+    assert report_trends(analytics, "2026-01-13", 40)[0] == "Trends"
+
+
+def test_rolled_up_history_stays_out_of_the_days():
+    # two rolled-up weeks before the first kept day, 2026-01-05
+    rolled = pd.DataFrame({"2025-12-22": [36000], "2025-12-29": [18000]}, index=["a"])
+    analytics = Analytics.from_data(DATA, rolled=rolled)
+    plain = Analytics.from_data(DATA)
+    assert analytics.daily.tolist() == plain.daily.tolist()
+    assert analytics.weekday_distribution()[0].tolist() == plain.weekday_distribution()[0].tolist()
+    assert analytics.rolling_weekly(1).tolist() == plain.rolling_weekly(1).tolist()
+    assert analytics.total() == plain.total() + 54000
+    assert str(analytics.since()) == "2025-12-22"
+    # 10 more workdays of 8 hours are expected for the rolled-up weeks
+    assert analytics.balance(40)[-1] == plain.balance(40)[-1] + 54000 - 10 * 8 * 3600
+    assert "Since 2025-12-22" in "\n".join(report_trends(analytics, "2026-01-12", 40))
@@ -0,0 +1,53 @@
+import pandas as pd
+import pendulum
+from utilities.archive import archive_rows, load_archived_totals, load_archived_rows, find_inactive_tasks, \
+    downsample, roll_up, load_rollup, retention_cutoff
+from utilities.reports import report_query
+
+
+def test_find_inactive_tasks():
+    data = pd.DataFrame({"2020-01-01": [10, 0, 0, 5], "2020-02-01": [0, 20, 0, 0]},
+                        index=["old", "recent", "unused", "older"])
+    assert find_inactive_tasks(data, "2020-01-15") == ["old", "older"]
+    assert find_inactive_tasks(data, "2020-01-01") == []
+
+
+def test_archive_rows_keeps_totals(tmp_path):
+    data = pd.DataFrame({"2020-01-01": [10, 7], "2020-01-02": [3, 0]}, index=["a", "b"])
+    archive_rows(str(tmp_path), "sheet", data.loc[["a"]])
+    totals = archive_rows(str(tmp_path), "sheet", data.loc[["a", "b"]])
+    assert totals == {"a": 26, "b": 7}
+    assert load_archived_totals(str(tmp_path), "sheet") == totals
+    assert load_archived_rows(str(tmp_path), "sheet").sum(axis=1).to_dict() == totals
+
+
+# 2026-01-05 and 2026-01-12 are Mondays
+DAYS = pd.DataFrame({"2026-01-05": [10, 0], "2026-01-07": [5, 1], "2026-01-12": [2, 0], "2026-02-02": [0, 4],
+                     "2026-03-02": [1, 1]}, index=["a", "b"]) * 60
+
+
+def test_retention_cutoff_starts_a_period():
+    today = pendulum.parse("2026-10-21")
+    assert retention_cutoff(today, 6, "month") == "2026-04-01"
+    assert retention_cutoff(today, 6, "week") == "2026-04-20"
+
+
+def test_downsample_keeps_totals():
+    kept, rolled = downsample(DAYS, "2026-02-02", "week")
+    assert list(kept.columns) == ["2026-02-02", "2026-03-02"]
+    assert (rolled // 60).to_dict() == {"2026-01-05": {"a": 15, "b": 1}, "2026-01-12": {"a": 2, "b": 0}}
+    kept, rolled = downsample(DAYS, "2026-02-01", "month")
+    assert list(rolled.columns) == ["2026-01-01"]
+    assert (kept.sum(axis=1) + rolled.sum(axis=1)).equals(DAYS.sum(axis=1))
+
+
+def test_roll_up_and_query(tmp_path):
+    kept, rollup = roll_up(str(tmp_path), "sheet", DAYS, "2026-02-01", "month")
+    late = pd.DataFrame({"2026-01-20": [180, 0]}, index=["a", "b"])  # e.g. synced from another copy later on
+    more, rollup = roll_up(str(tmp_path), "sheet", pd.concat([late, kept], axis=1), "2026-03-01", "week")
+    assert load_rollup(str(tmp_path), "sheet")["totals"].equals(rollup["totals"])
+    assert rollup["granularity"] == "month" and rollup["cutoff"] == "2026-03-01" and rollup["days"] == 5
+    assert rollup["totals"].sum(axis=1).to_dict() == {"a": 1200, "b": 300}
+    assert report_query(more, "tasks~a", rollup)[-1] == "21 minutes"
+    assert not any("[NOTICE]" in line for line in report_query(more, "since 2026-01-01 group by month", rollup))
+    assert "[NOTICE]" in report_query(more, "since 2026-01-10", rollup)[2]
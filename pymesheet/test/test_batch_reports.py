@@ -0,0 +1,28 @@
+import os, pickle
+import pandas as pd
+from batch_reports import generate_reports
+
+
+def test_generate_reports_skips_unchanged(tmp_path):
+    sheets, config, output = tmp_path / "timesheets", tmp_path / ".config", tmp_path / "reports"
+    sheets.mkdir()
+    config.mkdir()
+    data = pd.DataFrame({"2026-10-05": [3600, 60], "2026-10-06": [0, 1800]}, index=["client/a", "b"], dtype="int32")
+    for name in ["one", "two"]:
+        with open(sheets / "{}.pkl".format(name), "wb") as f:
+            pickle.dump(data, f)
+    (config / "one-config.data").write_text("[one]\nworkweek=40\nbaseline=")
+
+    rendered, skipped, failed = generate_reports(str(sheets), str(config), str(output), "md", "2026-10-06",
+                                                 processes=1)
+    assert (rendered, skipped, failed) == (["one", "two"], [], [])
+    report = (output / "one.md").read_text()
+    assert "## October 2026" in report and "client" in report and "workweek" in report
+
+    os.utime(sheets / "two.pkl", ns=(0, 0))
+    rendered, skipped, _ = generate_reports(str(sheets), str(config), str(output), "md", "2026-10-06", processes=1)
+    assert (rendered, skipped) == (["two"], ["one"])
+
+    rendered, _, _ = generate_reports(str(sheets), str(config), str(output), "html", "2026-10-06", processes=1)
+    assert rendered == ["one", "two"]
+    assert "<pre>" in (output / "one.html").read_text()
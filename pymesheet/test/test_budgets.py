@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+from utilities.budgets import BudgetTracker, parse_budgets, format_budgets, parse_thresholds, period_key, alert_message
+
+# 2026-10-19 is a Monday
+DATA = pd.DataFrame({"2026-10-16": [3600, 0], "2026-10-19": [1800, 600], "2026-10-20": [1200, 0]},
+                    index=pd.Index(["client/web", "misc"], dtype=object))
+BUDGETS = [("client", "week", 2 * 3600), ("", "day", 3600), ("client/web", "total", 10 * 3600)]
+
+
+def test_settings():
+    assert parse_budgets(format_budgets(BUDGETS)) == BUDGETS
+    for string in ['[["a", "month", 1]]', '[["a", "day", 0]]', '{"a": 1}', '[["a", "day"]]']:
+        with pytest.raises(ValueError):
+            parse_budgets(string)
+    assert parse_thresholds("") == [80, 100] and parse_thresholds("100,50") == [50, 100]
+    assert period_key("2026-10-25", "week") == "2026-10-19" and period_key("2026-10-25", "total") == ""
+
+
+def test_counters_start_from_the_data():
+    tracker = BudgetTracker.from_data(BUDGETS, DATA, "2026-10-20", history=pd.Series({"client/web": 3600}))
+    assert tracker.used == [3000, 1200, 10200]
+    # the week is at 42%, 30 more minutes reach 80% and fire once
+    assert tracker.record("misc", "2026-10-20", 1800) == [("", "day", 3600, 3000, 80)]
+    alerts = tracker.record("client/web/api", "2026-10-20", 3000)
+    assert ("client", "week", 7200, 6000, 80) in alerts and ("", "day", 3600, 6000, 100) in alerts
+    assert tracker.record("client/web", "2026-10-20", 60) == []
+    # time of an earlier week does not count; a new day starts over
+    assert tracker.record("misc", "2026-10-12", 99999) == [] and tracker.used[1] == 6060
+    assert tracker.record("misc", "2026-10-21", 600) == [] and tracker.used[1] == 600
+
+
+def test_running_timer_fires_once():
+    tracker = BudgetTracker.from_data([("misc", "day", 3600)], DATA, "2026-10-19", [50, 100])
+    assert tracker.check("misc", "2026-10-19", 60) == []
+    assert [alert[4] for alert in tracker.check("misc", "2026-10-19", 1200)] == [50]
+    assert tracker.check("misc", "2026-10-19", 1300) == []
+    assert [alert[4] for alert in tracker.record("misc", "2026-10-19", 3000)] == [100]
+    assert alert_message(("misc", "day", 3600, 3600, 100), "w") == \
+        "[BUDGET] Task 'misc' has reached its daily budget of 1 hours (1 hours logged)."
@@ -0,0 +1,54 @@
+import pendulum
+from utilities.calendar import Calendar, weekday, format_moments
+from simulator import SimulatedClock
+
+
+def _at(string, tz="Europe/Berlin"):
+    return pendulum.parse(string, tz=tz).timestamp()
+
+
+def test_today_rolls_over_at_midnight():
+    clock = SimulatedClock(_at("2026-03-10 23:59"))
+    calendar = Calendar("Europe/Berlin", clock)
+    assert calendar.day_key() == "2026-03-10"
+    clock.now += 120
+    assert calendar.day_key() == "2026-03-11"
+    assert calendar.today().to_date_string() == "2026-03-11"
+    assert calendar.yesterday().to_date_string() == "2026-03-10"
+    assert calendar.day_key(_at("2026-01-01 00:30")) == "2026-01-01"
+
+
+def test_split_at_midnight():
+    calendar = Calendar("Europe/Berlin")
+    start, end = _at("2026-03-10 22:00:00.5"), _at("2026-03-12 01:30")
+    pieces = calendar.split(start, end)
+    assert [(day, seconds) for day, seconds, _, _ in pieces] == [("2026-03-10", 7199), ("2026-03-11", 86400),
+                                                                  ("2026-03-12", 5400)]
+    assert sum(seconds for _, seconds, _, _ in pieces) == int(end - start)
+    assert pieces[0][2] == start and pieces[-1][3] == end
+    # the night clocks are turned forward has a 23 hour day
+    pieces = calendar.split(_at("2026-03-29 00:00"), _at("2026-03-30 00:00"))
+    assert [(day, seconds) for day, seconds, _, _ in pieces] == [("2026-03-29", 23 * 3600)]
+
+
+def test_weekday_and_moments():
+    assert weekday("2026-10-19") == "Monday"
+    assert format_moments([_at("2026-07-01 08:15", "UTC")], "Europe/Berlin") == ["2026-07-01 10:15"]
+    assert format_moments([], "UTC") == []
+
+
+def test_workday_split_at_midnight(tmp_path, monkeypatch):
+    from timesheet_manager import TimesheetManager
+    monkeypatch.chdir(tmp_path)
+    clock = SimulatedClock(_at("2026-03-10 20:00"))
+    manager = TimesheetManager(name="work", path=str(tmp_path), headless=True, clock=clock)
+    manager.calendar = Calendar("Europe/Berlin", clock)
+    manager.add_task(["a"], suppress=True)
+    manager.start_workday()
+    clock.now = _at("2026-03-10 22:00")
+    manager.UI.timer = lambda name: setattr(clock, "now", clock.now + 3600)
+    manager.start_task("a")
+    clock.now = _at("2026-03-11 04:00")
+    manager.add_workday()
+    assert manager.data.loc["General", ["2026-03-10", "2026-03-11"]].tolist() == [3 * 3600, 4 * 3600]
+    assert manager.interval_index().double_counted() == []
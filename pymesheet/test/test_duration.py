@@ -0,0 +1,30 @@
+import pytest
+from utilities.duration import Duration, DurationArray
+
+
+@pytest.mark.parametrize("seconds, short, days_hours_minutes", [
+    (0, "0 minutes", "0 days, 0 hours"),
+    (59, "Less than a minute.", "0 days, 0 hours"),
+    (90 * 60, "1 hours, 30 minutes", "0 days, 1 hours, 30 minutes"),
+    (26 * 3600, "26 hours", "1 days, 2 hours")
+])
+def test_formatting(seconds, short, days_hours_minutes):
+    assert Duration(seconds).short() == short
+    assert Duration(seconds).days_hours_minutes() == days_hours_minutes
+
+
+def test_baseline_carries_over():
+    total = Duration.parse("01d23h50m") + Duration(20 * 60)
+    assert total.days_hours_minutes() == "2 days, 0 hours, 10 minutes"
+    with pytest.raises(ValueError):
+        Duration.parse("23h17m")
+
+
+def test_arithmetic_is_exact():
+    per_day = Duration.from_hours(39) // 5
+    assert per_day.hours_minutes() == "7 hours, 48 minutes"
+    assert per_day - Duration(7 * 3600) == Duration(48 * 60)
+    assert Duration(1) < Duration(2) and not Duration(0)
+    array = DurationArray([30, 90, 3600])
+    assert array.sum() == Duration(3720)
+    assert list(array) == [Duration(30), Duration(90), Duration(3600)]
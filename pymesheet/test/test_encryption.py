@@ -0,0 +1,74 @@
+import os
+import pandas as pd
+import pytest
+
+pytest.importorskip("cryptography")
+from utilities.encryption import EncryptedStore, DecryptionError
+from utilities.layout import compact, add_tasks
+from batch_reports import load_data
+
+
+def test_only_changed_months_are_reencrypted(tmp_path):
+    data = compact(pd.DataFrame({"2026-01-05": [10, 0], "2026-02-02": [0, 20]}, index=["a", "b"]))
+    store = EncryptedStore(str(tmp_path), "work")
+    store.unlock("secret")
+    assert store.save(data) == ["2026-01", "2026-02"]
+
+    store = EncryptedStore(str(tmp_path), "work")
+    store.unlock("secret")
+    loaded = store.load()
+    assert loaded.equals(data)
+    loaded.at["a", "2026-02-02"] += 5
+    assert store.save(loaded) == ["2026-02"]
+    partial = store.load(start="2026-02-01")
+    assert partial.to_dict() == {"2026-02-02": {"a": 5, "b": 20}}
+    with pytest.raises(ValueError):
+        store.save(partial.copy())  # would drop January
+    assert store.months() == ["2026-01", "2026-02"]
+    assert store.save(add_tasks(loaded, ["c"])) == []  # a new Task only changes the manifest
+    assert store.save(loaded.rename(index={"b": "d"})) == ["2026-02"]  # the months with time of the Task
+    assert store.load().to_dict() == {"2026-01-05": {"a": 10, "d": 0}, "2026-02-02": {"a": 5, "d": 20}}
+    read = store.bytes_read
+    assert load_data(str(tmp_path), "work", store, "2026-01-01", "2026-01-31").columns.tolist() == ["2026-01-05"]
+    assert store.bytes_read - read < os.path.getsize(os.path.join(store.folder, "2026-02")) + \
+        os.path.getsize(os.path.join(store.folder, "2026-01")) + os.path.getsize(os.path.join(store.folder, "manifest"))
+
+
+def test_wrong_passphrase_and_tampering(tmp_path):
+    store = EncryptedStore(str(tmp_path), "work")
+    store.unlock("secret")
+    store.save(compact(pd.DataFrame({"2026-01-05": [10]}, index=["a"])))
+    with pytest.raises(DecryptionError):
+        EncryptedStore(str(tmp_path), "work").unlock("wrong")
+    os.replace(os.path.join(store.folder, "2026-01"), os.path.join(store.folder, "2026-03"))
+    with pytest.raises(DecryptionError):
+        store.read_chunk("2026-03")
+
+
+def test_side_files_are_encrypted(tmp_path, monkeypatch):
+    import getpass
+    from simulator import SimulatedClock
+    from timesheet_manager import TimesheetManager
+    monkeypatch.chdir(tmp_path)
+    clock = SimulatedClock(1791000000)
+    home = TimesheetManager(name="home", path=str(tmp_path), headless=True, clock=clock)
+    home.add_task(["chores"], suppress=True)
+    manager = TimesheetManager(name="work", path=str(tmp_path), headless=True, clock=clock)
+    manager.add_task(["secretproject", "oldclient"], suppress=True)
+    for task in ["secretproject", "oldclient"]:
+        manager.UI.timer = lambda name: setattr(clock, "now", clock.now + 600)
+        manager.start_task(task)
+    manager.retire_task("oldclient")
+    monkeypatch.setattr(getpass, "getpass", lambda prompt="": "secret")
+    manager.encrypt_timesheet()
+
+    for root, _, files in os.walk(str(tmp_path)):
+        for file in files:
+            with open(os.path.join(root, file), "rb") as f:
+                content = f.read()
+            assert b"secretproject" not in content and b"oldclient" not in content, file
+    monkeypatch.setenv("PYMESHEET_PASSPHRASE", "secret")
+    manager = TimesheetManager(name="work", path=str(tmp_path), headless=True, clock=clock)
+    assert [entry["task"] for entry in manager.journal.entries()] == ["secretproject", "oldclient"]
+    assert manager.archived == {"oldclient": 600}
+    assert TimesheetManager(name="home", path=str(tmp_path), headless=True).data.index.tolist() == ["chores"]
@@ -0,0 +1,32 @@
+import json, threading, time
+from utilities.events import EventBus, FileSubscriber, TaskStopped, TasksAdded
+
+
+def test_batches_are_delivered_in_order(tmp_path):
+    bus = EventBus(batch_wait=0.01)
+    batches = []
+    bus.subscribe(batches.append)
+    bus.subscribe(FileSubscriber(str(tmp_path / "events.jsonl")), types=[TaskStopped])
+    for i in range(250):
+        bus.emit(TaskStopped("sheet", "task", "2026-01-05", i, 0.0, float(i)))
+    bus.emit(TasksAdded("sheet", ["a"]))
+    assert bus.flush()
+    bus.close()
+    events = [event for batch in batches for event in batch]
+    assert [event.seconds for event in events[:-1]] == list(range(250))
+    assert max(len(batch) for batch in batches) <= 100
+    lines = (tmp_path / "events.jsonl").read_text().splitlines()
+    assert len(lines) == 250 and json.loads(lines[0])["type"] == "task_stopped"
+
+
+def test_slow_subscriber_does_not_block_emit():
+    release = threading.Event()
+    bus = EventBus(max_queue=10)
+    bus.subscribe(lambda events: release.wait())
+    start = time.perf_counter()
+    for i in range(100):
+        bus.emit(TasksAdded("sheet", [str(i)]))
+    assert time.perf_counter() - start < 0.5
+    assert bus.dropped > 0 and bus.stats()["emitted"] == 100
+    release.set()
+    bus.close()
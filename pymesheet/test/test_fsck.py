@@ -0,0 +1,74 @@
+import os, time
+import numpy as np
+import pandas as pd
+from utilities import storage
+from utilities.layout import SECONDS_DTYPE
+from fsck import fsck, check_data, report
+
+DATA = pd.DataFrame(np.array([[3600, 0], [0, 60]], dtype=SECONDS_DTYPE), index=pd.Index(["a", "b"], dtype=object),
+                    columns=["2026-01-05", "2026-01-06"])
+
+
+def _tree(tmp_path):
+    sheets, config = tmp_path / "timesheets", tmp_path / ".config"
+    (sheets / ".backup").mkdir(parents=True)
+    config.mkdir()
+    storage.save(str(sheets / "work.pkl"), DATA)
+    storage.save(str(sheets / ".backup" / "work.pkl"), DATA)
+    (config / "work-config.data").write_text("workweek=40\nbaseline=")
+    return str(sheets), str(config), str(tmp_path)
+
+
+def _findings(findings):
+    return {(os.path.basename(file), level, action) for file, level, _, action, _ in findings}
+
+
+def test_check_data():
+    assert check_data(DATA) == []
+    bad = DATA.astype(np.float64)
+    bad.iloc[0, 1] = -5
+    bad["total"] = 90000
+    levels = [(level, action) for level, _, action in check_data(bad)]
+    assert ("warning", "compact") in levels and ("error", None) in levels and len(levels) == 4
+
+
+def test_clean_tree_is_skipped_the_second_time(tmp_path):
+    sheets, config, state = _tree(tmp_path)
+    findings, stats = fsck(sheets, config, state, processes=1)
+    assert findings == [] and stats["checked"] == 2
+    findings, stats = fsck(sheets, config, state, processes=1)
+    assert findings == [] and stats["skipped"] == 2
+    assert report(findings, stats)[0].startswith("Checked 0 of 2")
+    # a change the modification time does not show is only found by a full check
+    path = os.path.join(sheets, "work.pkl")
+    stat = os.stat(path)
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xff]))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert fsck(sheets, config, state, processes=1)[0] == []
+    findings, _ = fsck(sheets, config, state, processes=1, full=True)
+    assert _findings(findings) == {("work.pkl", "error", None)}
+
+
+def test_finds_and_repairs(tmp_path):
+    sheets, config, state = _tree(tmp_path)
+    (tmp_path / ".config" / "work-config.data").write_text("workweek=40")
+    (tmp_path / ".config" / "gone-config.data").write_text("workweek=\nbaseline=")
+    (tmp_path / ".state-gone").write_text("a={}".format(time.time()))
+    (tmp_path / ".state-work").write_text("garbage")
+    (tmp_path / "timesheets" / ".backup" / "work.pkl").write_bytes(b"PYMS broken")
+    storage.save(os.path.join(sheets, "home.pkl"), DATA.astype(np.float64), "pickle")
+    findings, _ = fsck(sheets, config, state, processes=2)
+    assert _findings(findings) == {("work.pkl", "error", "refresh_backup"), ("home.pkl", "warning", "compact"),
+                                   ("work-config.data", "error", "fix_config"),
+                                   ("gone-config.data", "warning", "move_config"),
+                                   (".state-gone", "warning", "delete_state"), (".state-work", "error", "delete_state")}
+    findings, _ = fsck(sheets, config, state, processes=2, repairs=True)
+    assert all(outcome is not None for _, _, _, _, outcome in findings)
+    assert fsck(sheets, config, state, processes=2)[0] == []
+    assert (tmp_path / ".config" / "orphaned" / "gone-config.data").exists()
+    assert storage.load(os.path.join(sheets, ".backup", "work.pkl")).equals(DATA)
+    assert os.path.exists(os.path.join(sheets, "home.pkl.orig"))
@@ -0,0 +1,41 @@
+import random
+from utilities.intervals import IntervalIndex
+
+
+def entry(task, start, end, seconds=None, day="2026-01-05"):
+    return {"task": task, "day": day, "seconds": end - start if seconds is None else seconds,
+            "start": start, "end": end}
+
+
+def test_overlapping_matches_brute_force():
+    rng = random.Random(0)
+    entries = []
+    for _ in range(500):
+        start = rng.uniform(0, 10000)
+        entries.append(entry("t{}".format(rng.randrange(5)), start, start + rng.uniform(1, 300)))
+    index = IntervalIndex.from_entries(entries[:400])
+    for e in entries[400:]:  # some still in the unsorted tail
+        index.add(e["task"], e["day"], e["seconds"], e["start"], e["end"])
+    for _ in range(50):
+        start = rng.uniform(0, 10000)
+        end = start + rng.uniform(0, 500)
+        expected = sorted((e["start"], e["end"]) for e in entries if e["start"] < end and e["end"] > start)
+        assert [(i[3], i[4]) for i in index.overlapping(start, end)] == expected
+    assert [i[0] for i in index.at(entries[0]["start"])].count(entries[0]["task"]) >= 1
+
+
+def test_overlaps_and_double_counted_fill():
+    index = IntervalIndex.from_entries([
+        entry("a", 100, 200), entry("b", 150, 250), entry("c", 300, 400),
+        # workday from 0 to 1000 with a, b, and c allocated; 'late' was stopped after the workday ended
+        entry("General", 0, 1000, seconds=1000 - 300), entry("late", 900, 1100)])
+    assert [(first[0], second[0], seconds) for first, second, seconds in index.overlaps()] == [("a", "b", 50)]
+    (fill, seconds), = index.double_counted()
+    assert fill[0] == "General" and seconds == 100
+
+
+def test_to_timesheet():
+    index = IntervalIndex.from_entries([entry("a", 0, 60), entry("a", 100, 130, day="2026-01-06"),
+                                        entry("b", 0, 10)])
+    data = index.to_timesheet()
+    assert data.loc["a"].tolist() == [60, 30] and data.loc["b"].tolist() == [10, 0]
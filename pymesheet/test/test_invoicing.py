@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utilities.invoicing import invoice, round_up, rate_of, parse_rounding, parse_rates, format_rates
+from utilities.reports import report_invoice
+
+DATA = pd.DataFrame({"2026-09-01": [3000, 600, 100], "2026-09-02": [60, 0, 0], "2026-10-01": [3600, 0, 0]},
+                    index=pd.Index(["acme/web", "acme/mtg", "misc"], dtype=object))
+
+
+def test_settings():
+    assert parse_rounding("") == ("none", 0) and parse_rounding("day/15") == ("day", 15)
+    for string in ["day", "week/15", "entry/0", "entry/x"]:
+        with pytest.raises(ValueError):
+            parse_rounding(string)
+    rates = parse_rates(format_rates({"acme": 100, "acme/mtg": 50.5}))
+    assert rate_of("acme/web/frontend", rates, None) == 100 and rate_of("acme/mtg", rates, 10) == 50.5
+    assert rate_of("misc", rates, None) is None
+    with pytest.raises(ValueError):
+        parse_rates('{"acme": -1}')
+    assert round_up([1, 900, 901, 0], 900).tolist() == [900, 900, 1800, 0]
+    assert round_up([61, 61], np.array([0, 60])).tolist() == [61, 120]
+
+
+def test_invoice_per_day():
+    items = invoice([("work", DATA, {"rates": '{"acme": 100}', "rounding": "day/15"}, None)],
+                    "2026-09-01", "2026-09-30")
+    assert items["task"].tolist() == ["acme/mtg", "acme/web"]  # misc has no rate
+    assert items["seconds"].tolist() == [600, 3060]
+    assert items["billable"].tolist() == [900, 3600 + 900]
+    assert items["amount"].tolist() == [25.0, 125.0]
+    assert invoice([("work", DATA, {}, None)], "2026-09-01", "2026-09-30").empty
+
+
+def test_invoice_per_entry_across_sheets():
+    entries = [{"task": "acme/web", "day": "2026-09-01", "seconds": 1000},
+               {"task": "acme/web", "day": "2026-09-01", "seconds": 1000},
+               {"task": "acme/mtg", "day": "2026-09-01", "seconds": 5000}]  # more than the cell, e.g. time moved
+    home = DATA.rename(index={"misc": "other/chores"})
+    items = invoice([("work", DATA, {"rate": "60", "rounding": "entry/6"}, entries),
+                     ("home", home, {"rates": '{"other": 30}'}, None)], "2026-09-01", "2026-09-02")
+    billed = items.set_index(["sheet", "task"])["billable"].to_dict()
+    # two entries and the 1000 seconds logged by hand, each rounded up to 6 minutes, and the day after
+    assert billed[("work", "acme/web")] == 1080 + 1080 + 1080 + 360
+    assert billed[("work", "acme/mtg")] == 720 and billed[("work", "misc")] == 360
+    assert billed[("home", "other/chores")] == 100
+    assert items["client"].tolist() == sorted(items["client"])
+    lines = report_invoice(items, "2026-09-01", "2026-09-02")
+    assert lines[0] == "Invoice for 2026-09-01 to 2026-09-02:" and "home: other/chores" in "\n".join(lines)
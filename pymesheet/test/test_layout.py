@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from utilities.layout import compact, add_tasks, add_days, is_compact, memory_report, empty_timesheet, SECONDS_DTYPE
+
+
+def test_compact_migration():
+    data = pd.DataFrame({"2020-01-01": [1.0, np.nan], "2020-01-02": [3.7, 4.0]}, index=["a", "b"])
+    compacted = compact(data)
+    assert is_compact(compacted) and not is_compact(data)
+    assert compacted.values.tolist() == [[1, 3], [0, 4]]
+    assert memory_report(compacted)["cell_bytes"] < memory_report(data)["cell_bytes"]
+
+
+def test_add_tasks_stays_compact():
+    data = add_tasks(empty_timesheet(), ["a"])
+    data["2020-01-01"] = np.array([5], dtype=SECONDS_DTYPE)
+    data = add_tasks(data, ["b", "c"])
+    assert is_compact(data)
+    assert data["2020-01-01"].tolist() == [5, 0, 0]
+
+
+def test_add_days_stays_one_block():
+    data = add_days(add_tasks(empty_timesheet(), ["a", "b"]), ["2020-01-01"])
+    data.loc["a", "2020-01-01"] = 5
+    for day in range(2, 200):
+        data = add_days(data, ["2020-{:03d}".format(day)])
+    assert is_compact(data)
+    assert data._mgr.nblocks == 1
+    assert data.sum(axis=1).tolist() == [5, 0]
@@ -0,0 +1,21 @@
+import json
+from utilities.metrics import Metrics
+
+
+def test_idle_time_is_not_latency():
+    idle = [0.0]
+    metrics = Metrics(idle=lambda: idle[0])
+    with metrics.timed("report"):
+        idle[0] += 10.0  # the user took ten seconds to press ENTER
+    assert metrics.histograms["report"]["sum"] < 1.0
+
+
+def test_exports():
+    metrics = Metrics()
+    metrics.observe("save", 0.002)
+    metrics.count("bytes_written", 100)
+    metrics.gauge("sheet_bytes", 100)
+    assert json.loads(metrics.to_json())["histograms"]["save"]["buckets"][1] == 1
+    prometheus = metrics.to_prometheus('sheet="work"')
+    assert 'pymesheet_operation_seconds_count{operation="save",sheet="work"} 1' in prometheus
+    assert 'pymesheet_bytes_written_total{sheet="work"} 100' in prometheus
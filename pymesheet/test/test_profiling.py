@@ -0,0 +1,63 @@
+import pstats
+import time
+from utilities.profiling import CommandProfiler, collapsed_stacks
+
+
+def leaf():
+    time.sleep(0.01)
+
+
+def branch():
+    leaf()
+    return "done"
+
+
+def profile(profiler, code, function):
+    profiler.start()  # as the menu loop does around every command
+    try:
+        return function()
+    finally:
+        profiler.stop(code)
+
+
+def test_commands_are_profiled(tmp_path):
+    profiler = CommandProfiler(str(tmp_path / "profiles"))
+    assert profile(profiler, "41", branch) == "done"
+    profile(profiler, "41", branch)
+    profile(profiler, 0, leaf)
+    assert profiler.runs == {"41": 2, "0": 1}
+    paths = profiler.save()
+    assert sorted(path.rsplit("/", 1)[1] for path in paths) == ["command-0.collapsed", "command-0.pstats",
+                                                               "command-41.collapsed", "command-41.pstats"]
+    assert pstats.Stats(str(tmp_path / "profiles" / "command-41.pstats")).total_calls > 0
+    stacks = collapsed_stacks(profiler.stats["41"])
+    sleeping = [stack for stack in stacks if stack.endswith("sleep>")]
+    assert len(sleeping) == 1 and "(branch);" in sleeping[0] and "(leaf);" in sleeping[0]
+    assert stacks[sleeping[0]] >= 0.02
+    lines = profiler.summary(top=3)
+    assert lines[1].split()[:2] == ["41", "2"] and "sleep" in lines[lines.index("") + 2]
+
+
+def test_waiting_for_the_user_is_left_out(tmp_path):
+    from user_interface import UserInterface
+
+    def command():
+        with UserInterface.waiting():
+            time.sleep(0.05)  # e.g. the user reading a report
+        with UserInterface.waiting():
+            with UserInterface.waiting():  # nested waits resume once
+                pass
+        leaf()
+
+    profiler = CommandProfiler(str(tmp_path))
+    UserInterface.profiler = profiler
+    try:
+        profile(profiler, "31", command)
+        profiler.start()
+        with UserInterface.waiting():
+            pass
+        profiler.stop(None)  # e.g. the input ended before a command was given
+    finally:
+        UserInterface.profiler = None
+    assert profiler.runs == {"31": 1}
+    assert 0.01 <= profiler.stats["31"].total_tt < 0.04
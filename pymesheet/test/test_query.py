@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+from utilities.query import Query, QueryError, run_query
+
+DATA = pd.DataFrame({"2026-01-05": [100, 200, 0], "2026-01-12": [50, 0, 10], "2026-02-01": [1, 1, 1]},
+                    index=["proj/a", "proj/b", "other"])
+
+
+def test_parse():
+    query = Query.parse('tasks~"proj/*" between 2026-01-01 and 2026-03-31 group by task, week')
+    assert (query.pattern, query.start, query.end, query.groups) == ("proj/*", "2026-01-01", "2026-03-31",
+                                                                     ["task", "week"])
+    with pytest.raises(QueryError):
+        Query.parse("group by hour")
+    with pytest.raises(QueryError):
+        Query.parse("between 2026-01-01")
+
+
+def test_run():
+    assert run_query(DATA, "") == 363
+    assert run_query(DATA, "tasks~proj/* until 2026-01-31") == 350
+    assert run_query(DATA, "since 2026-01-06 group by week").to_dict() == {"2026-W03": 60, "2026-W05": 3}
+    by_task_month = run_query(DATA, "tasks~proj/a group by task, month")
+    assert by_task_month.to_dict() == {("proj/a", "2026-01"): 150, ("proj/a", "2026-02"): 1}
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from utilities import storage
+from utilities.layout import SECONDS_DTYPE
+from utilities.registry import TaskRegistry, RegistryError
+from utilities.storage import StorageError
+
+WORK = pd.DataFrame(np.array([[60, 0], [0, 120]], dtype=SECONDS_DTYPE), index=pd.Index(["a", "client/b"], dtype=object),
+                    columns=["2026-01-05", "2026-01-06"])
+HOME = pd.DataFrame(np.array([[5], [7]], dtype=SECONDS_DTYPE), index=pd.Index(["chores", "a"], dtype=object),
+                    columns=["2026-01-05"])
+
+
+def test_ids_are_stable_and_shared(tmp_path):
+    registry = TaskRegistry(str(tmp_path))
+    assert registry.ids(["a", "b", "a"]).tolist() == [0, 1, 0]
+    other = TaskRegistry(str(tmp_path))  # e.g. another process
+    assert other.ids(["c", "b"]).tolist() == [2, 1]
+    assert registry.ids(["c", "d"]).tolist() == [2, 3]  # reads the names the other one appended first
+    assert registry.ids(["e"], assign=False).tolist() == [-1] and len(registry) == 4
+    assert registry.lookup([3, 0]).tolist() == ["d", "a"]
+    assert registry.lookup([0])[0] is TaskRegistry(str(tmp_path)).lookup([0])[0] is not None
+    with pytest.raises(RegistryError):
+        registry.lookup([9])
+    # the same name appended twice keeps its first id
+    with open(registry.file, "ab") as f:
+        f.write(b"a\0")
+    assert TaskRegistry(str(tmp_path)).ids(["a", "d"]).tolist() == [0, 3]
+
+
+def test_sheets_are_saved_with_ids(tmp_path):
+    registry = TaskRegistry(str(tmp_path))
+    storage.save(str(tmp_path / "work.pkl"), WORK, registry=registry)
+    storage.save(str(tmp_path / "home.pkl"), HOME, registry=registry)
+    assert storage.load(str(tmp_path / "work.pkl")).equals(WORK)  # finds the registry of its folder
+    home = storage.load(str(tmp_path / "home.pkl"), registry)
+    work = storage.load(str(tmp_path / "work.pkl"), registry)
+    assert home.index[1] is work.index[0]
+    with pytest.raises(StorageError):
+        storage.loads(storage.dumps(WORK, registry=registry))
+    assert storage.loads(storage.dumps(WORK)).equals(WORK)  # without a registry, the names are stored
+
+
+def test_sheet_copied_without_its_registry(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    storage.save(str(tmp_path / "a" / "work.pkl"), WORK, registry=TaskRegistry(str(tmp_path / "a")))
+    storage.save(str(tmp_path / "b" / "home.pkl"), HOME, registry=TaskRegistry(str(tmp_path / "b")))
+    os.replace(str(tmp_path / "a" / "work.pkl"), str(tmp_path / "b" / "work.pkl"))
+    with pytest.raises(StorageError, match="registry"):  # ids 0 and 1 are other names in this folder
+        storage.load(str(tmp_path / "b" / "work.pkl"))
+    os.remove(str(tmp_path / "b" / ".registry"))
+    with pytest.raises(StorageError, match="registry"):
+        storage.load(str(tmp_path / "b" / "work.pkl"))
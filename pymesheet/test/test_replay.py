@@ -0,0 +1,59 @@
+import io
+import pytest
+import timesheet_manager
+from timesheet_manager import main, command_timings
+from user_interface import UserInterface, ScriptInput, RecordingInput, ConsoleInput
+
+
+@pytest.fixture(autouse=True)
+def keyboard():
+    yield
+    UserInterface.source = ConsoleInput()
+
+
+def test_script_lines():
+    script = ScriptInput(["# a comment", "1", "", "\\# not a comment", "\\\\x"], echo=False)
+    assert [script.read() for _ in range(4)] == ["1", "", "# not a comment", "\\x"]
+    with pytest.raises(EOFError):
+        script.read()
+    assert script.line == 5
+    recorded = io.StringIO()
+    recorder = RecordingInput(ScriptInput(["a", "\\#b", ""], echo=False), recorded)
+    assert [recorder.read("Which Task?\n\t...") for _ in range(3)] == ["a", "#b", ""]
+    assert recorded.getvalue() == "# ...\na\n# ...\n\\#b\n# ...\n\n"
+    replayed = ScriptInput(recorded.getvalue().splitlines(), echo=False)
+    assert [replayed.read() for _ in range(3)] == ["a", "#b", ""]
+
+
+def test_recorded_session_replays(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    # create a Timesheet, add two Tasks, list them, then quit
+    answers = iter(["", "4", "2", "a, b", "", "4", "1", "", "7"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    assert main(["--sheet", "work", "--record", "session.txt"]) == 0
+    saved = timesheet_manager.TimesheetManager(name="work", path=str(tmp_path), headless=True)
+    assert sorted(saved.data.index) == ["a", "b"]
+
+    # the same session, without the quit at the end, against a new folder
+    script = (tmp_path / "session.txt").read_text().splitlines()[:-2]
+    (tmp_path / "replay").mkdir()
+    (tmp_path / "replay" / "session.txt").write_text("\n".join(script) + "\n")
+    monkeypatch.chdir(tmp_path / "replay")
+    monkeypatch.setattr("builtins.input", lambda prompt="": pytest.fail("read from the keyboard"))
+    capsys.readouterr()
+    assert main(["--sheet", "work", "--replay", "session.txt", "--quiet", "--timings", "times.csv"]) == 0
+    assert "Replayed 2 commands" in capsys.readouterr().out
+    assert sorted(timesheet_manager.TimesheetManager(name="work", path=str(tmp_path / "replay"),
+                                                         headless=True).data.index) == ["a", "b"]
+    rows = (tmp_path / "replay" / "times.csv").read_text().splitlines()
+    assert rows[0] == "command,code,seconds" and [row.split(",")[1] for row in rows[1:]] == ["42", "41"]
+    assert command_timings([("41", 0.5), ("42", 1.0), ("41", 1.5)])[1].split()[:3] == ["41", "2", "2000.00"]
+
+
+def test_timer_ends_with_the_script(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "timer.txt").write_text("\n1\nmeeting\ny\n")  # starts a timer on a new Task, then the script ends
+    assert main(["--sheet", "work", "--replay", "timer.txt", "--quiet"]) == 0
+    assert not (tmp_path / ".state-work").exists()
+    manager = timesheet_manager.TimesheetManager(name="work", path=str(tmp_path), headless=True)
+    assert [entry["task"] for entry in manager.journal.entries()] == ["meeting"]
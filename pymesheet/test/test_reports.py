@@ -0,0 +1,24 @@
+import pandas as pd
+import pendulum
+from utilities.reports import ReportCache, report_time_per_day, report_weekly
+
+
+def test_cache_is_keyed_on_version():
+    cache, builds = ReportCache(maxsize=2), []
+    build = lambda: builds.append(1) or ["report"]
+    cache.get(("total", (), 1), build)
+    cache.get(("total", (), 1), build)
+    assert len(builds) == 1 and cache.hits == 1
+    cache.get(("total", (), 2), build)  # the data changed
+    assert len(builds) == 2
+    cache.get(("weekly", (), 2), build)
+    assert ("total", (), 1) not in cache.reports  # least recently used is evicted
+
+
+def test_report_builders():
+    data = pd.DataFrame({"2020-01-06": [3600, 1800], "2020-01-07": [0, 120]}, index=["a", "b"])
+    assert report_time_per_day(data, "2020-01-06", 40)[:3] == ["Summary for 2020-01-06:", "-" * 23,
+                                                               "1 hours, 30 minutes"]
+    weekly = report_weekly(data, pendulum.date(2020, 1, 7), "")
+    assert weekly[2].endswith(", 01-06") and weekly[3] == "-" * 16
+    assert weekly[-1] == "1 hours, 32 minutes"
@@ -0,0 +1,15 @@
+from simulator import generate, expected_totals, record, replay, simulate
+
+
+def test_generate_is_deterministic():
+    assert generate(2, 5, 14, seed=3) == generate(2, 5, 14, seed=3)
+    assert generate(2, 5, 14, seed=3) != generate(2, 5, 14, seed=4)
+
+
+def test_simulation_is_consistent(tmp_path):
+    events = generate(2, 4, 10, seed=1)
+    record(events, str(tmp_path / "trace.jsonl"), seed=1)
+    assert replay(str(tmp_path / "trace.jsonl")) == events
+    results, _ = simulate(events, str(tmp_path))
+    assert [result["errors"] for result in results] == [[], []]
+    assert sum(expected_totals([event for event in events if event["user"] == "user000"]).values()) > 0
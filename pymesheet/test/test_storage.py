@@ -0,0 +1,50 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from utilities import storage
+from utilities.layout import SECONDS_DTYPE, empty_timesheet
+from utilities.storage import encode, decode, dumps, loads, encode_varints, decode_varints, StorageError
+
+# days out of order, e.g. an old day synced in later, and a negative correction
+DATA = pd.DataFrame(np.array([[3600, 0, 0, 0], [0, 0, -20, 7], [12, 0, 0, 2 ** 30]], dtype=SECONDS_DTYPE),
+                    index=pd.Index(["a", "client/b", "ü"], dtype=object),
+                    columns=["2026-01-05", "2026-01-06", "2026-01-12", "2025-12-31"])
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 2 ** 35, 2 ** 64 - 1], dtype=np.uint64)
+    assert decode_varints(encode_varints(values)).tolist() == values.tolist()
+    assert encode_varints([1, 300]) == b"\x01\xac\x02"
+
+
+@pytest.mark.parametrize("codec", ["none", "zlib", "lzma"])
+def test_encode_round_trip(codec):
+    assert decode(encode(DATA, codec)).equals(DATA)
+    for data in [empty_timesheet(), empty_timesheet(["a", "b"]), DATA.iloc[:, :0]]:
+        decoded = decode(encode(data, codec))
+        assert list(decoded.index) == list(data.index) and decoded.shape == data.shape
+
+
+def test_old_pickles_and_fallback(tmp_path):
+    assert loads(pickle.dumps(DATA)).equals(DATA)
+    odd = DATA.rename(columns={"2026-01-05": "total"})  # not a date, so it stays a pickle
+    assert dumps(odd)[:4] != storage.MAGIC and loads(dumps(odd)).equals(odd)
+    storage.save(str(tmp_path / "sheet.pkl"), DATA)
+    assert storage.load(str(tmp_path / "sheet.pkl")).equals(DATA)
+
+
+def test_rejects_newer_and_truncated():
+    payload = encode(DATA)
+    with pytest.raises(StorageError):
+        decode(payload[:4] + bytes([storage.FORMAT_VERSION + 1]) + payload[5:])
+    with pytest.raises(StorageError):
+        decode(payload[:-3])
+
+
+def test_unknown_codec_keeps_the_file(tmp_path):
+    path = str(tmp_path / "work.pkl")
+    storage.save(path, DATA)
+    with pytest.raises(StorageError):
+        storage.save(path, DATA.iloc[:1], codec="gzip")
+    assert storage.load(path).equals(DATA) and sorted(p.name for p in tmp_path.iterdir()) == ["work.pkl"]
@@ -0,0 +1,66 @@
+from utilities.sync import Journal
+
+
+def test_delta_round_trip_never_double_counts(tmp_path):
+    laptop = Journal(str(tmp_path / "laptop"), "work", "laptop")
+    desktop = Journal(str(tmp_path / "desktop"), "work", "desktop")
+    laptop.append("a", "2026-01-05", 100, 0.0, 100.0)
+    desktop.append("b", "2026-01-05", 50, 0.0, 50.0)
+
+    delta = str(tmp_path / "laptop.delta")
+    assert laptop.export(delta) == 1
+    _, entries = desktop.read_delta(delta)
+    assert [entry["task"] for entry in entries] == ["a"]
+    desktop.accept(entries)
+    assert desktop.read_delta(delta)[1] == []  # importing twice adds nothing
+
+    delta = str(tmp_path / "desktop.delta")
+    assert desktop.export(delta) == 2  # its own entry, and the one from the laptop
+    _, entries = laptop.read_delta(delta)
+    assert [entry["task"] for entry in entries] == ["b"]
+    assert laptop.export(str(tmp_path / "empty.delta")) == 0
+
+
+def test_deltas_out_of_order(tmp_path):
+    laptop = Journal(str(tmp_path / "laptop"), "work", "laptop")
+    desktop = Journal(str(tmp_path / "desktop"), "work", "desktop")
+    assert laptop.export(str(tmp_path / "d0.delta")) == 0  # nothing journaled yet
+    laptop.append("a", "2026-01-05", 100, 0.0, 100.0)
+    laptop.export(str(tmp_path / "d1.delta"))
+    laptop.append("b", "2026-01-05", 50, 100.0, 150.0)
+    laptop.append("c", "2026-01-05", 10, 150.0, 160.0)
+    laptop.export(str(tmp_path / "d2.delta"))
+    _, entries = desktop.read_delta(str(tmp_path / "d2.delta"))
+    desktop.accept(entries)
+    assert desktop.seen == {"laptop": [[2, 3]]}
+    desktop = Journal(str(tmp_path / "desktop"), "work", "desktop")  # the seen ranges are saved
+    assert [entry["task"] for entry in desktop.read_delta(str(tmp_path / "d1.delta"))[1]] == ["a"]
+    desktop.accept(desktop.read_delta(str(tmp_path / "d1.delta"))[1])
+    assert desktop.seen == {"laptop": [[1, 3]]} and desktop.read_delta(str(tmp_path / "d2.delta"))[1] == []
+
+
+def test_renames_and_moves_reach_the_other_copy(tmp_path, monkeypatch):
+    from simulator import SimulatedClock
+    from timesheet_manager import TimesheetManager
+    clock = SimulatedClock(1791000000)
+    copies = {}
+    for origin in ["laptop", "desktop"]:
+        (tmp_path / origin).mkdir()
+        monkeypatch.chdir(tmp_path / origin)  # every copy has an origin of its own
+        copies[origin] = TimesheetManager(name="work", path=str(tmp_path / origin), headless=True, clock=clock)
+    laptop, desktop = copies["laptop"], copies["desktop"]
+    monkeypatch.chdir(tmp_path / "laptop")
+    laptop.add_task(["a", "b"], suppress=True)
+    laptop.UI.timer = lambda name: setattr(clock, "now", clock.now + 600)
+    laptop.start_task("a")
+    laptop.start_task("b")
+    laptop.rename_task({"a": "x"})
+    laptop.reassign_task_time("b", "x")
+    assert [interval[0] for interval in laptop.interval_index().overlapping(0, clock.now)] == ["x", "x"]
+    laptop.export_sync(str(tmp_path / "laptop.delta"))
+
+    monkeypatch.chdir(tmp_path / "desktop")
+    desktop.import_sync(str(tmp_path / "laptop.delta"))
+    assert desktop.data.sum(axis=1).to_dict() == {"x": 1200, "b": 0}
+    assert [entry["task"] for entry in desktop.journal.intervals()] == ["x", "x"]
+    assert desktop.tree.total("x") == 1200 and desktop.tree.total("b") == 0
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+from utilities.task_ops import parse_names, parse_renames, delete_tasks, rename_tasks, reassign_time
+
+
+def sheet():
+    return pd.DataFrame({"2020-01-01": [10, 20, 30], "2020-01-02": [1, 2, 3], "2020-01-03": [5, 0, 0]},
+                        index=["a", "b", "c"], dtype="int32")
+
+
+def test_parse():
+    assert parse_names(" a, b/c ,, a") == ["a", "b/c"]
+    assert parse_renames("a=x, b = y,") == {"a": "x", "b": "y"}
+    with pytest.raises(ValueError):
+        parse_renames("a, b=c")
+
+
+def test_delete_and_rename():
+    data = sheet()
+    assert list(delete_tasks(data, ["a", "c"]).index) == ["b"]
+    renamed = rename_tasks(data, {"a": "x"})
+    assert list(renamed.index) == ["x", "b", "c"]
+    assert list(data.index) == ["a", "b", "c"]
+
+
+def test_merge_keeps_totals():
+    data = sheet()
+    merged = rename_tasks(data, {"a": "c", "b": "c"})
+    assert list(merged.index) == ["c"]
+    assert merged.loc["c"].tolist() == [60, 6, 5]
+    assert merged.dtypes.unique().tolist() == [data.dtypes.iloc[0]]
+
+
+def test_reassign_time_in_range():
+    data, moved = reassign_time(sheet(), "a", "b", start="2020-01-02")
+    assert moved == 6
+    assert data.loc["a"].tolist() == [10, 0, 0]
+    assert data.loc["b"].tolist() == [20, 3, 5]
+    assert int(data.values.sum()) == int(sheet().values.sum())
+
+
+def manager(tmp_path, monkeypatch):
+    from simulator import SimulatedClock
+    from timesheet_manager import TimesheetManager
+    monkeypatch.chdir(tmp_path)
+    clock = SimulatedClock(1791000000)
+    manager = TimesheetManager(name="work", path=str(tmp_path), headless=True, clock=clock)
+    manager.add_task(["client", "client/a", "client/b"], suppress=True)
+    manager.UI.timer = lambda name: setattr(clock, "now", clock.now + 600)
+    for task in ["client", "client/a", "client/b"]:
+        manager.start_task(task)
+    return manager
+
+
+def test_deleted_tasks_leave_the_tree(tmp_path, monkeypatch):
+    work = manager(tmp_path, monkeypatch)
+    work.delete_task(["client/a"])
+    assert "client/a" not in work.tree
+    assert work.tree.total("client") == 1200
+    work.delete_task(["client"])
+    assert "client" in work.tree and work.tree.total("client") == 600  # 'client/b' is still logged
@@ -0,0 +1,18 @@
+from utilities.task_tree import TaskTree, ancestors
+
+
+def test_ancestors():
+    assert ancestors("a/b/c") == ["", "a", "a/b", "a/b/c"]
+
+
+def test_rollup():
+    tree = TaskTree.build([("client/project/one", 10), ("client/project/two", 5), ("client/other", 1), ("misc", 2)])
+    assert tree.total("client") == 16
+    assert tree.total("client/project/") == 15
+    assert tree.total("") == 18
+    assert tree.subtasks("client/project") == [("client/project/one", 10), ("client/project/two", 5)]
+    tree.add("client/project/one", 20)
+    assert tree.total("client") == 36
+    tree.remove("client/project")
+    assert tree.total("client") == 1 and "client/project/one" not in tree
+    assert tree.subtasks("client") == [("client/other", 1)]
@@ -4,33 +4,65 @@ Creates a Pandas dataframe that records time worked on various user specified ta
 Connects to a user interface for ease of use.
 @author: John Berroa
 """
-import sys
+import sys, argparse
+from contextlib import redirect_stdout, nullcontext
 import pandas as pd
-import pendulum, time, pickle, os
-from shutil import copyfile
+import pendulum, time, os
+from shutil import copyfile, copytree, rmtree
 from os.path import join as pathjoin
-from user_interface import UserInterface
-from utilities.time_utils import Converter, TimeCalculator
-from utilities.utils import get_current_week_days, generate_day_dict
+from user_interface import UserInterface, HeadlessUserInterface, ScriptInput, RecordingInput, clear, ask
+from utilities.duration import Duration
+from utilities.sync import Journal, load_origin
+from utilities import encryption, storage
+from utilities.registry import TaskRegistry
+from utilities.encryption import EncryptedStore, DecryptionError, ENCRYPTED_SUFFIX
+from utilities.archive import archive_rows, load_archived_totals, load_archived_rows, find_inactive_tasks, \
+    load_rollup, save_rollup, roll_up, retention_cutoff, encrypt_archive, ROLLUPS
+from utilities.task_tree import TaskTree
+from utilities.analytics import Analytics
+from utilities.intervals import IntervalIndex
+from utilities.calendar import Calendar
+from utilities.events import EventBus, FileSubscriber, HttpSubscriber, TaskStarted, TaskStopped, WorkdayStarted, \
+    WorkdayEnded, TasksAdded, TasksDeleted, TasksRenamed, TimeReassigned, SheetSwitched, BudgetCrossed
+from utilities.task_ops import parse_names, delete_tasks, rename_tasks, reassign_time
+from utilities.layout import empty_timesheet, add_days, is_compact, compact, add_tasks, memory_report
+from utilities.metrics import Metrics, instrumented
+from utilities.profiling import CommandProfiler
+from utilities.invoicing import invoice, parse_rate, parse_rates, format_rates, parse_rounding
+from utilities.budgets import BudgetTracker, parse_budgets, parse_budget, format_budgets, parse_thresholds, \
+    alert_message
+from utilities.reports import report_time_per_day, report_time_per_task, report_time_per_taskday, \
+    report_total_time, report_weekly, report_query, report_trends, report_intervals, report_overlaps, report_invoice, \
+    ReportCache
 
 VERSION = "3.0.1"
 CONFIG_PATH = ".config"
 STATE_PATH = "."
+METRICS_PATH = ".metrics"
 
 
-# TODO: Feature idea if a task is no longer used, can export the times to the baseline then delete it from the task list
 # TODO: Feature idea: export formatted reports (maybe csvs that are human readable) (does go against privacy principle
 # TODO: though
-def clear():
-    """
-    Global function that clears the command line
-    """
-    os.system('cls' if os.name == 'nt' else 'clear')
-
-
 class TimesheetManager:
-    def __init__(self, name=None, path=os.getcwd()):
+    def __init__(self, name=None, path=os.getcwd(), headless=False, clock=time.time, profiler=None):
+        """
+        Loads the Timesheet and runs the main menu
+        :param name: name of Timesheet; defaults to the default Timesheet
+        :param path: folder of the 'timesheets' folder
+        :param headless: only load the Timesheet, without menus or prompts, so that its operations can be called from
+        code (e.g. the simulator); a Timesheet that does not exist is created with the given name
+        :param clock: function returning the current time as a timestamp
+        :param profiler: CommandProfiler that profiles every menu command, see utilities.profiling
+        """
         self.__version__ = VERSION
+        self.headless = headless
+        self.clock = clock
+        self.UserInterface = HeadlessUserInterface if headless else UserInterface
+        self.metrics = Metrics(idle=lambda: UserInterface.idle)
+        self.commands = []  # (code, seconds) of every menu command run, see run()
+        self.profiler = profiler
+        self.version = 0  # bumped on every change of the data, so that cached reports are rebuilt
+        self.reports = ReportCache()
         self.path = pathjoin(path, "timesheets")
         os.makedirs(self.path, exist_ok=True)
         os.makedirs(CONFIG_PATH, exist_ok=True)
@@ -38,104 +70,200 @@ class TimesheetManager:
             self.create_config()
         default, tz = self.load_config()
         self.tz = tz
+        self.calendar = Calendar(self.tz, self.clock)
+        self.origin = load_origin(CONFIG_PATH)
+        try:
+            self.codec = storage.check_codec(self.load_config_value("storage") or "zlib")
+        except storage.StorageError as e:
+            raise storage.StorageError("{} (set in '{}')".format(e, pathjoin(CONFIG_PATH, "config.data")))
+        self.registries = {}  # task registries, by folder
+        self.events = EventBus()
+        if self.load_config_value("events_file") != "":
+            self.events.subscribe(FileSubscriber(self.load_config_value("events_file")))
+        if self.load_config_value("events_url") != "":
+            self.events.subscribe(HttpSubscriber(self.load_config_value("events_url")))
+        self.stores = {}  # unlocked encrypted Timesheets, by name
         if name is None:
             if default != "":
                 name = default
             else:
-                clear()
-                print("[SETUP] There is no default Timesheet set.  A temporary Timesheet will be created.")
-                print("\nIf you have not yet created a timesheet, or need to set your default timesheet,")
-                print("please do so in the 'Timesheet Management' menu.")
-                _ = input("\nPress ENTER to continue...")
+                if not headless:
+                    clear()
+                    print("[SETUP] There is no default Timesheet set.  A temporary Timesheet will be created.")
+                    print("\nIf you have not yet created a timesheet, or need to set your default timesheet,")
+                    print("please do so in the 'Timesheet Management' menu.")
+                    _ = ask("\nPress ENTER to continue...")
                 name = "TEMPORARY"
-        self.name = name
-        self.today = pendulum.today(tz=self.tz)
+        self.name = None  # nothing is loaded yet
         new = False
-        loaded = self.load_timesheet(self.name)
+        loaded = self.load_timesheet(name)
         if not loaded:
+            self.name = name
+        if not loaded and headless:
+            new = True
+            self.tasks = None
+            self.data = empty_timesheet(self.tasks)
+        elif not loaded:
             clear()
             print("[SETUP] The current default Timesheet does not exist.\nA temporary Timesheet will be created.")
             print("\nPlease change your default timesheet in the 'Timesheet Management' menu.")
-            _ = input("\nPress ENTER to continue...")
+            _ = ask("\nPress ENTER to continue...")
             name = "TEMPORARY"
             new = True
             self.tasks = None
-            self.data = pd.DataFrame(index=self.tasks)
+            self.data = empty_timesheet(self.tasks)
         self.init_configs()
         self.working_start = None
         self.work_day_allocated = 0
-        self.UI = UserInterface(name, new, self.today, VERSION)
+        self.UI = self.UserInterface(name, new, self.calendar.today, VERSION, self.tz)
 
         if ".state-{}".format(name) in os.listdir(STATE_PATH):
             task, start = self.load_state()
-            self.start_task_from_state(task, start)
+            try:
+                self.start_task_from_state(task, start)
+            except EOFError:  # the time is recorded, and the menus end at the end of the input as well
+                pass
         if ".state-{}-workday".format(name) in os.listdir(STATE_PATH):
             self.working_start, self.work_day_allocated = self.load_workday_state()
             self.UI.working = True
 
+        if not headless:
+            self.run()
+
+    @property
+    def today(self):
+        """
+        Today in the timezone of the Timesheet; follows the clock past midnight
+        """
+        return self.calendar.today()
+
+    def run(self):
+        """
+        Main menu loop.  Ends when the user quits, or at the end of the input, e.g. of a replayed script.  The time of
+        every command, without the time spent waiting for the user, is kept in self.commands.  With a profiler, every
+        command is profiled from showing the menu to showing the banner after it, without the time spent waiting.
+        """
         while True:
-            code, string = self.UI.ask_generic_input()
+            code = None
+            if self.profiler is not None:
+                self.profiler.start()
+            try:
+                code, string = self.UI.ask_generic_input()
+                start, idle = time.perf_counter(), UserInterface.idle
+                try:
+                    done = self.dispatch(code, string)
+                finally:
+                    seconds = max(0.0, time.perf_counter() - start - (UserInterface.idle - idle))
+                    self.metrics.observe("menu_{}".format(code), seconds)
+                    self.commands.append((code, seconds))
+                if done:
+                    break
+                self.UI.banner()  # places banner at top of each new page
+            except EOFError:
+                break
+            finally:
+                if self.profiler is not None:
+                    self.profiler.stop(code)
+        self.save_metrics()
+        self.events.close()
 
-            if code == '1':
-                self.start_task(string)
-            elif code == '2':
-                if string == 'start':
-                    self.start_workday()
-                else:
-                    self.add_workday()
-            elif code == '31':
-                self.time_per_task(string)
-            elif code == '32':
-                self.time_per_day(string)
-            elif code == '33':
-                self.time_per_taskday(*string)
-            elif code == '34':
-                self.total_time()
-            elif code == "35":
-                self.weekly_report()
-            elif code == '41':
-                self.list_tasks()
-            elif code == '43':
-                self.delete_task(string)
-            elif code == '42':
-                self.add_task(string)
-            elif code == '43':
-                self.delete_task(string)
-            elif code == '51':
-                self.list_timesheets()
-            elif code == '52':
-                self.create_new_timesheet(string)
-            elif code == '53':
-                loaded = self.load_timesheet(string)
-                if not loaded:
-                    print("Timesheet '{}' does not exist.".format(name))
+    def dispatch(self, code, string):
+        """
+        Runs the function of a menu selection
+        :param code: selection code, see UserInterface.ask_generic_input
+        :param string: task name or other answers of the selection, if applicable
+        :return: whether the user quits
+        """
+        if code == '1':
+            self.start_task(string)
+        elif code == '2':
+            if string == 'start':
+                self.start_workday()
+            else:
+                self.add_workday()
+        elif code == '31':
+            self.time_per_task(string)
+        elif code == '32':
+            self.time_per_day(string)
+        elif code == '33':
+            self.time_per_taskday(*string)
+        elif code == '34':
+            self.total_time()
+        elif code == "35":
+            self.weekly_report()
+        elif code == "36":
+            self.query(string)
+        elif code == "37":
+            self.trends()
+        elif code == "38":
+            self.intervals_at(string)
+        elif code == "39":
+            self.overlaps()
+        elif code == "310":
+            self.invoice(string)
+        elif code == '41':
+            self.list_tasks()
+        elif code == '42':
+            self.add_task(parse_names(string))
+        elif code == '43':
+            self.delete_task(parse_names(string))
+        elif code == '44':
+            self.retire_task(string)
+        elif code == '45':
+            self.retire_inactive_tasks(*string)
+        elif code == '46':
+            self.rename_task(string)
+        elif code == '47':
+            self.reassign_task_time(*string)
+        elif code == '51':
+            self.list_timesheets()
+        elif code == '52':
+            self.create_new_timesheet(string)
+        elif code == '53':
+            loaded = self.load_timesheet(string)
+            if not loaded:
+                print("Timesheet '{}' does not exist.".format(string))
+            self.UI.user_return()
+        elif code == '54':
+            self.delete_timesheet(string)
+        elif code == '55':
+            self.backup_timesheet(string)
+        elif code == '56':
+            self.save_config_default(string)
+        elif code == '59':
+            self.export()
+        elif code == '57':
+            self.set_baseline(string)
+        elif code == '58':
+            self.set_workweek(string)
+        elif code == '510':
+            self.export_sync(string)
+        elif code == '511':
+            self.import_sync(string)
+        elif code == '512':
+            self.encrypt_timesheet()
+        elif code == '513':
+            self.set_retention(*string)
+        elif code == '514':
+            self.set_rate(*string)
+        elif code == '515':
+            self.set_rounding(string)
+        elif code == '516':
+            self.set_budget(*string)
+        elif code == '7':
+            if self.working_start is not None:
+                self.UI.banner()
+                print("[WARNING] The workday is still running!  Please stop it before exiting.")
                 self.UI.user_return()
-            elif code == '54':
-                self.delete_timesheet(string)
-            elif code == '55':
-                self.backup_timesheet(string)
-            elif code == '56':
-                self.save_config_default(string)
-            elif code == '59':
-                self.export()
-            elif code == '57':
-                self.set_baseline(string)
-            elif code == '58':
-                self.set_workweek(string)
-            elif code == '7':
-                if self.working_start is not None:
-                    self.UI.banner()
-                    print("[WARNING] The workday is still running!  Please stop it before exiting.")
-                    self.UI.user_return()
-                else:
-                    sys.exit()
-            elif code == 'debug':
-                self.debug()
-
-            self.UI.banner()  # places banner at top of each new page
+            else:
+                return True
+        elif code == 'debug':
+            self.debug()
+        return False
 
     ################ File Management Functions ################
 
+    @instrumented("save")
     def save_timesheet(self, path, name, data):
         """
         Saves current active timesheet at specified path.
@@ -143,9 +271,90 @@ class TimesheetManager:
         :param name: name of Timesheet
         :param data: data of timesheet
         """
-        path = pathjoin(path, "{}.pkl".format(name))
-        pickle.dump(data, open(path, "wb"))
+        store = self._encrypted_store(name) if path == self.path else None
+        if store is not None:
+            written = store.bytes_written
+            store.save(data)
+            size = store.bytes_written - written
+            self.metrics.count("bytes_written", size)
+        else:
+            file = pathjoin(path, "{}.pkl".format(name))
+            storage.save(file, data, self.codec, self._registry(path))
+            size = os.path.getsize(file)
+            self.metrics.count("bytes_written", size)
+            if name == self.name:
+                self.metrics.gauge("sheet_bytes", size)
+        if name == self.name:
+            self.version += 1
+
+    def _read_timesheet(self, name):
+        """
+        Reads the data of a saved Timesheet, decrypting it if it is encrypted
+        :param name: name of Timesheet
+        :return: timesheet dataframe
+        """
+        store = self._encrypted_store(name)
+        if store is not None:
+            read = store.bytes_read
+            data = store.load()
+            self.metrics.count("bytes_read", store.bytes_read - read)
+            return data
+        path = pathjoin(self.path, "{}.pkl".format(name))
+        data = storage.load(path, self._registry(self.path))
+        self.metrics.count("bytes_read", os.path.getsize(path))
+        self.metrics.gauge("sheet_bytes", os.path.getsize(path))
+        return data
+
+    def _registry(self, path):
+        """
+        :param path: folder of Timesheets
+        :return: the task registry of the folder, read on first use
+        """
+        if path not in self.registries:
+            self.registries[path] = TaskRegistry(path)
+        return self.registries[path]
+
+    def _forget_names(self):
+        """
+        Rebuilds the task registry of the Timesheets folder with only the names of the unencrypted Timesheets, so that
+        the names of a Timesheet that was just encrypted are not left in it.  The other Timesheets are first saved with
+        their names and then again with the new ids, so that they load at every step.
+        """
+        registry = self._registry(self.path)
+        if not os.path.exists(registry.file):
+            return
+        names = [entry[:-4] for entry in os.listdir(self.path) if entry.endswith(".pkl")]
+        sheets = {name: storage.load(pathjoin(self.path, "{}.pkl".format(name)), registry) for name in names}
+        for name, data in sheets.items():
+            storage.save(pathjoin(self.path, "{}.pkl".format(name)), data, self.codec)
+        os.remove(registry.file)
+        del self.registries[self.path]
+        for name, data in sheets.items():
+            self.save_timesheet(self.path, name, data)
+
+    def _encrypted_store(self, name):
+        """
+        Returns the unlocked store of an encrypted Timesheet, asking for its passphrase the first time
+        :param name: name of Timesheet
+        :return: EncryptedStore, or None if the Timesheet is not encrypted
+        """
+        if name in self.stores:
+            return self.stores[name]
+        if not os.path.isdir(pathjoin(self.path, name + ENCRYPTED_SUFFIX)):
+            return None
+        store = EncryptedStore(self.path, name)
+        passphrase = os.environ.get("PYMESHEET_PASSPHRASE")
+        if passphrase is None:
+            passphrase = UserInterface.ask_passphrase(name)
+        store.unlock(passphrase)
+        self.stores[name] = store
+        return store
 
+    def _timesheet_exists(self, name):
+        return "{}.pkl".format(name) in os.listdir(self.path) or \
+               os.path.isdir(pathjoin(self.path, name + ENCRYPTED_SUFFIX))
+
+    @instrumented("load")
     def load_timesheet(self, name, only_data=False):
         """
         Loads a timesheet and sets all the parameters of this class to deal with the new timesheet
@@ -153,15 +362,18 @@ class TimesheetManager:
         :return: False if file not found error, True if loaded, or data if asking for data
         """
         if name != "":
-            path = pathjoin(self.path, "{}.pkl".format(name))
             if not only_data:
                 try:
-                    self.data = pickle.load(open(path, "rb"))
-                    self.name = name
+                    self.data = self._read_timesheet(name)
+                    previous, self.name = self.name, name
+                    if not is_compact(self.data):  # migrate Timesheets saved before the compact layout
+                        self.data = compact(self.data)
+                        self.save_timesheet(self.path, self.name, self.data)
                     self.working_start = None
                     self.work_day_allocated = 0
-                    self.UI = UserInterface(name, False, self.today, VERSION)
+                    self.UI = self.UserInterface(name, False, self.calendar.today, VERSION, self.tz)
                     self.init_configs()
+                    self.events.emit(SheetSwitched(name, previous))
                     print("{} Timesheet loaded.".format(name))
 
                     if ".state-{}".format(name) in os.listdir(STATE_PATH):
@@ -171,10 +383,13 @@ class TimesheetManager:
                         self.working_start, self.work_day_allocated = self.load_workday_state()
                 except FileNotFoundError:
                     return False
+                except DecryptionError as e:
+                    print("[ERROR] {}".format(e))
+                    return False
             else:
                 try:
-                    return pickle.load(open(path, "rb"))
-                except FileNotFoundError:
+                    return self._read_timesheet(name)
+                except (FileNotFoundError, DecryptionError):
                     return False
         return True
 
@@ -188,18 +403,22 @@ class TimesheetManager:
         if name != "":
             decision = None
             while decision not in ["y", "n"]:
-                decision = input("[WARNING] Confirm DELETION of Timesheet '{}' [y/n]: ".format(name)).lower()
+                decision = ask("[WARNING] Confirm DELETION of Timesheet '{}' [y/n]: ".format(name)).lower()
             if decision == "y":
-                if "{}.pkl".format(name) in os.listdir(self.path):
-                    if name == self.name:
+                if self._timesheet_exists(name):
+                    if os.path.isdir(pathjoin(self.path, name + ENCRYPTED_SUFFIX)):
+                        rmtree(pathjoin(self.path, name + ENCRYPTED_SUFFIX))
+                        self.stores.pop(name, None)
+                    else:
                         os.remove(pathjoin(self.path, name + ".pkl"))
+                    if name == self.name:
                         print("[WARNING] Deleting current Timesheet, new current Timesheet will be the default.")
-                        _ = input("\nPress ENTER to continue...")
+                        _ = ask("\nPress ENTER to continue...")
                         loaded = self.load_timesheet(self.load_config()[0])
                         if not loaded:
                             self.UI.banner()
                             print("[WARNING] No default Timesheet set, creating a temporary...")
-                            _ = input("\nPress ENTER to acknowledge...")
+                            _ = ask("\nPress ENTER to acknowledge...")
                             self.create_new_timesheet("TEMPORARY")
                     self.UI.banner()
                     print("'{}' deleted.".format(name))
@@ -222,6 +441,9 @@ class TimesheetManager:
             if timesheet[-4:] == '.pkl':
                 print("\t({}) {}".format(i, timesheet.split('.')[0]))  # remove the .pkl extension in printing
                 i += 1
+            elif timesheet.endswith(ENCRYPTED_SUFFIX):
+                print("\t({}) {} (encrypted)".format(i, timesheet[:-len(ENCRYPTED_SUFFIX)]))
+                i += 1
         self.UI.user_return()
 
     def backup_timesheet(self, name):
@@ -232,11 +454,15 @@ class TimesheetManager:
         """
         path = pathjoin(self.path, ".backup")
         os.makedirs(path, exist_ok=True)
-        data = self.load_timesheet(name, only_data=True)
-        if type(data) == bool:
+        encrypted = pathjoin(self.path, name + ENCRYPTED_SUFFIX)
+        data = True if os.path.isdir(encrypted) else self.load_timesheet(name, only_data=True)
+        if type(data) == bool and data is False:
             print("Timesheet '{}' does not exist.".format(name))
         else:
-            self.save_timesheet(path, name, data)
+            if os.path.isdir(encrypted):  # backups of encrypted Timesheets stay encrypted
+                copytree(encrypted, pathjoin(path, name + ENCRYPTED_SUFFIX), dirs_exist_ok=True)
+            else:
+                self.save_timesheet(path, name, data)
 
             if "{}-config.data".format(self.name) in os.listdir(CONFIG_PATH):
                 os.makedirs(pathjoin(path, ".config"), exist_ok=True)
@@ -252,18 +478,19 @@ class TimesheetManager:
         :param name: Name of new timesheet
         """
         self.UI.banner()
-        if "{}.pkl".format(name) in os.listdir(self.path):
+        if self._timesheet_exists(name):
             print("Timesheet '{}' already exists.".format(name))
             self.UI.user_return()
         else:
             if name != "":
-                self.name = name
+                previous, self.name = self.name, name
                 new = True
                 self.tasks = None
-                self.data = pd.DataFrame(index=self.tasks)
-                self.UI = UserInterface(name, new, self.today, VERSION)
+                self.data = empty_timesheet(self.tasks)
+                self.UI = self.UserInterface(name, new, self.calendar.today, VERSION, self.tz)
                 self.working_start = None
                 self.init_configs()
+                self.events.emit(SheetSwitched(name, previous))
                 print("New Timesheet with the name '{}' loaded.".format(name))
                 self.UI.user_return()
 
@@ -272,9 +499,9 @@ class TimesheetManager:
         Exports data to csv after confirmation dialog
         """
         self.UI.banner()
-        export = input("[WARNING] Exporting times from the current Timesheet will allow \n"
-                       "anyone to view the data without the need for unpickling.\n\n"
-                       "Do you wish to continue? [y/n]...")
+        export = ask("[WARNING] Exporting times from the current Timesheet will allow \n"
+                     "anyone to view the data without the need for unpickling.\n\n"
+                     "Do you wish to continue? [y/n]...")
         if export.lower() == 'y':
             self.UI.banner()
             print("Exporting Timesheet '{}' to '{}.csv'".format(self.name, self.name))
@@ -290,8 +517,110 @@ class TimesheetManager:
             print("[WARNING] Invalid input...not exporting.")
             self.UI.user_return()
 
+    @instrumented("sync_export")
+    def export_sync(self, path):
+        """
+        Exports the time recorded since the last export to a delta file, to be imported in another copy of this
+        Timesheet
+        :param path: path of the delta file; defaults to '<name>.delta'
+        """
+        self.UI.banner()
+        if path == "":
+            path = "{}.delta".format(self.name)
+        try:
+            count = self.journal.export(path)
+        except OSError as e:
+            print("[ERROR] Could not write '{}': {}".format(path, e))
+            self.UI.user_return()
+            return
+        self.metrics.count("bytes_written", os.path.getsize(path))
+        print("Exported {} new interval(s) of Timesheet '{}' to '{}'.".format(count, self.name, path))
+        self.UI.user_return()
+
+    @instrumented("sync_import")
+    def import_sync(self, path):
+        """
+        Merges a delta file exported by another copy of this Timesheet.  Intervals that are already known are skipped.
+        :param path: path of the delta file
+        """
+        self.UI.banner()
+        try:
+            header, entries = self.journal.read_delta(path)
+            self.metrics.count("bytes_read", os.path.getsize(path))
+        except (OSError, ValueError) as e:
+            print("[ERROR] Could not read '{}': {}".format(path, e))
+            self.UI.user_return()
+            return
+        if header["sheet"] != self.name:
+            print("[WARNING] '{}' was exported from Timesheet '{}', not '{}'.".format(path, header["sheet"], self.name))
+        intervals = [entry for entry in entries if "op" not in entry]
+        missing = sorted(set(entry["task"] for entry in intervals) - set(self.data.index))
+        if len(missing) > 0:
+            self.data = add_tasks(self.data, missing)
+            for task in missing:
+                self.tree.add(task)
+        self._add_day(*[entry["day"] for entry in intervals])
+        for entry in entries:
+            if entry.get("op") == "rename":
+                renames = {old: new for old, new in entry["renames"].items() if old in self.data.index}
+                if len(renames) > 0:
+                    self._rename(renames)
+                continue
+            elif entry.get("op") == "reassign":
+                if entry["source"] in self.data.index:
+                    self._reassign(entry["source"], entry["target"], entry["start"], entry["end"])
+                continue
+            if entry["task"] not in self.data.index:  # renamed by an operation before it
+                self.data = add_tasks(self.data, [entry["task"]])
+            self.data.at[entry["task"], entry["day"]] += entry["seconds"]
+            self.tree.add(entry["task"], entry["seconds"])
+            self.analytics.record(entry["day"], entry["seconds"])
+            self._check_budgets(entry["task"], entry["day"], entry["seconds"])
+        self.journal.accept(entries)
+        self.intervals = None
+        self.save_timesheet(self.path, self.name, self.data)
+        print("Merged {} new interval(s) into Timesheet '{}'.".format(len(intervals), self.name))
+        if len(intervals) < len(entries):
+            print("Applied {} renaming(s) and move(s) of time.".format(len(entries) - len(intervals)))
+        self._show_alerts()
+        self.UI.user_return()
+
+    def encrypt_timesheet(self):
+        """
+        Converts the current Timesheet to encrypted storage.  The unencrypted file is removed once the encrypted
+        copy has been read back successfully.
+        """
+        self.UI.banner()
+        if not encryption.available():
+            print("[ERROR] Encrypted Timesheets require the 'cryptography' package (pip install cryptography).")
+        elif self._encrypted_store(self.name) is not None:
+            print("Timesheet '{}' is already encrypted.".format(self.name))
+        else:
+            passphrase = UserInterface.ask_passphrase(self.name, confirm=True)
+            if passphrase is None:
+                print("[WARNING] The passphrases did not match...not encrypting.")
+            else:
+                store = EncryptedStore(self.path, self.name)
+                store.unlock(passphrase)
+                store.save(self.data)
+                if store.load().equals(self.data.reindex(columns=sorted(self.data.columns))):
+                    self.stores[self.name] = store
+                    if os.path.exists(pathjoin(self.path, "{}.pkl".format(self.name))):
+                        os.remove(pathjoin(self.path, "{}.pkl".format(self.name)))
+                    encrypt_archive(self.path, self.name, store)
+                    self.journal = self.journal.move_to(store)
+                    self._forget_names()
+                    print("Timesheet '{}' is now encrypted.  Do not lose the passphrase, it cannot be "
+                          "recovered.".format(self.name))
+                    print("Backups made before now are not encrypted.")
+                else:
+                    rmtree(store.folder)
+                    print("[ERROR] The encrypted copy could not be verified...not encrypting.")
+        self.UI.user_return()
+
     ################ State Functions ################
 
+    @instrumented("state_io")
     def create_state(self, task, start):
         """
         Creates a hidden state file with the current task and time being recording so it can be started again in
@@ -300,8 +629,9 @@ class TimesheetManager:
         :param start: starting time of task
         """
         with open(pathjoin(STATE_PATH, ".state-{}".format(self.name)), "w") as state:
-            state.write("{}={}".format(task, start))
+            self.metrics.count("bytes_written", state.write("{}={}".format(task, start)))
 
+    @instrumented("state_io")
     def create_workday_state(self):
         """
         Creates a hidden state file with the time the workday was started and also allocated time so the workday
@@ -309,36 +639,45 @@ class TimesheetManager:
         startup.
         """
         with open(pathjoin(STATE_PATH, ".state-{}-workday".format(self.name)), "w") as state:
-            state.write("{}={}".format(self.working_start, self.work_day_allocated))
+            written = state.write("{}={}".format(self.working_start, self.work_day_allocated))
+            self.metrics.count("bytes_written", written)
 
+    @instrumented("state_io")
     def load_workday_state(self):
         """
         Loads the workday information in the saved state file
         :return: workday time and allocated time
         """
         with open(pathjoin(STATE_PATH, ".state-{}-workday".format(self.name)), "r") as state:
-            old = state.read().split("=")
+            old = state.read()
+            self.metrics.count("bytes_read", len(old))
+            old = old.split("=")
             workday = float(old[0])
             allocated = float(old[1])
         return workday, allocated
 
+    @instrumented("state_io")
     def load_state(self):
         """
         Loads the information in the saved state file
         :return: the task and start time of the info in the file
         """
         with open(pathjoin(STATE_PATH, ".state-{}".format(self.name)), "r") as state:
-            old = state.read().split("=")
+            old = state.read()
+            self.metrics.count("bytes_read", len(old))
+            old = old.split("=")
             task = old[0]
             start = float(old[1])
         return task, start
 
+    @instrumented("state_io")
     def delete_state(self):
         """
         Deletes the state file
         """
         os.remove(pathjoin(STATE_PATH, ".state-{}".format(self.name)))
 
+    @instrumented("state_io")
     def delete_workday_state(self):
         """
         Deletes the workday state file
@@ -388,6 +727,8 @@ class TimesheetManager:
         if "{}-config.data".format(self.name) not in os.listdir(CONFIG_PATH):  # create it if it doesn't exist
             with open(pathjoin(CONFIG_PATH, "{}-config.data".format(self.name)), "w") as config:
                 config.write("[{}]".format(self.name))
+        with open(pathjoin(CONFIG_PATH, "{}-config.data".format(self.name)), "r") as config:
+            extra = [line for line in config.readlines()[1:] if line[:8] not in ["workweek", "baseline"]]
         with open(pathjoin(CONFIG_PATH, "{}-config.data".format(self.name)), "w") as config:
             if workweek_hours == None:
                 workweek_hours = ""
@@ -396,11 +737,42 @@ class TimesheetManager:
             config.write("[{}]".format(self.name))
             config.write("\nworkweek={}".format(workweek_hours))
             config.write("\nbaseline={}".format(baseline))
+            for line in extra:  # keep any other settings of this timesheet
+                config.write("\n" + line.rstrip("\n"))
+
+    def save_config_timesheet_value(self, key, value):
+        """
+        Saves a single timesheet specific setting, keeping all other settings the same
+        :param key: name of the setting
+        :param value: value of the setting
+        """
+        self.save_config_timesheet(self.workweek, self.baseline)
+        with open(pathjoin(CONFIG_PATH, "{}-config.data".format(self.name)), "r") as config:
+            lines = [line.rstrip("\n") for line in config.readlines() if line.split("=")[0] != key]
+        lines.append("{}={}".format(key, value))
+        with open(pathjoin(CONFIG_PATH, "{}-config.data".format(self.name)), "w") as config:
+            config.write("\n".join(lines))
+
+    def load_config_timesheet_value(self, key):
+        """
+        Loads a single timesheet specific setting
+        :param key: name of the setting
+        :return: value of the setting, or "" if it is not set
+        """
+        try:
+            with open(pathjoin(CONFIG_PATH, "{}-config.data".format(self.name)), "r") as config:
+                for line in config.readlines():
+                    if line.split("=")[0] == key:
+                        return line.split("=", 1)[1].rstrip("\n")
+        except FileNotFoundError:
+            pass
+        return ""
 
     def load_config_timesheet(self):
         """
         Loads in timesheet specific config information
         """
+        workweek_line, baseline_line = "workweek=", "baseline="  # a missing line is an unset setting
         with open(pathjoin(CONFIG_PATH, "{}-config.data".format(self.name)), "r") as config:
             for line in config.readlines():
                 if line[:8] == "workweek":
@@ -409,12 +781,25 @@ class TimesheetManager:
                     baseline_line = line
             workweek = workweek_line.split("=")[1]
             baseline = baseline_line.split("=")[1]
-        return workweek[:-1], baseline  # to -2 to avoid \n
+        return workweek.rstrip("\n"), baseline.rstrip("\n")
+
+    def load_config_value(self, key):
+        """
+        Loads a single setting of the program config
+        :param key: name of the setting
+        :return: value of the setting, or "" if it is not set
+        """
+        with open(pathjoin(CONFIG_PATH, "config.data"), "r") as config:
+            for line in config.readlines():
+                if line.split("=")[0] == key:
+                    return line.split("=", 1)[1].rstrip("\n")
+        return ""
 
     def load_config(self):
         """
         Loads config file
         """
+        default_line, tz_line = "default_timesheet=", "tz=local"  # a missing line is an unset setting
         with open(pathjoin(CONFIG_PATH, "config.data"), "r") as config:
             for line in config.readlines():
                 if line[:7] == "default":
@@ -423,7 +808,7 @@ class TimesheetManager:
                     tz_line = line
             default = default_line.split("=")[1]
             tz = tz_line.split("=")[1]
-        return default[:-1], tz  # to -2 to avoid \n
+        return default.rstrip("\n"), tz.rstrip("\n")
 
     def set_baseline(self, baseline):
         """
@@ -434,6 +819,7 @@ class TimesheetManager:
         self.save_config_timesheet(self.workweek, baseline)
         print("Baseline saved for Timesheet '{}'.".format(self.name))
         self.baseline = baseline
+        self.version += 1
         self.UI.user_return()
 
     def set_workweek(self, workweek):
@@ -447,6 +833,7 @@ class TimesheetManager:
         else:
             self.workweek = ""
         self.save_config_timesheet(workweek, self.baseline)
+        self.version += 1
         print("Workweek saved for Timesheet '{}'.".format(self.name))
         self.UI.user_return()
 
@@ -464,6 +851,79 @@ class TimesheetManager:
         except FileNotFoundError:
             self.workweek = ""
             self.baseline = ""
+        store = self._encrypted_store(self.name)
+        self.archived = load_archived_totals(self.path, self.name, store)
+        retire_after = self.load_config_timesheet_value("retire_after")
+        if retire_after != "" and len(self.data.index) > 0:
+            self._retire(find_inactive_tasks(self.data, self.today.subtract(days=int(retire_after)).to_date_string()))
+        self.rollup = load_rollup(self.path, self.name, store)
+        retention = self.load_config_timesheet_value("retention")
+        if retention != "":
+            self._roll_up(int(retention), self.load_config_timesheet_value("rollup") or "month")
+        self.build_task_tree()
+        self.build_analytics()
+        self.build_budgets()
+        self.journal = Journal(self.path, self.name, self.origin, store)
+        self.intervals = None  # built from the journal on first use
+
+    def build_task_tree(self):
+        """
+        Builds the roll-up totals of the Task hierarchy from the Timesheet, its rolled-up history, and the archived
+        totals
+        """
+        totals = dict(self.archived)
+        for task, seconds in self.rollup["totals"].sum(axis=1).items():
+            totals[task] = totals.get(task, 0) + int(seconds)
+        for task, seconds in self.data.sum(axis=1).items():
+            totals[task] = totals.get(task, 0) + seconds
+        self.tree = TaskTree.build(totals.items())
+        self.version += 1
+
+    def build_analytics(self):
+        """
+        Builds the time per day over the whole history, including retired Tasks, for the trends
+        """
+        retired = load_archived_rows(self.path, self.name, self._encrypted_store(self.name))
+        self.analytics = Analytics.from_data(self.data, retired, rolled=self.rollup["totals"])
+        self.version += 1
+
+    def build_budgets(self):
+        """
+        Fills the budget counters with the time of their current periods.  A budget setting that cannot be read is
+        warned about when setting a budget, and until then no budgets are checked.
+        """
+        history = pd.Series(self.archived, dtype="int64").add(self.rollup["totals"].sum(axis=1), fill_value=0)
+        try:
+            budgets = parse_budgets(self.load_config_timesheet_value("budgets"))
+            thresholds = parse_thresholds(self.load_config_timesheet_value("budget_alerts"))
+        except ValueError:
+            budgets, thresholds = [], []
+        self.budgets = BudgetTracker.from_data(budgets, self.data, self.calendar.day_key(), thresholds, history)
+        self.alerts = []  # alerts not shown yet
+
+    def _show_alerts(self):
+        """
+        Prints the budget alerts that fired since they were last shown
+        """
+        if len(self.alerts) > 0:
+            print("")
+        for alert in self.alerts:
+            print(alert_message(alert, self.name))
+        self.alerts = []
+
+    def _budget_tick(self, task):
+        """
+        :param task: task of the running timer
+        :return: function called by the timer with the seconds it has been running; returns the messages of the
+                 budget alerts that fired
+        """
+        def tick(running):
+            alerts = self.budgets.check(task, self.calendar.day_key(), running)
+            for alert in alerts:
+                self.events.emit(BudgetCrossed(self.name, *alert))
+            return [alert_message(alert, self.name) for alert in alerts]
+
+        return tick if len(self.budgets) > 0 else None
 
     ################ Logging Functions ################
 
@@ -477,7 +937,7 @@ class TimesheetManager:
         if task_name != "":
             if task_name not in self.data.index:
                 self.UI.banner()
-                add = input(
+                add = ask(
                     "[WARNING] '{}' is not in the list of Tasks...would you like to add it? [y/n]...".format(task_name))
                 if add.lower() == 'y':
                     self.add_task(task_name, suppress=True)
@@ -489,64 +949,115 @@ class TimesheetManager:
                     go_on = False
                     self.UI.user_return()
             if go_on:
-                if self.today.to_date_string() not in self.data.columns:
-                    self.data[self.today.to_date_string()] = 0
-                start_time = time.time()
+                self._add_day(self.calendar.day_key())
+                start_time = self.clock()
                 # Save the state in case of crashes:
                 self.create_state(task_name, start_time)
+                self.events.emit(TaskStarted(self.name, task_name, start_time))
                 # Start the UI logging time, once stopped through the UI, record the time
-                self.UI.timelogger(task_name)
+                try:
+                    self.UI.timelogger(task_name, tick=self._budget_tick(task_name))
+                except EOFError:  # the input ended, e.g. a replayed script; the timer ends with it
+                    self._end_task(task_name, start_time, wait=False)
+                    raise
                 self._end_task(task_name, start_time)
 
     def start_task_from_state(self, task_name, start):
         """
         Starts recording time on the given task and then adds on previously recorded time.
 
-        ASSUMES TASK WAS CONTINUED CONTINUOUSLY FROM INITIAL START
-        # TODO: Allow resuming task on a different day
+        ASSUMES TASK WAS CONTINUED CONTINUOUSLY FROM INITIAL START; time past midnight goes to the following days
         :param task_name: task to resume
         :param start: old starting time
         """
-        if self.today.to_date_string() not in self.data.columns:
-            self.data[self.today.to_date_string()] = 0
-        self.UI.timelogger(task_name, start)
+        self._add_day(self.calendar.day_key())
+        try:
+            self.UI.timelogger(task_name, start, tick=self._budget_tick(task_name))
+        except EOFError:  # the input ended, e.g. a replayed script; the timer ends with it
+            self._end_task(task_name, start, wait=False)
+            raise
         self._end_task(task_name, start)
 
-    def _end_task(self, name, start_time):
+    def _end_task(self, name, start_time, wait=True):
         """
         Quietly called from start_task.  Ends the task and records the time by adding it to the time already recorded
         for that task
         :param name: task to record
+        :param wait: wait for the user before returning; not when the input has ended
         """
         self.UI.banner()
-        time_worked = int(time.time() - start_time)  # do not care about ms
-        self.data.at[name, self.today.to_date_string()] += time_worked
+        end_time = self.clock()
+        time_worked = int(end_time - start_time)  # do not care about ms
+        for day, seconds, first, last in self.calendar.split(start_time, end_time):  # split at midnight
+            self._record(name, day, seconds, first, last)
+        self.events.emit(TaskStopped(self.name, name, self.calendar.day_key(), time_worked, start_time, end_time))
         print("Logging of Task '{}' stopped...".format(name))
         self.save_timesheet(self.path, self.name, self.data)
         print("Time successfully recorded!")
+        self._show_alerts()
         self.delete_state()
         if self.working_start:
             if name != "General":
                 self.work_day_allocated += time_worked
                 self.create_workday_state()
-        self.UI.user_return()
-        self.UI.banner()
+        if wait:
+            self.UI.user_return()
+            self.UI.banner()
+
+    def _record(self, task, day, seconds, start, end):
+        """
+        Records time in the data, the roll-up totals, and the journal.  Does not save the Timesheet.
+        :param task: task to record
+        :param day: day to record on (YYYY-MM-DD)
+        :param seconds: seconds worked
+        :param start: timestamp the interval started at
+        :param end: timestamp the interval ended at
+        """
+        self._add_day(day)
+        self.data.at[task, day] += seconds
+        self.tree.add(task, seconds)
+        self.analytics.record(day, seconds)
+        self.journal.append(task, day, seconds, start, end)
+        if self.intervals is not None:
+            self.intervals.add(task, day, seconds, start, end)
+        self._check_budgets(task, day, seconds)
+
+    def _check_budgets(self, task, day, seconds):
+        """
+        Adds recorded time to the budget counters, and keeps the alerts that fired to be shown
+        """
+        alerts = self.budgets.record(task, day, seconds)
+        for alert in alerts:
+            self.events.emit(BudgetCrossed(self.name, *alert))
+        self.alerts += alerts
+
+    def _add_day(self, *days):
+        """
+        Adds empty columns for the days that are not in the data yet
+        :param days: date strings
+        """
+        new = [day for day in pd.unique(pd.Index(days, dtype=object)) if day not in self.data.columns]
+        if len(new) > 0:
+            self.data = add_days(self.data, new)
+            self.version += 1
 
     def start_workday(self):
         """
         Starts recording all time until deactivated.
         """
-        self.working_start = time.time()
+        self.working_start = self.clock()
         self.create_workday_state()
+        self.events.emit(WorkdayStarted(self.name, self.working_start))
 
     def add_workday(self):
         """
         Adds to task "general" all the time during the workday that was not already assigned to a task.
         """
-        work_time = time.time() - self.working_start
+        end_time = self.clock()
+        start_time = self.working_start
+        work_time = end_time - start_time
         self.UI.banner()
-        if self.today.to_date_string() not in self.data.columns:
-            self.data[self.today.to_date_string()] = 0
+        self._add_day(self.calendar.day_key())
         if "General" not in self.data.index:
             print("No Task exists to log general work time...creating Task 'General'")
             self.add_task("General")
@@ -560,19 +1071,43 @@ class TimesheetManager:
             self.UI.user_return()
         else:
             self.UI.banner()
-            self.data.at["General", self.today.to_date_string()] += int(workday)  # do not care about ms
-            work_time_mins = Converter.sec2min(work_time)
-            work_time_hours, work_time_mins = Converter.min2hour(work_time_mins)
-            work_hour_min_string = Converter.convert2string(int(work_time_hours), int(work_time_mins))
-            mins = Converter.sec2min(workday)
-            hours, mins = Converter.min2hour(mins)
-            hour_min_string = Converter.convert2string(int(hours), int(mins))
-            print("Total hours accumulated during the this work day: {}".format(work_hour_min_string))
-            print("Total hours set as general tasks during this period: {}".format(hour_min_string))
+            for day, seconds, first, last in self._split_fill(start_time, end_time, int(workday)):  # no ms
+                self._record("General", day, seconds, first, last)
+            self.events.emit(WorkdayEnded(self.name, self.calendar.day_key(), start_time, end_time, workday))
+            print("Total hours accumulated during the this work day: {}".format(Duration(work_time).hours_minutes()))
+            print("Total hours set as general tasks during this period: {}".format(Duration(workday).hours_minutes()))
             print("\nWork day ended!")
+            self._show_alerts()
             self.save_timesheet(self.path, self.name, self.data)
             self.UI.user_return()
 
+    def _split_fill(self, start, end, seconds):
+        """
+        Splits the general time of a workday at midnight.  Every day gets a share of the general time in proportion
+        to its time that was not logged on other Tasks, so the shares add up to the general time.
+        :param start: timestamp the workday started at
+        :param end: timestamp the workday ended at
+        :param seconds: general time of the workday
+        :return: list of (date string, seconds, start, end)
+        """
+        pieces = self.calendar.split(start, end)
+        if len(pieces) == 1:
+            return [(pieces[0][0], seconds, start, end)]
+        free = []
+        for day, span, first, last in pieces:
+            logged = sum(min(interval[4], last) - max(interval[3], first)
+                         for interval in self.interval_index().overlapping(first, last)
+                         if not IntervalIndex.is_fill(interval))
+            free.append(max(0, span - logged))
+        if sum(free) == 0:
+            free = [span for _, span, _, _ in pieces]
+        shares, done, total = [], 0, 0
+        for share in free:  # rounded cumulatively, so the shares add up to the general time
+            total += share
+            shares.append(round(seconds * total / sum(free)) - done)
+            done += shares[-1]
+        return [(day, share, first, last) for (day, _, first, last), share in zip(pieces, shares)]
+
     ################ Task Functions ################
 
     def list_tasks(self):
@@ -585,32 +1120,168 @@ class TimesheetManager:
             print("\t({}) {}".format(i + 1, task))
         self.UI.user_return()
 
+    @instrumented("add_task")
     def add_task(self, task_name, suppress=False):
         """
-        Adds task to the dataframe by adding it to the index.  If the task already exists, it exits.
-        Can take string or [str].
-        :param task_name: name of task to add
+        Adds tasks to the dataframe by adding them to the index.  Tasks that already exist are skipped.
+        Can take string or [str]; all new tasks are added at once and saved once.
+        :param task_name: name of task to add, or list of names
         :param suppress: suppresses user blocking input
         """
         self.UI.banner()
-        if task_name in self.data.index:
-            print("Task '{}' already in Timesheet '{}'.".format(task_name, self.name))
+        if type(task_name) == str:
+            task_name = [task_name] if task_name != "" else []
+        existing = [task for task in task_name if task in self.data.index]
+        new = [task for task in task_name if task not in self.data.index]
+        for task in existing:
+            print("Task '{}' already in Timesheet '{}'.".format(task, self.name))
+        if len(new) > 0:
+            self.data = add_tasks(self.data, new)
+            for task in new:
+                self.tree.add(task)
+            self.save_timesheet(self.path, self.name, self.data)
+            self.events.emit(TasksAdded(self.name, new))
+            if len(new) == 1:
+                print("Task '{}' created.".format(new[0]))
+            else:
+                print("{} Tasks created.".format(len(new)))
+        if len(existing) > 0 or (len(new) > 0 and not suppress):
             self.UI.user_return()
-        else:
-            if task_name != "":
-                if type(task_name) == str:
-                    task_name = [task_name]
-                new_task = pd.DataFrame(index=task_name)
-                self.data = self.data.append(new_task, verify_integrity=True, sort=False)
-                print("Task '{}' created.".format(task_name[0]))
-                self.data.fillna(0, inplace=True)
-                self.save_timesheet(self.path, self.name, self.data)
-                if not suppress: self.UI.user_return()
 
+    @instrumented("delete_task")
     def delete_task(self, task_name):
         """
-        Deletes task from the data.  If it doesn't exist, it does nothing.
-        :param task_name: task to delete
+        Deletes tasks from the data.  Tasks that don't exist are skipped.
+        Can take string or [str]; all tasks are dropped at once and saved once.
+        :param task_name: task to delete, or list of tasks
+        """
+        self.UI.banner()
+        if type(task_name) == str:
+            task_name = [task_name] if task_name != "" else []
+        if len(task_name) == 0:
+            return
+        tasks = [task for task in task_name if task in self.data.index]
+        for task in task_name:
+            if task not in self.data.index:
+                print("'{}' task not in database.".format(task))
+        if len(tasks) > 0:
+            self.data = delete_tasks(self.data, tasks)
+            rolled = [task for task in tasks if task in self.rollup["totals"].index]
+            if len(rolled) > 0:  # their rolled-up history goes as well
+                self.rollup["totals"] = delete_tasks(self.rollup["totals"], rolled)
+                save_rollup(self.path, self.name, self.rollup, self._encrypted_store(self.name))
+            self.build_task_tree()
+            self.build_analytics()
+            self.build_budgets()
+            self.save_timesheet(self.path, self.name, self.data)
+            self.events.emit(TasksDeleted(self.name, tasks))
+            if len(tasks) == 1:
+                print("Task '{}' successfully deleted.".format(tasks[0]))
+            else:
+                print("{} Tasks successfully deleted.".format(len(tasks)))
+        self.UI.user_return()
+
+    @instrumented("rename_task")
+    def rename_task(self, renames):
+        """
+        Renames tasks.  Renaming a task to an existing task, or several tasks to the same name, merges them by adding
+        up their time.  All renames are applied at once and saved once.
+        :param renames: dictionary of old name to new name
+        """
+        self.UI.banner()
+        if len(renames) == 0:
+            return
+        valid = {}
+        for old, new in renames.items():
+            if old not in self.data.index:
+                print("'{}' task not in database.".format(old))
+            elif old != new:
+                valid[old] = new
+        if len(valid) > 0:
+            targets = list(valid.values())
+            for old, new in valid.items():
+                if new in self.data.index or targets.count(new) > 1:
+                    print("Task '{}' merged into '{}'.".format(old, new))
+                else:
+                    print("Task '{}' renamed to '{}'.".format(old, new))
+            self._rename(valid)
+            self.journal.rename(valid)
+            self.events.emit(TasksRenamed(self.name, valid))
+            self.save_timesheet(self.path, self.name, self.data)
+        self.UI.user_return()
+
+    def _rename(self, renames):
+        """
+        Renames tasks in the data and the rolled-up history.  Does not journal the renames or save the Timesheet.
+        :param renames: dictionary of old name to new name
+        """
+        self.data = rename_tasks(self.data, renames)
+        if self.rollup["totals"].shape[0] > 0:
+            self.rollup["totals"] = rename_tasks(self.rollup["totals"], renames)
+            save_rollup(self.path, self.name, self.rollup, self._encrypted_store(self.name))
+        self.intervals = None
+        self.build_task_tree()
+        self.build_budgets()
+
+    @instrumented("reassign_time")
+    def reassign_task_time(self, source, target, start="", end=""):
+        """
+        Moves the time logged on one task to another task, e.g. time that was logged on the wrong task.  The target
+        task is created if it does not exist.
+        :param source: task to take the time from
+        :param target: task to give the time to
+        :param start: first day (YYYY-MM-DD), "" for the first day of the Timesheet
+        :param end: last day (YYYY-MM-DD), "" for the last day of the Timesheet
+        """
+        self.UI.banner()
+        if source not in self.data.index:
+            if source != "":
+                print("'{}' task not in database.".format(source))
+                self.UI.user_return()
+        elif target == "" or target == source:
+            print("[WARNING] Invalid target Task...not moving any time.")
+            self.UI.user_return()
+        else:
+            if target not in self.data.index:
+                print("Task '{}' created.".format(target))
+            moved = self._reassign(source, target, start or None, end or None)
+            self.journal.reassign(source, target, start or None, end or None)
+            self.events.emit(TimeReassigned(self.name, source, target, moved, start or None, end or None))
+            self.save_timesheet(self.path, self.name, self.data)
+            print("Moved {} from Task '{}' to Task '{}'.".format(Duration(moved).short(), source, target))
+            if (start, end) != ("", "") and start < self.rollup["cutoff"] and source in self.rollup["totals"].index:
+                print("The rolled-up history before {} stays on Task '{}'.".format(self.rollup["cutoff"], source))
+            self.UI.user_return()
+
+    def _reassign(self, source, target, start=None, end=None):
+        """
+        Moves the time of a task within a range of days to another task, which is created if needed.  Without a
+        range, the rolled-up history of the task is moved as well.  Does not journal the move or save the Timesheet.
+        :param start: first day (YYYY-MM-DD) or None
+        :param end: last day (YYYY-MM-DD) or None
+        :return: seconds moved
+        """
+        if target not in self.data.index:
+            self.data = add_tasks(self.data, [target])
+        self.data, moved = reassign_time(self.data, source, target, start, end)
+        if start is None and end is None and source in self.rollup["totals"].index:
+            totals = self.rollup["totals"]
+            if target not in totals.index:
+                totals = totals.reindex(totals.index.append(pd.Index([target], dtype=object)), fill_value=0)
+            self.rollup["totals"], rolled = reassign_time(totals, source, target)
+            save_rollup(self.path, self.name, self.rollup, self._encrypted_store(self.name))
+            moved += rolled
+        self.tree.add(source, -moved)
+        self.tree.add(target, moved)
+        self.intervals = None
+        self.build_budgets()
+        return moved
+
+    def retire_task(self, task_name):
+        """
+        Retires a task: its rows are moved to the archive and its time is kept in the archived totals, so that the
+        total time stays the same while the active Timesheet gets smaller.
+        :param task_name: task to retire
         """
         self.UI.banner()
         if task_name not in self.data.index:
@@ -618,248 +1289,330 @@ class TimesheetManager:
                 print("'{}' task not in database.".format(task_name))
                 self.UI.user_return()
         else:
-            self.data.drop(task_name, inplace=True)
-            self.save_timesheet(self.path, self.name, self.data)
-            print("Task '{}' successfully deleted.".format(task_name))
+            self._retire([task_name])
+            print("Task '{}' successfully retired.".format(task_name))
             self.UI.user_return()
 
-    ################ Time Functions ################  #TODO: Printing when only seconds are there
+    def retire_inactive_tasks(self, days, automatic=False):
+        """
+        Retires all tasks that have had no time logged in the last given number of days
+        :param days: number of days without logged time after which a task is inactive
+        :param automatic: also retire inactive tasks every time this Timesheet is loaded
+        """
+        self.UI.banner()
+        if days != "":
+            cutoff = self.today.subtract(days=int(days)).to_date_string()
+            retired = self._retire(find_inactive_tasks(self.data, cutoff))
+            if len(retired) == 0:
+                print("No Tasks have been inactive for {} days.".format(days))
+            else:
+                print("Retired {} Task(s):\n".format(len(retired)))
+                for task in retired:
+                    print("\t{}".format(task))
+            if automatic:
+                self.save_config_timesheet_value("retire_after", days)
+                print("\nTasks inactive for {} days will be retired automatically.".format(days))
+            self.UI.user_return()
 
-    def time_per_day(self, day):
+    def _retire(self, tasks):
         """
-        Reports total time worked on given day
-        :param day: day to report
+        Moves the given tasks to the archive and saves the Timesheet
+        :param tasks: list of task names
+        :return: list of retired task names
+        """
+        if len(tasks) > 0:
+            self.archived = archive_rows(self.path, self.name, self.data.loc[tasks], self._encrypted_store(self.name))
+            self.data.drop(tasks, inplace=True)
+            self.save_timesheet(self.path, self.name, self.data)
+        return tasks
+
+    def set_rate(self, task, rate):
+        """
+        Sets the hourly rate of the Timesheet, or of a Task and its subtasks
+        :param task: task name, or "" for the rate of the whole Timesheet
+        :param rate: rate as string, or "" to remove the rate
         """
         self.UI.banner()
-        if day == "today":
-            day = self.today.to_date_string()
-        elif day == "yesterday":
-            day = pendulum.yesterday(tz=self.tz).to_date_string()
-        if day not in self.data.columns:
-            print("There is no data for the selected date ({}).".format(day))
+        try:
+            parse_rate(rate)
+            rates = parse_rates(self.load_config_timesheet_value("rates"))
+        except ValueError as e:
+            print("[WARNING] {}...not setting a rate.".format(e))
+            self.UI.user_return()
+            return
+        if task == "":
+            self.save_config_timesheet_value("rate", rate)
+            print("Hourly rate of Timesheet '{}' {}.".format(self.name, "set to " + rate if rate != "" else "removed"))
         else:
-            times = self.data[day].sum()
-            if times == 0:
-                print("No Tasks were logged on {}.".format(day))
+            if rate == "":
+                rates.pop(task, None)
             else:
-                mins = Converter.sec2min(times)
-                hours, mins = Converter.min2hour(mins)
-                hour_min_string = Converter.convert2string(int(hours), int(mins))
-                string = "Summary for {}:".format(day)
-                print(string)
-                self.UI.summary_divider(string)
-                if hours == 0:
-                    print(hour_min_string.split(", ")[1])
-                else:
-                    print(hour_min_string)
-
-                if type(self.workweek) == int:
-                    per_day_minutes = (self.workweek / 5) * 60
-                    per_day_hours, per_day_minutes = Converter.min2hour(per_day_minutes)
-
-                    diff_hours, diff_mins = TimeCalculator.subtract(per_day_hours, per_day_minutes, hours, mins)
-                    print("\nWith a workweek of {} hours, "
-                          "the average daily hours equates to: {}.".format(self.workweek,
-                                                                           Converter.convert2string(int(per_day_hours),
-                                                                                                    int(per_day_minutes)
-                                                                                                    )))  # ugly lol
-                    if diff_hours is not None:
-                        print("{} is left remaining.".format(Converter.convert2string(int(diff_hours), int(diff_mins))))
-                    else:
-                        print("Sufficient hours have been worked today to meet that amount.")
+                rates[task] = parse_rate(rate)
+            self.save_config_timesheet_value("rates", format_rates(rates) if len(rates) > 0 else "")
+            print("Hourly rate of '{}' {}.".format(task, "set to " + rate if rate != "" else "removed"))
+            if task not in self.tree:
+                print("[NOTICE] There is no Task '{}' yet; the rate applies once it is created.".format(task))
+        self.version += 1
         self.UI.user_return()
 
-    def time_per_task(self, task):
+    def set_rounding(self, rounding):
         """
-        Reports total time worked for given task
-        :param task: task to report
+        Sets how billed time is rounded up
+        :param rounding: e.g. 'day/15' or 'entry/6', or "" for no rounding
         """
         self.UI.banner()
-        if task not in self.data.index:
-            print("There is no Task named '{}'.".format(task))
+        try:
+            mode, minutes = parse_rounding(rounding)
+        except ValueError as e:
+            print("[WARNING] {}...not setting the rounding.".format(e))
+            self.UI.user_return()
+            return
+        self.save_config_timesheet_value("rounding", rounding)
+        if mode == "none":
+            print("Billed time of Timesheet '{}' is not rounded.".format(self.name))
         else:
-            times = self.data.loc[task].sum()
-            if times == 0:
-                print("No time was logged for Task '{}'.".format(task))
-            else:
-                mins = Converter.sec2min(times)
-                hours, mins = Converter.min2hour(mins)
-                hour_min_string = Converter.convert2string(int(hours), int(mins))
-                days, hours_day = Converter.hour2day(hours)
-                day_hour_min_string = Converter.convert2string_days(int(days), int(hours_day), int(mins))
-                string = "Summary for '{}':".format(task)
-                print(string)
-                self.UI.summary_divider(string)
-                if hours == 0:
-                    print(hour_min_string.split(", ")[1])
-                else:
-                    print(hour_min_string)
-                if days != 0: print(day_hour_min_string)
+            print("Billed time of Timesheet '{}' is rounded up to {} minutes per {}.".format(self.name, minutes, mode))
+        self.version += 1
         self.UI.user_return()
 
-    def time_per_taskday(self, task, day):
+    def set_budget(self, task, period, hours):
         """
-        Reports total time for a given task on a given day
-        :param task: task to report
-        :param day: day to report on
+        Sets or removes the budget of a Task, or of the whole Timesheet, for a period
+        :param task: task name, or "" for the whole Timesheet
+        :param period: 'day', 'week', or 'total'
+        :param hours: hours as string, or "" to remove the budget
         """
         self.UI.banner()
-        skip = False
+        try:
+            budgets = parse_budgets(self.load_config_timesheet_value("budgets"))
+            budget = parse_budget(task, period, hours or 1)  # validates the period also when removing
+        except ValueError as e:
+            print("[WARNING] {}...not setting a budget.".format(e))
+            self.UI.user_return()
+            return
+        budgets = [(other, other_period, seconds) for other, other_period, seconds in budgets
+                   if (other, other_period) != budget[:2]]
+        if hours != "":
+            budgets.append(budget)
+        self.save_config_timesheet_value("budgets", format_budgets(budgets) if len(budgets) > 0 else "")
+        self.build_budgets()
+        print("Budget {}.".format("set" if hours != "" else "removed"))
+        if len(budgets) > 0:
+            print("\nBudgets of Timesheet '{}':".format(self.name))
+            for line in self.budgets.status(self.name, self.calendar.day_key()):
+                print(line)
+        self.UI.user_return()
+
+    def set_retention(self, months, granularity):
+        """
+        Sets how many months of daily detail are kept; older days are rolled up into weekly or monthly totals per Task
+        every time this Timesheet is loaded, starting now
+        :param months: number of months as string, or "" to keep all days
+        :param granularity: 'week' or 'month'
+        """
+        self.UI.banner()
+        if months == "":
+            self.save_config_timesheet_value("retention", "")
+            print("All days of Timesheet '{}' will be kept.".format(self.name))
+        elif granularity not in ROLLUPS:
+            print("[WARNING] Invalid granularity '{}'...not setting a retention.".format(granularity))
+        else:
+            self.save_config_timesheet_value("retention", months)
+            self.save_config_timesheet_value("rollup", granularity)
+            if self.rollup["granularity"] not in [None, granularity]:
+                print("[NOTICE] This Timesheet already keeps {}ly totals, so they are used.\n".format(
+                    self.rollup["granularity"]))
+            rolled = self._roll_up(int(months), granularity)
+            if rolled > 0:
+                self.build_task_tree()
+                self.build_analytics()
+            print("Days older than {} months will be kept as {}ly totals.".format(
+                months, self.rollup["granularity"] or granularity))
+            print("{} day(s) rolled up.".format(rolled))
+        self.UI.user_return()
+
+    def _roll_up(self, months, granularity):
+        """
+        Rolls the days older than the retention into the rolled-up history, and saves the Timesheet
+        :param months: number of months of daily detail to keep
+        :param granularity: 'week' or 'month'
+        :return: number of days rolled up
+        """
+        granularity = self.rollup["granularity"] or granularity
+        days = self.data.shape[1]
+        cutoff = retention_cutoff(self.today, months, granularity)
+        self.data, self.rollup = roll_up(self.path, self.name, self.data, cutoff, granularity,
+                                         self._encrypted_store(self.name))
+        if self.data.shape[1] < days:
+            self.save_timesheet(self.path, self.name, self.data)
+        return days - self.data.shape[1]
+
+    ################ Time Functions ################  #TODO: Printing when only seconds are there
+
+    def _resolve_day(self, day):
+        """
+        Turns the 'today' and 'yesterday' shortcuts into date strings
+        :param day: day as given by the user
+        :return: date string
+        """
         if day == "today":
-            day = self.today.to_date_string()
+            return self.calendar.day_key()
         elif day == "yesterday":
-            day = pendulum.yesterday(tz=self.tz).to_date_string()
-        if task not in self.data.index:
-            print("There is no Task named '{}'.".format(task))
-            skip = True
-        if day not in self.data.columns:
-            print("There is no data for the selected date ({}).".format(day))
-            skip = True
-        if not skip:
-            times = self.data[day].loc[task]
-            if times == 0:
-                print("No time was logged for Task '{}' on {}.".format(task, day))
-            else:
-                mins = Converter.sec2min(times)
-                hours, mins = Converter.min2hour(mins)
-                hour_min_string = Converter.convert2string(int(hours), int(mins))
-                string = "Summary for '{}' on {}:".format(task, day)
-                print(string)
-                self.UI.summary_divider(string)
-                if hours == 0:
-                    print(hour_min_string.split(", ")[1])
-                else:
-                    print(hour_min_string)
+            return self.calendar.yesterday().to_date_string()
+        return day
+
+    def _report(self, report, *args):
+        """
+        Builds a report, or takes it from the cache if nothing was changed since it was built
+        :param report: report builder from utilities.reports
+        :param args: arguments identifying the report (besides the data)
+        :return: list of lines
+        """
+        key = (report.__name__, args, self.version)
+        if report is report_time_per_day:
+            build = lambda: report_time_per_day(self.data, args[0], self.workweek, self.rollup["cutoff"])
+        elif report is report_time_per_task:
+            build = lambda: report_time_per_task(self.tree, args[0],
+                                                 args[0] in self.archived and args[0] not in self.data.index)
+        elif report is report_time_per_taskday:
+            build = lambda: report_time_per_taskday(self.data, *args, self.rollup["cutoff"])
+        elif report is report_total_time:
+            archived = sum(self.archived.values()) + int(self.rollup["totals"].values.sum())
+            build = lambda: report_total_time(self.data, archived, self.baseline, self.name, self.rollup["days"])
+        elif report is report_weekly:
+            build = lambda: report_weekly(self.data, self.today, self.workweek)
+        elif report is report_query:
+            build = lambda: report_query(self.data, args[0], self.rollup)
+        elif report is report_intervals:
+            build = lambda: report_intervals(self.interval_index(), args[0], args[1], self.tz)
+        elif report is report_overlaps:
+            build = lambda: report_overlaps(self.interval_index(), self.tz)
+        elif report is report_invoice:
+            build = lambda: report_invoice(self._invoice(*args), *args)
+        elif report is report_trends:
+            self.analytics.extend_to(args[0])
+            build = lambda: report_trends(self.analytics, args[0], self.workweek)
+        return self.reports.get(key, build)
+
+    def _print_report(self, lines):
+        """
+        Prints a report on a fresh page and waits for the user to return
+        :param lines: lines of the report
+        """
+        self.UI.banner()
+        for line in lines:
+            print(line)
         self.UI.user_return()
 
+    @instrumented("report_time_per_day")
+    def time_per_day(self, day):
+        """
+        Reports total time worked on given day
+        :param day: day to report
+        """
+        self._print_report(self._report(report_time_per_day, self._resolve_day(day)))
+
+    @instrumented("report_time_per_task")
+    def time_per_task(self, task):
+        """
+        Reports total time worked for given task.  For a task path like 'client/project' the time of all its subtasks
+        is included, and the time of each direct subtask is listed.
+        :param task: task to report
+        """
+        self._print_report(self._report(report_time_per_task, task))
+
+    @instrumented("report_time_per_taskday")
+    def time_per_taskday(self, task, day):
+        """
+        Reports total time for a given task on a given day
+        :param task: task to report
+        :param day: day to report on
+        """
+        self._print_report(self._report(report_time_per_taskday, task, self._resolve_day(day)))
+
+    @instrumented("report_total_time")
     def total_time(self):
         """
         Report on total time worked
         """
-        self.UI.banner()
-        times = self.data.values.sum()
-        if times == 0:
-            print("No time has been logged in this Timesheet yet.")
-        else:
-            mins = Converter.sec2min(times)
-            hours, mins = Converter.min2hour(mins)
-            hour_min_string = Converter.convert2string(int(hours), int(mins))
-            days, hours_day = Converter.hour2day(hours)
-            day_hour_min_string = Converter.convert2string_days(int(days), int(hours_day), int(mins))
-            string = "Summary of all time worked stored in Timesheet '{}':".format(self.name)
-            print(string)
-            self.UI.summary_divider(string)
-            if hours == 0:
-                try:
-                    print(hour_min_string.split(", ")[1])
-                except:
-                    print("Less than a minute.")
-            else:
-                print(hour_min_string)
-            print(day_hour_min_string)
-            if self.baseline != "":
-                string = "Summary of all time worked including baseline:"
-                print("\n" + string)
-                self.UI.summary_divider(string)
-                back_days, back_hours, back_mins = Converter.parse_DHM(self.baseline)
-                total_days = back_days + days
-                total_hours = back_hours + hours_day
-                total_mins = back_mins + mins
-                total_worked_hours = (back_days * 24) + back_hours + hours
-                print(Converter.convert2string(int(total_worked_hours), int(mins)))
-                print(Converter.convert2string_days(int(total_days), int(total_hours), int(total_mins)))
-            print("\nSince the creation of this Timesheet, {} individual days have been worked.".format(
-                len(self.data.columns.values)))
-        self.UI.user_return()
+        self._print_report(self._report(report_total_time))
 
+    @instrumented("report_weekly")
     def weekly_report(self):
-        self.UI.banner()
-        workdays = get_current_week_days(self.today)
-        summable_days = workdays
-        tasks = self.data.index
-        report_data = generate_day_dict(workdays, tasks)
-        # Fill up dictionary with data
-        deletable = []
-        for day in workdays:
-            for task in tasks:
-                try:
-                    report_data[day][task] = self.data[day].loc[task]
-                except KeyError:
-                    report_data[day][task] = 0
-                    deletable.append(day)
-        for delete in set(deletable):  # to remove duplicates
-            summable_days.remove(delete)
-        # Get max length of tasks so that spacing works out
-        max_len = 0
-        for task in tasks:
-            if len(task) > max_len:
-                max_len = len(task)
-        # Start report
-        string = "Current Week Report"
-        print(string)
-        self.UI.summary_divider(string)
-        for day in reversed(workdays):
-            day_string = day
-            day = pendulum.parse(day)
-            print("{}, {}".format(Converter.convert_int2day(day.day_of_week), day_string[5:]))
-            print("-" * 16)  # length of Wednesday string
-            values = []
-            for task in tasks:
-                value = report_data[day_string][task]
-                values.append(value)
-                if value != 0:
-                    mins = Converter.sec2min(value)
-                    hours, mins = Converter.min2hour(mins)
-                    hour_min_string = Converter.convert2string(int(hours), int(mins))
-                    if len(task) < max_len:
-                        string = "{}:".format(task) + (" " * (max_len - len(task)))
-                    else:
-                        string = "{}:".format(task)
-                    if hours == 0 and mins != 0:
-                        hour_min_string = hour_min_string.split(", ")[1]
-                        print("\t" + string + "\t{}".format(hour_min_string))
-                    elif hours == 0 and mins == 0:
-                        continue
-                    else:
-                        print("\t" + string + "\t{}".format(hour_min_string))
-
-            value = sum(values)  # Daily sums
-            mins = Converter.sec2min(value)
-            hours, mins = Converter.min2hour(mins)
-            hour_min_string = Converter.convert2string(int(hours), int(mins))
-            if hours == 0 and mins != 0:
-                hour_min_string = hour_min_string.split(", ")[1]
-                print("\n\tDaily Total:\t\t{}\n".format(hour_min_string))
-            elif hours == 0 and mins == 0:
-                continue
-            else:
-                print("\n\tDaily Total:\t\t{}\n".format(hour_min_string))
-
-        print("\n------------")
-        print("Weekly Total")
-        print("------------")
-        total = int(self.data[summable_days].sum().sum())
-        mins = Converter.sec2min(total)
-        hours, mins = Converter.min2hour(mins)
-        hour_min_string = Converter.convert2string(int(hours), int(mins))
-        days, hours_day = Converter.hour2day(hours)
-        day_hour_min_string = Converter.convert2string_days(int(days), int(hours_day), int(mins))
-        if days == 0:
-            if hours == 0:
-                print(hour_min_string.split(", ")[1])
-            else:
-                print(hour_min_string)
+        """
+        Report of all tasks and their times for the current work week
+        """
+        self._print_report(self._report(report_weekly, self.calendar.day_key()))
+
+    @instrumented("report_query")
+    def query(self, string):
+        """
+        Reports the result of an ad-hoc query, e.g. 'tasks~"client/*" since 2026-01-01 group by week'
+        :param string: query, see utilities.query
+        """
+        self._print_report(self._report(report_query, string.strip()))
+
+    @instrumented("report_trends")
+    def trends(self):
+        """
+        Report on the rolling averages, the time per weekday, the forecast for this week, and the balance against the
+        workweek
+        """
+        self._print_report(self._report(report_trends, self.calendar.day_key()))
+
+    def _invoice(self, start, end):
+        """
+        :return: billed Tasks of this Timesheet between the first and the last day, see utilities.invoicing.invoice
+        """
+        settings = {key: self.load_config_timesheet_value(key) for key in ["rate", "rates", "rounding"]}
+        entries = self.journal.intervals() if settings["rounding"].startswith("entry") else None
+        return invoice([(self.name, self.data, settings, entries)], start, end)
+
+    @instrumented("report_invoice")
+    def invoice(self, period):
+        """
+        Reports the billable time and amounts per client of a range of days
+        :param period: first and last day (YYYY-MM-DD), or None if they were invalid
+        """
+        if period is None:
+            return
+        try:
+            self._print_report(self._report(report_invoice, *period))
+        except ValueError as e:
+            self.UI.banner()
+            print("[WARNING] {}...fix it in Timesheet management.".format(e))
+            self.UI.user_return()
+
+    def interval_index(self):
+        """
+        :return: IntervalIndex of all intervals in the journal, built on first use
+        """
+        if self.intervals is None:
+            self.intervals = IntervalIndex.from_entries(self.journal.intervals())
+        return self.intervals
+
+    @instrumented("report_intervals")
+    def intervals_at(self, string):
+        """
+        Reports what was logged at a point in time ('YYYY-MM-DD HH:MM'), or within a range ('... to ...')
+        :param string: point in time or range
+        """
+        try:
+            moments = [pendulum.parse(part.strip(), tz=self.calendar.tz).timestamp() for part in string.split(" to ")]
+        except (ValueError, AttributeError):  # not a date, or e.g. a duration
+            moments = []
+        if len(moments) not in [1, 2]:
+            self._print_report(["[ERROR] Invalid time '{}', expected 'YYYY-MM-DD HH:MM' or "
+                                "'YYYY-MM-DD HH:MM to YYYY-MM-DD HH:MM'.".format(string)])
         else:
-            print(hour_min_string)
-            print(day_hour_min_string)
+            self._print_report(self._report(report_intervals, moments[0], moments[1] if len(moments) == 2 else None))
 
-        if type(self.workweek) == int:
-            if hours > self.workweek:
-                print("Sufficient hours have been worked this week to meet the workweek requirements.")
-            else:
-                diff = self.workweek - hours
-                print("{} hours still need to be worked this week in order to meet workweek requirements.".format(diff))
-        self.UI.user_return()
+    @instrumented("report_overlaps")
+    def overlaps(self):
+        """
+        Reports intervals that overlap each other, and workday fills that counted time twice
+        """
+        self._print_report(self._report(report_overlaps))
 
     ################ Debug Functions ################
 
@@ -867,8 +1620,105 @@ class TimesheetManager:
         self.UI.banner()
         print("[DEBUG] Printing head(20) of underlying dataframe...\n")
         print(self.data.head(20))
+        report = memory_report(self.data)
+        print("\n[DEBUG] Memory usage: {} Tasks x {} days, {} bytes ({} in cells, {} in labels), dtypes: {}".format(
+            report["tasks"], report["days"], report["total_bytes"], report["cell_bytes"], report["label_bytes"],
+            ", ".join(report["dtypes"])))
+        print("\n[DEBUG] Report cache: {} hits, {} misses, data version {}".format(
+            self.reports.hits, self.reports.misses, self.version))
+        print("\n[DEBUG] Events: {}".format(", ".join("{} {}".format(value, key) for key, value in
+                                                    self.events.stats().items())))
+        print("\n[DEBUG] Metrics of this session:\n")
+        for line in self.metrics.summary():
+            print("\t" + line)
+        print("\n[DEBUG] Metrics saved to '{}'.".format(self.save_metrics()))
         self.UI.user_return()
 
+    def save_metrics(self):
+        """
+        Saves the metrics of this session as JSON and as a Prometheus text file
+        :return: path of the metrics files, without extension
+        """
+        report = memory_report(self.data)
+        self.metrics.gauge("sheet_tasks", report["tasks"])
+        self.metrics.gauge("sheet_days", report["days"])
+        self.metrics.gauge("sheet_memory_bytes", report["total_bytes"])
+        os.makedirs(METRICS_PATH, exist_ok=True)
+        path = pathjoin(METRICS_PATH, self.name)
+        with open(path + ".json", "w") as f:
+            f.write(self.metrics.to_json())
+        with open(path + ".prom", "w") as f:
+            f.write(self.metrics.to_prometheus('sheet="{}"'.format(self.name)))
+        return path
+
+
+def command_timings(commands):
+    """
+    :param commands: list of (code, seconds) of the menu commands run
+    :return: lines with the count, total, mean, and maximum time of every command code
+    """
+    lines = ["{:<10}{:>7}{:>12}{:>11}{:>11}".format("Command", "Count", "Total (ms)", "Mean (ms)", "Max (ms)")]
+    times = {}
+    for code, seconds in commands:
+        times.setdefault(code, []).append(seconds)
+    for code, seconds in sorted(times.items(), key=lambda item: -sum(item[1])):
+        lines.append("{:<10}{:>7}{:>12.2f}{:>11.2f}{:>11.2f}".format(
+            code, len(seconds), 1000 * sum(seconds), 1000 * sum(seconds) / len(seconds), 1000 * max(seconds)))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Log time spent on tasks.  Without options, the menus are shown and "
+                                                 "answered on the keyboard.")
+    parser.add_argument("--sheet", help="Timesheet to load instead of the default one")
+    parser.add_argument("--replay", metavar="SCRIPT",
+                        help="read the answers to the menus from a script, one per line, instead of the keyboard")
+    parser.add_argument("--record", metavar="SCRIPT", help="write the answers of this session to a script to replay")
+    parser.add_argument("--quiet", action="store_true", help="do not show the menus while replaying a script")
+    parser.add_argument("--timings", metavar="CSV", help="write the time of every menu command to a CSV file")
+    parser.add_argument("--profile", metavar="FOLDER", help="profile every menu command and save the profiles (pstats "
+                                                            "and collapsed stacks for flame graphs) per command")
+    parser.add_argument("--top", type=int, default=20, help="number of hot functions shown after profiling")
+    args = parser.parse_args(argv)
+
+    script = ScriptInput.from_file(args.replay, echo=not args.quiet) if args.replay else None
+    source = script if script is not None else UserInterface.source
+    record = open(args.record, "w", encoding="utf-8") if args.record else None
+    if record is not None:
+        record.write("# Pymesheet script, replay with: python timesheet_manager.py --replay {}\n".format(args.record))
+        source = RecordingInput(source, record)
+    UserInterface.source = source
+    profiler = CommandProfiler(args.profile) if args.profile else None
+    UserInterface.profiler = profiler
+    output = open(os.devnull, "w") if args.quiet and script is not None else None
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(output) if output is not None else nullcontext():
+            manager = TimesheetManager(name=args.sheet, path=os.getcwd(), profiler=profiler)
+    finally:
+        if record is not None:
+            record.close()
+        if output is not None:
+            output.close()
+    if args.timings:
+        with open(args.timings, "w") as f:
+            f.write("command,code,seconds\n")
+            for i, (code, seconds) in enumerate(manager.commands):
+                f.write("{},{},{:.6f}\n".format(i + 1, code, seconds))
+    if script is not None:
+        print("Replayed {} commands ({} lines of '{}') in {:.2f} s, {:.2f} s of it in the commands:\n".format(
+            len(manager.commands), script.line, args.replay, time.perf_counter() - start,
+            sum(seconds for _, seconds in manager.commands)))
+        for line in command_timings(manager.commands):
+            print("\t" + line)
+    if profiler is not None:
+        paths = profiler.save()
+        print("\nProfiles of {} commands saved to '{}' ({} files).  Hot functions:\n".format(
+            len(manager.commands), args.profile, len(paths)))
+        for line in profiler.summary(args.top):
+            print("\t" + line)
+    return 0
+
 
 if __name__ == "__main__":
-    t = TimesheetManager()
+    sys.exit(main())
@@ -3,21 +3,176 @@ User interface for the Timesheet class
 Command line user interface for ease of use of logging time and other functions.
 @author: John Berroa
 """
-import time, os, sys, re, pendulum
+import time, os, sys, re, pendulum, getpass
+from contextlib import contextmanager
+from functools import lru_cache
 from pyfiglet import Figlet
+from utilities.task_ops import parse_renames
+from utilities.calendar import timezone
+
+try:
+    import curses
+except ImportError:  # e.g. Windows without the windows-curses package
+    curses = None
+
+CLEAR_SCREEN = "\033[H\033[2J\033[3J"  # cursor home, clear screen, clear scrollback
+
+
+def _enable_ansi():
+    """
+    Windows consoles only understand ANSI escape sequences once virtual terminal processing is turned on
+    """
+    if os.name == 'nt':
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.GetStdHandle(-11)  # stdout
+            mode = ctypes.c_uint32()
+            kernel32.GetConsoleMode(handle, ctypes.byref(mode))
+            kernel32.SetConsoleMode(handle, mode.value | 0x0004)  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+        except Exception:
+            pass
+
+
+_enable_ansi()
 
 
 def clear():
     """
-    Global function that clears the command line
+    Global function that clears the command line.  Uses an escape sequence instead of running 'cls'/'clear'.  The
+    screen is not cleared while a script is replayed, so that its output can be followed.
+    """
+    if sys.stdout.isatty() and UserInterface.source.interactive:
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
+
+
+def ask(prompt=""):
+    """
+    Global function that reads an answer from the input source of the user interface: the keyboard, unless a script
+    is replayed
+    :param prompt: question shown to the user
+    :return: the answer, as typed
+    """
+    with UserInterface.waiting():
+        return UserInterface.source.read(prompt)
+
+
+################ Input Sources ################
+
+class ConsoleInput:
+    """
+    Reads the answers the user types
+    """
+    interactive = True
+
+    def read(self, prompt=""):
+        return input(prompt)
+
+
+class ScriptInput:
+    """
+    Reads the answers from a script instead of the keyboard, one line per answer, in the order the menus ask for them.
+    Lines starting with '#' are comments and are skipped; an answer starting with '#' or '\\' is written with an extra
+    '\\' in front.  At the end of the script, reading raises EOFError, which ends the session.
     """
-    os.system('cls' if os.name == 'nt' else 'clear')
+    interactive = False
+
+    def __init__(self, lines, echo=True):
+        """
+        :param lines: lines of the script
+        :param echo: print every answer after its question, as it would appear on the screen
+        """
+        self.lines = iter(lines)
+        self.echo = echo
+        self.line = 0  # number of the last line read
+
+    @classmethod
+    def from_file(cls, path, echo=True):
+        with open(path, encoding="utf-8") as f:
+            return cls(f.read().splitlines(), echo)
+
+    def read(self, prompt=""):
+        for line in self.lines:
+            self.line += 1
+            if line.startswith("#"):
+                continue
+            answer = line[1:] if line.startswith("\\") else line
+            if self.echo:
+                print(prompt + answer)
+            return answer
+        raise EOFError("End of the script")
+
+
+class RecordingInput:
+    """
+    Reads the answers from another input source and writes them to a script that ScriptInput can replay.  Every answer
+    is written below its question, as a comment.
+    """
+
+    def __init__(self, source, file):
+        """
+        :param source: input source to read from
+        :param file: text file the script is written to
+        """
+        self.source = source
+        self.file = file
+        self.interactive = source.interactive
+
+    def read(self, prompt=""):
+        answer = self.source.read(prompt)
+        lines = [line.strip() for line in prompt.splitlines() if line.strip() != ""]
+        self.file.write("# {}\n{}{}\n".format(lines[-1] if lines else "", "\\" if answer[:1] in ("#", "\\") else "",
+                                               answer))
+        self.file.flush()  # a session that crashes is recorded up to the crash
+        return answer
+
+
+@lru_cache(maxsize=None)
+def render_title(text='Timesheet'):
+    """
+    Renders the ASCII art title once per program run
+    """
+    return Figlet(font='doom').renderText(text)
 
 
 class UserInterface:
-    def __init__(self, name, new, today, version):
+    idle = 0.0  # total seconds spent waiting for the user, so that it can be left out of operation latencies
+    source = ConsoleInput()  # where the answers are read from, e.g. a ScriptInput to replay a script
+    profiler = None  # CommandProfiler to pause while waiting for the user, see utilities.profiling
+    _waits = 0  # number of waits in progress, as waits can be nested
+
+    @staticmethod
+    @contextmanager
+    def waiting():
+        """
+        Context manager around waiting for the user: the time is added to the idle time, and the profiler is paused
+        """
+        outer = UserInterface._waits == 0
+        UserInterface._waits += 1
+        if outer and UserInterface.profiler is not None:
+            UserInterface.profiler.pause()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            UserInterface._waits -= 1
+            if outer:
+                UserInterface.idle += time.perf_counter() - start
+                if UserInterface.profiler is not None:
+                    UserInterface.profiler.resume()
+
+    def __init__(self, name, new, today, version, tz="local"):
+        """
+        :param name: name of the Timesheet
+        :param new: whether the Timesheet was just created
+        :param today: function returning today, so that the banner follows the date past midnight
+        :param version: version of the program
+        :param tz: timezone of the Timesheet
+        """
         self.__version__ = version
         self.today = today
+        self.tz = tz
         self.name = name
         self.banner()
         self.working = False
@@ -40,18 +195,20 @@ class UserInterface:
         """
         print("-" * len(text))
 
+    def _banner_text(self):
+        """
+        The banner as a single string, so that the page is repainted with one write
+        """
+        return "{}\n{}\nWelcome to Timesheet v{}!\nToday's date: {}\nActive Timesheet: '{}'\n\n{}\n".format(
+            "=" * 80, render_title(), self.__version__, self.today().to_formatted_date_string(), self.name, "=" * 80)
+
     def banner(self):
         """
         Prints the banner.  Calling this function clears the screen.
         """
         clear()  # FOR DEBUGGING, COMMENT IT OUT
-        self._main_divider()
-        f = Figlet(font='doom')
-        print(f.renderText('Timesheet'))
-        print("Welcome to Timesheet v{}!\nToday's date: {}".format(self.__version__,
-                                                                   self.today.to_formatted_date_string()))
-        print("Active Timesheet: '{}'\n".format(self.name))
-        self._main_divider()
+        sys.stdout.write(self._banner_text())
+        sys.stdout.flush()
 
     ################ Main Page ################
 
@@ -72,7 +229,7 @@ class UserInterface:
         print("\t[7] Quit")
         selection = None
         while selection not in ["1", "2", "3", "4", "5", "6", "7" "debug"]:
-            selection = input("\t...")
+            selection = ask("\t...")
             if selection == "1":  # Log time
                 task = self._ask_what_string(work=True)
                 return selection, task
@@ -140,28 +297,67 @@ class UserInterface:
             print("7) Set baseline hours:\n  -Set previous worked hours as a baseline to add on time to.")
             print("8) Set workweek hours:\n  -Set how many hours are required each week.")
             print("9) Export current Timesheet:\n  -Exports the current Timesheet.  Not recommended for privacy.")
-            print("10) Help:\n  -Print this page.")
-            print("11) Return:\n  -Return to the main menu.")
+            print("10) Export changes for syncing:\n  -Writes the time logged since the last export to a small file,\n"
+                  "   to be imported in a copy of this Timesheet on another computer.")
+            print("11) Import changes from another copy:\n  -Merges a file exported by another copy of this "
+                  "Timesheet.\n   Time that was already merged is never counted twice.")
+            print("12) Encrypt current Timesheet:\n  -Stores the Timesheet encrypted with a passphrase.  Requires the\n"
+                  "   'cryptography' package.  The passphrase can also be given in PYMESHEET_PASSPHRASE.")
+            print("13) Set history retention:\n  -Keeps every day of the last given number of months; older days are "
+                  "rolled up\n   into totals per Task and week or month.  Totals stay exact, but single old days can "
+                  "no\n   longer be looked up.")
+            print("14) Set hourly rates:\n  -Sets the hourly rate of the Timesheet, or of a Task and its subtasks.  "
+                  "Tasks\n   without a rate are not billed.")
+            print("15) Set billing rounding:\n  -Rounds billed time up per day or per logged entry, e.g. to 6 or 15 "
+                  "minutes.")
+            print("16) Set budgets:\n  -Sets how many hours a Task (with its subtasks) or the whole Timesheet may take "
+                  "per\n   day, per week, or in total.  An alert is shown when 80% and 100% are reached, also while\n"
+                  "   the timer runs.")
+            print("17) Help:\n  -Print this page.")
+            print("18) Return:\n  -Return to the main menu.")
             self.user_return()
         elif which == "task":
-            print("Here you can create, delete, or list the tasks within the '{}' Timesheet:\n".format(self.name))
+            print("Here you can create, delete, retire, or list the tasks within the '{}' Timesheet:\n".format(
+                self.name))
             print("1) List Tasks:\n  -Returns a list of all Tasks within the Timesheet file, enumerated.")
-            print("2) Create new Task:\n  -Creates a new Task with the desired name if it does not already exist.")
-            print("3) Delete a Task:\n  -Deletes a Task with the desired name.")
-            print("4) Help:\n  -Print this usage page.")
-            print("5) Return:\n  -Return to the main menu.")
+            print("2) Create new Task:\n  -Creates a new Task with the desired name if it does not already exist.\n"
+                  "   Several Tasks can be created at once by separating their names with commas.")
+            print("3) Delete a Task:\n  -Deletes a Task with the desired name.  Several Tasks can be deleted at once\n"
+                  "   by separating their names with commas.")
+            print("4) Retire a Task:\n  -Moves a Task to the archive.  Its time still counts towards the totals.")
+            print("5) Retire inactive Tasks:\n  -Retires all Tasks without logged time in the last given number of "
+                  "days,\n   optionally every time the Timesheet is loaded.")
+            print("6) Rename or merge Tasks:\n  -Renames Tasks, given as old=new pairs separated by commas.  Renaming "
+                  "a Task\n   to an existing Task merges their time.")
+            print("7) Move time between Tasks:\n  -Moves the time logged on one Task to another Task, optionally only "
+                  "within\n   a range of days.")
+            print("8) Help:\n  -Print this usage page.")
+            print("9) Return:\n  -Return to the main menu.")
             self.user_return()
         elif which == "summary":
             print("Here you can see various summaries aggregated over time, task, or totals within the"
                   " '{}' Timesheet:\n".format(self.name))
-            print("1) Time per Task:\n  -See how much time was worked in total for a specific Task.")
+            print("1) Time per Task:\n  -See how much time was worked in total for a specific Task.\n"
+                  "   Tasks can be grouped with paths like 'client/project/subtask'; summarizing 'client/project'\n"
+                  "   includes the time of all its subtasks.")
             print("2) Time per day:\n  -See how much time was worked on a specific day.")
             print("3) Time per Task per day:\n  -See how much time was worked for a specific task on a certain day.")
             print("4) Total time:\n  -Display the total amount of time worked.")
             print("5) Weekly Report:\n  -Display all task information and their corresponding times for the current "
                   "work week.")
-            print("6) Help:\n  -Print this page.")
-            print("7) Return:\n  -Return to the main menu.")
+            print("6) Custom query:\n  -Sum up time for any Tasks, date range, and grouping, e.g.\n"
+                  "   tasks~\"client/*\" between 2026-01-01 and 2026-03-31 group by task, week")
+            print("7) Trends and forecast:\n  -Average time per week over the last 4 weeks, average time per weekday,\n"
+                  "   the projected time by the end of this week, and the overtime or undertime against the\n"
+                  "   workweek since the Timesheet was created.")
+            print("8) Logged at a time:\n  -Shows which Tasks were logged at a point in time, or within a range of "
+                  "time.")
+            print("9) Overlapping time:\n  -Lists logged intervals that overlap each other, and workdays whose "
+                  "'General'\n   time was counted on top of a Task.")
+            print("10) Invoice:\n  -Billable time and amounts per client for a range of days, from the hourly rates\n"
+                  "   and the billing rounding set in Timesheet management.")
+            print("11) Help:\n  -Print this page.")
+            print("12) Return:\n  -Return to the main menu.")
             self.user_return()
 
     def ask_time_summaries_input(self):
@@ -176,11 +372,16 @@ class UserInterface:
         print("\t[3] Time per Task per day...")
         print("\t[4] Total time")
         print("\t[5] Weekly Report")
-        print("\t[6] Help")
-        print("\t[7] Return")
+        print("\t[6] Custom query...")
+        print("\t[7] Trends and forecast")
+        print("\t[8] Logged at a time...")
+        print("\t[9] Overlapping time")
+        print("\t[10] Invoice...")
+        print("\t[11] Help")
+        print("\t[12] Return")
         selection = None
-        while selection not in ["1", "2", "3", "4", "5", "6", "7"]:
-            selection = input("\t...")
+        while selection not in ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12"]:
+            selection = ask("\t...")
             if selection == "1":  # time per task
                 task = self._ask_what_string(summary=True)
                 return selection, task
@@ -195,10 +396,23 @@ class UserInterface:
                 return selection, None
             elif selection == '5':  # weekly report
                 return selection, None
-            elif selection == '6':  # help
+            elif selection == '6':  # custom query
+                query = self._ask_for_query()
+                return selection, query
+            elif selection == '7':  # trends
+                return selection, None
+            elif selection == '8':  # intervals at a time
+                moment = self._ask_for_moment()
+                return selection, moment
+            elif selection == '9':  # overlaps
+                return selection, None
+            elif selection == '10':  # invoice
+                period = self._ask_for_period()
+                return selection, period
+            elif selection == '11':  # help
                 self._help("summary")
                 return selection, None
-            elif selection == '7':  # return
+            elif selection == '12':  # return
                 return selection, None
 
     def ask_timesheet_management_input(self):
@@ -219,11 +433,19 @@ class UserInterface:
         print("\t[7] Set baseline hours...")
         print("\t[8] Set workweek hours...")
         print("\t[9] Export current Timesheet")
-        print("\t[10] Help")
-        print("\t[11] Return")
+        print("\t[10] Export changes for syncing...")
+        print("\t[11] Import changes from another copy...")
+        print("\t[12] Encrypt current Timesheet...")
+        print("\t[13] Set history retention...")
+        print("\t[14] Set hourly rates...")
+        print("\t[15] Set billing rounding...")
+        print("\t[16] Set budgets...")
+        print("\t[17] Help")
+        print("\t[18] Return")
         selection = None
-        while selection not in ["1", "2", "3", "4", "5", "6", "7", "8"]:
-            selection = input("\t...")
+        while selection not in ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12", "13", "14", "15", "16",
+                                "17", "18"]:
+            selection = ask("\t...")
             if selection == "1":  # List timesheets
                 return selection, None
             elif selection == "2":  # Create new sheet
@@ -249,10 +471,30 @@ class UserInterface:
                 return selection, workweek
             elif selection == '9':  # Export
                 return selection, ""
-            elif selection == '10':  # Help
+            elif selection == '10':  # Export sync delta
+                path = self._ask_what_string(sync_export=True)
+                return selection, path
+            elif selection == '11':  # Import sync delta
+                path = self._ask_what_string(sync_import=True)
+                return selection, path
+            elif selection == '12':  # Encrypt
+                return selection, None
+            elif selection == '13':  # Retention
+                retention = self._ask_for_retention()
+                return selection, retention
+            elif selection == '14':  # Rates
+                rate = self._ask_for_rate()
+                return selection, rate
+            elif selection == '15':  # Rounding
+                rounding = self._ask_for_rounding()
+                return selection, rounding
+            elif selection == '16':  # Budgets
+                budget = self._ask_for_budget()
+                return selection, budget
+            elif selection == '17':  # Help
                 self._help("timesheet")
                 return selection, None
-            elif selection == '11':  # Return
+            elif selection == '18':  # Return
                 return selection, None
 
     def ask_task_management_input(self):
@@ -265,11 +507,15 @@ class UserInterface:
         print("\t[1] List Tasks")
         print("\t[2] Create new Task...")
         print("\t[3] Delete a Task...")
-        print("\t[4] Help")
-        print("\t[5] Return")
+        print("\t[4] Retire a Task...")
+        print("\t[5] Retire inactive Tasks...")
+        print("\t[6] Rename or merge Tasks...")
+        print("\t[7] Move time between Tasks...")
+        print("\t[8] Help")
+        print("\t[9] Return")
         selection = None
-        while selection not in ["1", "2", "3", "4", "5"]:
-            selection = input("\t...")
+        while selection not in ["1", "2", "3", "4", "5", "6", "7", "8", "9"]:
+            selection = ask("\t...")
             if selection == "1":  # List tasks
                 return selection, None
             elif selection == "2":  # Create new task
@@ -278,10 +524,22 @@ class UserInterface:
             elif selection == '3':  # Delete task
                 task = self._ask_what_string(delete=True)
                 return selection, task
-            elif selection == '4':  # Help task
+            elif selection == '4':  # Retire task
+                task = self._ask_what_string(retire=True)
+                return selection, task
+            elif selection == '5':  # Retire inactive tasks
+                days, automatic = self._ask_for_inactive_days()
+                return selection, (days, automatic)
+            elif selection == '6':  # Rename or merge tasks
+                renames = self._ask_for_renames()
+                return selection, renames
+            elif selection == '7':  # Move time between tasks
+                reassignment = self._ask_for_reassignment()
+                return selection, reassignment
+            elif selection == '8':  # Help task
                 self._help("task")
                 return selection, None
-            elif selection == '5':  # Return
+            elif selection == '9':  # Return
                 return selection, None
 
     ################ Specific User Inputs ################
@@ -290,10 +548,11 @@ class UserInterface:
         """
         Tells the user to hit enter to return, but works for any key (doesn't matter what they press, just need a press)
         """
-        _ = input("\nPress ENTER to return...")
+        _ = ask("\nPress ENTER to return...")
 
     def _ask_what_string(self, work=False, add=False, delete=False, load=False, remove=False, backup=False,
-                         create=False, default=False, summary=False, workweek=False):
+                         create=False, default=False, summary=False, workweek=False, retire=False, sync_export=False,
+                         sync_import=False):
         """
         Asks for a task/sheet, and the prompt depends on the context.
         :param work: context for string output (task)
@@ -303,43 +562,192 @@ class UserInterface:
         :param remove: context for string output (timesheet)
         :param backup: context for string output (timesheet)
         :param workweek: context for string output (timesheet)
+        :param retire: context for string output (task)
+        :param sync_export: context for string output (path)
+        :param sync_import: context for string output (path)
         :return: task name
         """
         self.banner()
         if work:
-            string = input("Log work for which Task?\n\t...")
+            string = ask("Log work for which Task?\n\t...")
         elif add:
-            string = input("Add which Task?\n\t...")
+            string = ask("Add which Task(s)? (separate several with commas)\n\t...")
         elif delete:
-            string = input("Delete which Task?\n\t...")
+            string = ask("Delete which Task(s)? (separate several with commas)\n\t...")
         elif load:
-            string = input("Load which Timesheet?\n\t...")
+            string = ask("Load which Timesheet?\n\t...")
         elif remove:
-            string = input("Delete which Timesheet?\n\t...")
+            string = ask("Delete which Timesheet?\n\t...")
         elif backup:
-            string = input("Backup which Timesheet?\n\t...")
+            string = ask("Backup which Timesheet?\n\t...")
         elif create:
-            string = input("What will the new Timesheet be called?\n\t...")
+            string = ask("What will the new Timesheet be called?\n\t...")
         elif default:
-            string = input("What Timesheet will be the default?\n\t...")
+            string = ask("What Timesheet will be the default?\n\t...")
         elif summary:
-            string = input("Which Task do you want to summarize?\n\t...")
+            string = ask("Which Task do you want to summarize?\n\t...")
         elif workweek:
-            string = input("How many hours is a workweek for Timesheet '{}'?...".format(self.name))
+            string = ask("How many hours is a workweek for Timesheet '{}'?...".format(self.name))
+        elif retire:
+            string = ask("Retire which Task?\n\t...")
+        elif sync_export:
+            string = ask("Export changes to which file? (ENTER for '{}.delta')\n\t...".format(self.name))
+        elif sync_import:
+            string = ask("Import changes from which file?\n\t...")
         return string
 
+    def _ask_for_inactive_days(self):
+        """
+        Asks after how many days without logged time a Task counts as inactive, and whether to retire automatically
+        :return: number of days as string ("" if invalid), and whether to retire automatically on load
+        """
+        self.banner()
+        days = ask("Retire Tasks that have had no time logged in how many days?\n\t...")
+        if not days.isdigit():
+            return "", False
+        automatic = ask("\nRetire inactive Tasks automatically every time this Timesheet is loaded? [y/n]...")
+        return days, automatic.lower() == 'y'
+
+    def _ask_for_retention(self):
+        """
+        Asks how many months of days to keep, and whether to roll older days up per week or per month
+        :return: number of months as string ("" to keep all days), and 'week' or 'month'
+        """
+        self.banner()
+        months = ask("Keep every day of how many months? (ENTER to keep all days)\n\t...")
+        if not months.isdigit():
+            return "", "month"
+        granularity = ask("\nKeep older days as totals per [w]eek or per [m]onth?...")
+        return months, "week" if granularity.lower() in ["w", "week"] else "month"
+
+    def _ask_for_rate(self):
+        """
+        Asks for which Task to set an hourly rate, and the rate
+        :return: task ("" for the rate of the whole Timesheet), and the rate as string ("" to remove it)
+        """
+        self.banner()
+        task = ask("Set the hourly rate of which Task?  The rate also applies to its subtasks.\n"
+                   "(ENTER for the rate of the whole Timesheet)\n\t...")
+        rate = ask("\nHourly rate? (ENTER to remove the rate)\n\t...")
+        return task, rate
+
+    def _ask_for_budget(self):
+        """
+        Asks for which Task and period to set a budget, and its hours
+        :return: task ("" for the whole Timesheet), period ('day', 'week', 'total', or "" if invalid), and hours as
+                 string ("" to remove the budget)
+        """
+        self.banner()
+        task = ask("Set a budget for which Task?  The budget also counts its subtasks.\n"
+                   "(ENTER for the whole Timesheet)\n\t...")
+        period = ask("\nBudget per [d]ay, per [w]eek, or in [t]otal?...").lower()
+        period = {"d": "day", "w": "week", "t": "total"}.get(period, period)
+        hours = ask("\nHow many hours? (ENTER to remove the budget)\n\t...")
+        return task, period if period in ["day", "week", "total"] else "", hours
+
+    def _ask_for_rounding(self):
+        """
+        Asks how to round billed time
+        :return: rounding string, e.g. 'day/15' ("" for no rounding)
+        """
+        self.banner()
+        mode = ask("Round billed time up [d]aily per Task, per logged [e]ntry, or [n]ot at all?...")
+        if mode.lower() not in ["d", "day", "e", "entry"]:
+            return ""
+        minutes = ask("\nRound up to how many minutes? (e.g. 6 or 15)\n\t...")
+        return "{}/{}".format("day" if mode.lower() in ["d", "day"] else "entry", minutes)
+
+    def _ask_for_period(self):
+        """
+        Asks for the first and the last day of a period
+        :return: first and last day (YYYY-MM-DD), or None if invalid
+        """
+        self.banner()
+        first = ask("First day (YYYY-MM-DD)? (ENTER for the first day of this month)\n\t...")
+        last = ask("Last day (YYYY-MM-DD)? (ENTER for today)\n\t...")
+        today = self.today()
+        first = first or today.start_of("month").to_date_string()
+        last = last or today.to_date_string()
+        for day in [first, last]:
+            if not (re.match(r"^\d{4}-\d{2}-\d{2}$", day) and self._check_date_validity(day)):
+                print("[WARNING] Invalid date '{}'...".format(day))
+                self.user_return()
+                return None
+        return first, last
+
+    def _ask_for_renames(self):
+        """
+        Asks for the Tasks to rename, as old=new pairs
+        :return: dictionary of old name to new name (empty if invalid)
+        """
+        self.banner()
+        string = ask("Rename which Tasks?  Give old=new pairs separated by commas, e.g. 'misc=General, mtg=Meetings'"
+                     ".\nRenaming a Task to an existing Task merges their time.\n\t...")
+        try:
+            return parse_renames(string)
+        except ValueError as e:
+            print("[WARNING] {}...not renaming.".format(e))
+            self.user_return()
+            return {}
+
+    def _ask_for_reassignment(self):
+        """
+        Asks which time to move from which Task to which Task
+        :return: source task, target task, first day, and last day ("" for no limit)
+        """
+        self.banner()
+        source = ask("Move time from which Task?\n\t...")
+        target = ask("Move the time to which Task?\n\t...")
+        days = []
+        for which in ["first", "last"]:
+            day = ask("{} day of the time to move (YYYY-MM-DD)? (ENTER for the {} day of the Timesheet)"
+                      "\n\t...".format(which.capitalize(), which))
+            if day != "" and not (re.match(r"^\d{4}-\d{2}-\d{2}$", day) and self._check_date_validity(day)):
+                print("[WARNING] Invalid date...not moving any time.")
+                self.user_return()
+                return "", "", "", ""
+            days.append(day)
+        return source, target, days[0], days[1]
+
+    @staticmethod
+    def ask_passphrase(name, confirm=False):
+        """
+        Asks for the passphrase of an encrypted Timesheet without echoing it
+        :param name: name of Timesheet
+        :param confirm: ask twice, for a new passphrase
+        :return: passphrase, or None if the two entries did not match
+        """
+        with UserInterface.waiting():
+            passphrase = getpass.getpass("Passphrase for Timesheet '{}': ".format(name))
+            if confirm and getpass.getpass("Repeat the passphrase: ") != passphrase:
+                return None
+        return passphrase
+
     def _ask_for_baseline(self):
         BASELINE_REGEX = r"\d{2}d\d{2}h\d{2}m"
         self.banner()
         baseline = ""
         valid = False
         while not re.match(BASELINE_REGEX, baseline) and valid == False:
-            baseline = input("The baseline is how much time was worked before starting to use the Timesheet Manager.\n"
-                             "This time will be added onto the total time to get an accurate image of how much work has\n"
-                             "been completed.\n\nInput time worked in the following format: xxdxxhxxm\n...")
+            baseline = ask("The baseline is how much time was worked before starting to use the Timesheet Manager.\n"
+                           "This time will be added onto the total time to get an accurate image of how much work has\n"
+                           "been completed.\n\nInput time worked in the following format: xxdxxhxxm\n...")
             print()
         return baseline
 
+    def _ask_for_query(self):
+        self.banner()
+        return ask("Enter a query.  All clauses are optional:\n\t"
+                   "tasks~PATTERN               Tasks matching the pattern, e.g. tasks~\"client/*\"\n\t"
+                   "between DATE and DATE       Days in the range (YYYY-MM-DD); or since DATE / until DATE\n\t"
+                   "group by FIELD[, FIELD]     task, day, week, month, or year\n\t...")
+
+    def _ask_for_moment(self):
+        self.banner()
+        return ask("Which time?\n\t"
+                   "1. YYYY-MM-DD HH:MM                     a point in time\n\t"
+                   "2. YYYY-MM-DD HH:MM to YYYY-MM-DD HH:MM  a range of time\n\t...")
+
     def _ask_for_day(self):
         DATE_REGEX = r"^\d{4}-\d{2}-\d{2}$"
         self.banner()
@@ -349,10 +757,10 @@ class UserInterface:
             if day.lower() == "today" or day.lower() == "yesterday":
                 return day.lower()
             else:
-                day = input("What day do you want to summarize?\n\tAvailable options:\n\t"
-                            "1. YYYY-MM-DD\n\t"
-                            "2. Today\n\t"
-                            "3. Yesterday\n\t...")
+                day = ask("What day do you want to summarize?\n\tAvailable options:\n\t"
+                          "1. YYYY-MM-DD\n\t"
+                          "2. Today\n\t"
+                          "3. Yesterday\n\t...")
                 valid = self._check_date_validity(day)
                 print()
             if day == "":
@@ -361,25 +769,66 @@ class UserInterface:
 
     ################ Specific Functions ################
 
-    def timelogger(self, name, resume=None):
+    def timelogger(self, name, resume=None, tick=None):
         """
         Page for starting the logging of time.
         :param name: name of task
         :param resume: whether to print information regarding a resumed task
+        :param tick: function called with the seconds the timer has been running, once a second while the live timer
+                     is shown; returns lines to show, e.g. budget alerts
         """
         if resume is not None:
-            original_time = pendulum.from_timestamp(resume, tz="Europe/Berlin").to_time_string()
-            start_time = time.strftime("%H:%M:%S", time.localtime())
-            self.banner()
-            print("[RESUME] Previous start time loaded for Task '{}', started at {}.".format(name, original_time))
-            print("\nLogging time continuing from {}.".format(start_time))
-            while input("\nPress ENTER to end logging...") != "": continue
+            original_time = pendulum.from_timestamp(resume, tz=timezone(self.tz)).to_time_string()
+            start_time = pendulum.now(tz=timezone(self.tz)).to_time_string()
+            lines = ["[RESUME] Previous start time loaded for Task '{}', started at {}.".format(name, original_time),
+                     "\nLogging time continuing from {}.".format(start_time)]
+            started = resume
         else:
             # may lose a second on loading time between functions
-            start_time = time.strftime("%H:%M:%S", time.localtime())
+            start_time = pendulum.now(tz=timezone(self.tz)).to_time_string()
+            lines = ["Logging time on '{}', starting at {}.".format(name, start_time)]
+            started = time.time()
+        if curses is not None and UserInterface.source.interactive and sys.stdin.isatty() and sys.stdout.isatty():
+            with UserInterface.waiting():  # the timer runs until the user ends it
+                curses.wrapper(self._live_timer, lines, started, tick)
+        else:
             self.banner()
-            print("Logging time on '{}', starting at {}.".format(name, start_time))
-            while input("\nPress ENTER to end logging...") != "": continue
+            for line in lines:
+                print(line)
+            for line in tick(int(time.time() - started)) if tick is not None else []:
+                print(line)
+            while ask("\nPress ENTER to end logging...") != "": continue
+
+    def _live_timer(self, screen, lines, started, tick=None):
+        """
+        Curses page for a running timer.  The page is drawn once, after that only the elapsed time is redrawn,
+        once a second, until ENTER is pressed.  Lines returned by the tick are added below.
+        :param screen: curses window
+        :param lines: lines describing the running task
+        :param started: timestamp the task was started at
+        :param tick: function called with the elapsed seconds every second, returning lines to add
+        """
+        curses.curs_set(0)
+        screen.timeout(1000)  # getch returns -1 after a second without a key press
+        text = self._banner_text() + "\n".join(lines) + "\n\n"
+        height, width = screen.getmaxyx()
+        rows = [row[:width - 1] for row in text.split("\n")][:max(0, height - 3)]
+        for y, row in enumerate(rows):
+            screen.addstr(y, 0, row)
+        screen.addstr(len(rows) + 1, 0, "Press ENTER to end logging..."[:width - 1])
+        key = -1
+        notices = 0
+        while key not in (10, 13, curses.KEY_ENTER):
+            elapsed = int(time.time() - started)
+            screen.addstr(len(rows), 0, "Elapsed: {:d}:{:02d}:{:02d}".format(
+                elapsed // 3600, elapsed % 3600 // 60, elapsed % 60)[:width - 1])
+            screen.clrtoeol()
+            for line in tick(elapsed) if tick is not None else []:
+                if len(rows) + 3 + notices < height:
+                    screen.addstr(len(rows) + 3 + notices, 0, line[:width - 1])
+                    notices += 1
+            screen.refresh()
+            key = screen.getch()
 
     def _check_date_validity(self, date):
         """
@@ -390,3 +839,23 @@ class UserInterface:
         if len(date) == 10 and int(date[5:7]) <= 12 and int(date[-2:]) <= 31:
             return True
         return False
+
+
+class HeadlessUserInterface(UserInterface):
+    """
+    User interface without a screen, for driving a TimesheetManager from code.  Nothing is printed by it and it never
+    waits for the user.  The timer does not wait either; it calls the timer hook, which e.g. advances a simulated clock
+    by the time worked.
+    """
+
+    timer = None  # function called with the task name instead of showing the timer
+
+    def banner(self):
+        pass
+
+    def user_return(self):
+        pass
+
+    def timelogger(self, name, resume=None, tick=None):
+        if self.timer is not None:
+            self.timer(name)
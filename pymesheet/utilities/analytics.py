@@ -0,0 +1,179 @@
+"""
+Trends over the whole history of a Timesheet.
+Analytics keeps the time worked on every calendar day since the first day of the Timesheet in a numpy array, together
+with its running sum.  Rolling averages, the distribution over the weekdays, and the balance against the workweek are
+vectorized operations on these two arrays, and logging new time only updates their ends instead of recomputing them.
+Weeks run from Monday to Sunday, and a workweek is spread evenly over Monday to Friday.
+
+Rolled-up history (see utilities.archive.roll_up) only has a total per week or month, so it is left out of the arrays:
+it counts towards the total and the balance against the workweek, but not towards the averages, the time per weekday,
+or the forecast.
+"""
+import numpy as np
+import pandas as pd
+from utilities.duration import SECONDS_PER_HOUR
+from utilities.calendar import weekdays as _weekdays
+
+WORKDAYS = 5
+
+
+def _day(day):
+    return np.datetime64(day, "D")
+
+
+class Analytics:
+    """
+    Time worked per day and its running sum, from the first day of a Timesheet
+    """
+
+    def __init__(self, start=None, daily=(), rolled=0, first=None):
+        """
+        :param start: first day of the daily time
+        :param daily: seconds worked on every day from the first day
+        :param rolled: seconds of the rolled-up history before the first day
+        :param first: first day of the rolled-up history, or None if there is none
+        """
+        self.start = None if start is None else _day(start)
+        self.daily = np.asarray(daily, dtype=np.int64)
+        self.cumulative = np.cumsum(self.daily)
+        self.rolled = int(rolled)
+        self.first = None if first is None else _day(first)
+
+    @classmethod
+    def from_data(cls, *frames, rolled=None):
+        """
+        :param frames: timesheet dataframes, e.g. the active data and the archived rows; None or empty are skipped
+        :param rolled: rolled-up totals, with the first day of each period as columns, or None
+        :return: Analytics of their combined time
+        """
+        history, first = 0, None
+        if rolled is not None and rolled.shape[1] > 0:
+            history, first = int(rolled.values.sum()), min(str(period) for period in rolled.columns)
+        totals = [frame.sum(axis=0) for frame in frames if frame is not None and frame.shape[1] > 0]
+        if len(totals) == 0:
+            return cls(rolled=history, first=first)
+        totals = pd.concat(totals).groupby(level=0).sum()
+        days = pd.to_datetime(pd.Index(totals.index.astype(str))).values.astype("datetime64[D]")
+        start = days.min()
+        daily = np.zeros(int((days.max() - start).astype(np.int64)) + 1, dtype=np.int64)
+        daily[(days - start).astype(np.int64)] = totals.values
+        return cls(start, daily, history, first)
+
+    def __len__(self):
+        return len(self.daily)
+
+    def days(self):
+        """
+        :return: datetime64[D] array of all days
+        """
+        return self.start + np.arange(len(self.daily))
+
+    def _index(self, day):
+        return int((_day(day) - self.start).astype(np.int64))
+
+    def since(self):
+        """
+        :return: first day of the history, including the rolled-up history
+        """
+        return self.start if self.first is None or self.start is None else min(self.first, self.start)
+
+    def total(self):
+        return (int(self.cumulative[-1]) if len(self) > 0 else 0) + self.rolled
+
+    ################ Updates ################
+
+    def extend_to(self, day):
+        """
+        Adds days without time up to the given day, e.g. up to today
+        :param day: date string (YYYY-MM-DD)
+        """
+        if self.start is None:
+            self.start = _day(day)
+        missing = self._index(day) + 1 - len(self)
+        if missing > 0:
+            self.cumulative = np.concatenate([self.cumulative, np.full(missing, self.total(), dtype=np.int64)])
+            self.daily = np.concatenate([self.daily, np.zeros(missing, dtype=np.int64)])
+
+    def record(self, day, seconds):
+        """
+        Adds logged time.  Time logged on the last day is O(1); earlier days update the running sum from that day on.
+        :param day: date string (YYYY-MM-DD)
+        :param seconds: seconds logged
+        """
+        if self.start is not None and _day(day) < self.start:
+            before = np.zeros(int((self.start - _day(day)).astype(np.int64)), dtype=np.int64)
+            self.daily = np.concatenate([before, self.daily])
+            self.cumulative = np.concatenate([before, self.cumulative])
+            self.start = _day(day)
+        self.extend_to(day)
+        i = self._index(day)
+        self.daily[i] += seconds
+        self.cumulative[i:] += seconds
+
+    ################ Trends ################
+
+    def rolling_weekly(self, weeks=4):
+        """
+        Average time per week over the given number of weeks up to each day.  The first days average over the
+        days available.
+        :param weeks: length of the window
+        :return: float array of seconds per week, one per day
+        """
+        window = 7 * weeks
+        ends = np.arange(1, len(self) + 1)
+        padded = np.concatenate([[0], self.cumulative])
+        sums = padded[ends] - padded[np.maximum(ends - window, 0)]
+        return sums / (np.minimum(ends, window) / 7)
+
+    def weekday_distribution(self, first=None, last=None):
+        """
+        Time worked per weekday
+        :param first: first day to include (YYYY-MM-DD), or None
+        :param last: last day to include (YYYY-MM-DD), or None
+        :return: array of total seconds and float array of average seconds per weekday, Monday first
+        """
+        lo = 0 if first is None else max(self._index(first), 0)
+        hi = len(self) if last is None else min(self._index(last) + 1, len(self))
+        if hi <= lo:
+            return np.zeros(7, dtype=np.int64), np.zeros(7)
+        weekdays = _weekdays(self.days()[lo:hi])
+        totals = np.bincount(weekdays, weights=self.daily[lo:hi], minlength=7)
+        counts = np.bincount(weekdays, minlength=7)
+        return totals.astype(np.int64), np.divide(totals, counts, out=np.zeros(7), where=counts > 0)
+
+    def expected(self, workweek):
+        """
+        Running sum of the time the workweek asks for, a fifth of it on every Monday to Friday, including the workdays
+        of the rolled-up history
+        :param workweek: workweek hours
+        :return: array of seconds, one per day
+        """
+        per_day = workweek * SECONDS_PER_HOUR // WORKDAYS
+        before = 0 if self.first is None else max(int(np.busday_count(self.first, self.start)), 0)
+        return (before + np.cumsum(_weekdays(self.days()) < WORKDAYS)) * per_day
+
+    def balance(self, workweek):
+        """
+        Overtime (positive) or undertime (negative) against the workweek since the first day of the history, including
+        the rolled-up history, on each day
+        :param workweek: workweek hours
+        :return: array of seconds, one per day
+        """
+        return self.cumulative + self.rolled - self.expected(workweek)
+
+    def forecast(self, today, weeks=4):
+        """
+        Projects the time worked by the end of the current week: the time worked so far this week, plus for each
+        remaining day the average of that weekday over the weeks before
+        :param today: date string (YYYY-MM-DD)
+        :param weeks: number of weeks before this one to take the averages from
+        :return: seconds worked so far this week, and projected seconds by Sunday
+        """
+        self.extend_to(today)
+        i = self._index(today)
+        weekday = int(_weekdays(np.array([_day(today)]))[0])
+        monday = i - weekday
+        worked = int(self.cumulative[i] - (self.cumulative[monday - 1] if monday > 0 else 0))
+        before = self.start + max(monday, 0)
+        _, averages = self.weekday_distribution(str(before - 7 * weeks), str(before - 1))
+        return worked, worked + int(round(averages[weekday + 1:].sum()))
@@ -0,0 +1,215 @@
+"""
+Archive utilities for retiring Tasks out of the active Timesheet.
+Retired rows are moved to cold storage in the '.archive' folder next to the Timesheets, while a small per-Task
+aggregate of their seconds is kept so that totals stay exact without loading the raw rows.
+
+Old history can be rolled up as well: with a retention policy, the days before a cutoff are summed into per-Task totals
+per week or per month, which are kept in the archive instead of the days.  The cutoff is always the first day of a
+week or month, so that every rolled-up period is complete, and a period's total is counted on its first day.
+
+The archive of an encrypted Timesheet is kept encrypted in its folder instead; the functions take the unlocked
+EncryptedStore of the Timesheet for that, or None.
+"""
+import pickle, os
+import numpy as np
+import pandas as pd
+from os.path import join as pathjoin
+from utilities.calendar import weekdays
+
+ARCHIVE_FOLDER = ".archive"
+ROLLUPS = ["week", "month"]
+
+
+def _archive_path(path, name, suffix=""):
+    return pathjoin(path, ARCHIVE_FOLDER, "{}{}.pkl".format(name, suffix))
+
+
+def _load(path, name, suffix, store):
+    """
+    Loads a file of the archive; raises FileNotFoundError if it does not exist
+    """
+    if store is not None:
+        return pickle.loads(store.read_chunk("archive" + suffix))
+    with open(_archive_path(path, name, suffix), "rb") as f:
+        return pickle.load(f)
+
+
+def _save(path, name, suffix, value, store):
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if store is not None:
+        store.write_chunk("archive" + suffix, payload)
+        return
+    os.makedirs(pathjoin(path, ARCHIVE_FOLDER), exist_ok=True)
+    with open(_archive_path(path, name, suffix), "wb") as f:
+        f.write(payload)
+
+
+def encrypt_archive(path, name, store):
+    """
+    Moves the archive of a Timesheet that was just encrypted into its encrypted folder
+    :param path: path of the Timesheets folder
+    :param name: name of Timesheet
+    :param store: unlocked EncryptedStore of the Timesheet
+    """
+    for suffix in ["", "-totals", "-rollup"]:
+        try:
+            value = _load(path, name, suffix, None)
+        except FileNotFoundError:
+            continue
+        _save(path, name, suffix, value, store)
+        os.remove(_archive_path(path, name, suffix))
+
+
+def load_archived_totals(path, name, store=None):
+    """
+    Loads the per-Task aggregate of retired time for a Timesheet
+    :param path: path of the Timesheets folder
+    :param name: name of Timesheet
+    :param store: EncryptedStore of an encrypted Timesheet, or None
+    :return: dictionary of task name to seconds (empty if nothing was retired)
+    """
+    try:
+        return _load(path, name, "-totals", store)
+    except FileNotFoundError:
+        return {}
+
+
+def load_archived_rows(path, name, store=None):
+    """
+    Loads the raw retired rows (cold storage) of a Timesheet
+    :param path: path of the Timesheets folder
+    :param name: name of Timesheet
+    :param store: EncryptedStore of an encrypted Timesheet, or None
+    :return: dataframe of retired rows, empty if nothing was retired
+    """
+    try:
+        return _load(path, name, "", store)
+    except FileNotFoundError:
+        return pd.DataFrame()
+
+
+def archive_rows(path, name, rows, store=None):
+    """
+    Appends rows to the cold storage of a Timesheet and folds their time into the per-Task aggregate.
+    A Task that is retired more than once is summed into its existing archive row.
+    :param path: path of the Timesheets folder
+    :param name: name of Timesheet
+    :param rows: dataframe of rows to retire (index are tasks, columns are days)
+    :param store: EncryptedStore of an encrypted Timesheet, or None
+    :return: updated dictionary of task name to seconds
+    """
+    cold = load_archived_rows(path, name, store)
+    cold = pd.concat([cold, rows], sort=True).fillna(0)
+    cold = cold.groupby(level=0, sort=False).sum()
+    _save(path, name, "", cold, store)
+
+    totals = load_archived_totals(path, name, store)
+    for task, seconds in rows.sum(axis=1).items():
+        totals[task] = totals.get(task, 0) + int(seconds)
+    _save(path, name, "-totals", totals, store)
+    return totals
+
+
+def find_inactive_tasks(data, cutoff):
+    """
+    Finds tasks whose most recent logged time is before the cutoff day.  Tasks that never had time logged are left
+    alone, since they were most likely just created.
+    :param data: timesheet dataframe
+    :param cutoff: date string (YYYY-MM-DD); tasks last active before this day are inactive
+    :return: list of inactive task names
+    """
+    if data.empty or len(data.columns) == 0:
+        return []
+    days = np.array(sorted(data.columns))
+    active = data[days].values != 0
+    used = active.any(axis=1)
+    # index of the last active day per task; argmax on the reversed columns finds it in one pass
+    last = len(days) - 1 - np.argmax(active[:, ::-1], axis=1)
+    inactive = used & (days[last] < cutoff)
+    return list(data.index[inactive])
+
+
+################ Retention ################
+
+def period_starts(days, granularity):
+    """
+    :param days: datetime64[D] array
+    :param granularity: 'week' or 'month'
+    :return: datetime64[D] array of the first day of the week (Monday) or month of each day
+    """
+    if granularity == "week":
+        return days - weekdays(days)
+    return days.astype("datetime64[M]").astype("datetime64[D]")
+
+
+def retention_cutoff(today, months, granularity):
+    """
+    First day kept in full detail: the first day of the period holding the day the given number of months ago
+    :param today: today as pendulum date
+    :param months: number of months of daily detail to keep
+    :param granularity: 'week' or 'month'
+    :return: date string (YYYY-MM-DD)
+    """
+    day = np.array([today.subtract(months=months).to_date_string()], dtype="datetime64[D]")
+    return str(period_starts(day, granularity)[0])
+
+
+def downsample(data, cutoff, granularity):
+    """
+    Splits a Timesheet into the days from the cutoff on, and per-Task totals per period of the days before
+    :param data: timesheet dataframe
+    :param cutoff: first day to keep (YYYY-MM-DD)
+    :param granularity: 'week' or 'month'
+    :return: dataframe of the kept days, and dataframe of the totals (columns are the first days of the periods)
+    """
+    days = pd.Index(data.columns.astype(str))
+    old = days < cutoff
+    if not old.any():
+        return data, pd.DataFrame(index=data.index)
+    old_days = np.array(days[old], dtype=str).astype("datetime64[D]")
+    starts = np.datetime_as_string(period_starts(old_days, granularity), unit="D")
+    rolled = data.loc[:, old].T.groupby(starts).sum().T
+    return data.loc[:, ~old], rolled.astype(np.int64)
+
+
+def load_rollup(path, name, store=None):
+    """
+    Loads the rolled-up history of a Timesheet
+    :param path: path of the Timesheets folder
+    :param name: name of Timesheet
+    :param store: EncryptedStore of an encrypted Timesheet, or None
+    :return: dictionary with the granularity ('week', 'month', or None if nothing was rolled up), the cutoff, the
+    number of rolled-up days, and the totals (dataframe of tasks x first days of the periods)
+    """
+    try:
+        return _load(path, name, "-rollup", store)
+    except FileNotFoundError:
+        return {"granularity": None, "cutoff": "", "days": 0, "totals": pd.DataFrame()}
+
+
+def save_rollup(path, name, rollup, store=None):
+    _save(path, name, "-rollup", rollup, store)
+
+
+def roll_up(path, name, data, cutoff, granularity, store=None):
+    """
+    Rolls the days before the cutoff into the rolled-up history of a Timesheet and saves it.  Once a Timesheet has
+    rolled-up history, its granularity stays the same.  Does not save the Timesheet.
+    :param path: path of the Timesheets folder
+    :param name: name of Timesheet
+    :param data: timesheet dataframe
+    :param cutoff: first day to keep (YYYY-MM-DD)
+    :param granularity: 'week' or 'month'
+    :param store: EncryptedStore of an encrypted Timesheet, or None
+    :return: dataframe of the kept days, and the updated rollup (see load_rollup)
+    """
+    rollup = load_rollup(path, name, store)
+    granularity = rollup["granularity"] or granularity
+    kept, rolled = downsample(data, cutoff, granularity)
+    if rolled.shape[1] == 0:
+        return data, rollup
+    totals = rollup["totals"].add(rolled, fill_value=0).fillna(0).astype(np.int64)
+    rollup = {"granularity": granularity, "cutoff": max(rollup["cutoff"], cutoff),
+              "days": rollup["days"] + data.shape[1] - kept.shape[1], "totals": totals[sorted(totals.columns)]}
+    save_rollup(path, name, rollup, store)
+    return kept, rollup
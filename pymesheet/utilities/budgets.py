@@ -0,0 +1,247 @@
+"""
+Budgets of time per Task or per Timesheet, per day, per week, or in total, with alerts when a threshold is crossed.
+A budget of a Task also counts the time of its subtasks; a budget of '' counts the whole Timesheet.  The tracker keeps
+a counter per budget for its current period (the day, the week from Monday, or all time), filled once from the data
+when the Timesheet is loaded.  After that, recording time only adds to the counters of the budgets on the path of the
+Task, so a check takes the same time however large the Timesheet is.  An alert fires once per budget, period, and
+threshold, when the time first reaches the threshold; thresholds reached before the Timesheet was loaded do not fire
+again.  A running timer can check the time it would add, so alerts also fire while the timer runs.
+"""
+import datetime, json
+import numpy as np
+import pandas as pd
+from utilities.duration import Duration, SECONDS_PER_HOUR
+from utilities.task_tree import SEPARATOR, ancestors
+
+PERIODS = ["day", "week", "total"]
+THRESHOLDS = [80, 100]  # percent of a budget at which alerts fire, unless set in the config
+PERIOD_NAMES = {"day": "daily", "week": "weekly", "total": "total"}
+
+
+################ Settings ################
+
+def parse_budgets(string):
+    """
+    :param string: JSON list of [task, period, hours], as stored in the config; task "" is the whole Timesheet
+    :return: list of (task, period, seconds)
+    """
+    if string == "":
+        return []
+    try:
+        budgets = json.loads(string)
+    except ValueError:
+        raise ValueError("Invalid budgets '{}', expected a JSON list".format(string))
+    if not isinstance(budgets, list):
+        raise ValueError("Invalid budgets '{}', expected a JSON list".format(string))
+    if not all(isinstance(budget, list) and len(budget) == 3 for budget in budgets):
+        raise ValueError("Invalid budgets '{}', expected a list of [task, period, hours]".format(string))
+    return [parse_budget(*budget) for budget in budgets]
+
+
+def parse_budget(task, period, hours):
+    """
+    :param task: task name, or "" for the whole Timesheet
+    :param period: 'day', 'week', or 'total'
+    :param hours: hours of the budget, as number or string
+    :return: (task, period, seconds)
+    """
+    if period not in PERIODS:
+        raise ValueError("Invalid budget period '{}', expected one of {}".format(period, ", ".join(PERIODS)))
+    try:
+        hours = float(hours)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid budget of '{}' hours".format(hours))
+    if not hours > 0:
+        raise ValueError("Invalid budget of '{}' hours, expected more than 0".format(hours))
+    return str(task).strip(SEPARATOR), period, int(round(hours * SECONDS_PER_HOUR))
+
+
+def format_budgets(budgets):
+    """
+    :param budgets: list of (task, period, seconds)
+    :return: JSON string, as stored in the config
+    """
+    return json.dumps([[task, period, seconds / SECONDS_PER_HOUR] for task, period, seconds in budgets],
+                      ensure_ascii=False)
+
+
+def parse_thresholds(string):
+    """
+    :param string: percents separated by commas, e.g. '50,80,100', or "" for the default
+    :return: sorted list of percents
+    """
+    if string == "":
+        return list(THRESHOLDS)
+    try:
+        thresholds = sorted(set(int(part) for part in string.split(",")))
+    except ValueError:
+        raise ValueError("Invalid thresholds '{}', expected percents separated by commas".format(string))
+    if thresholds[0] <= 0:
+        raise ValueError("Invalid thresholds '{}', expected percents above 0".format(string))
+    return thresholds
+
+
+def period_key(day, period):
+    """
+    :param day: date string (YYYY-MM-DD)
+    :param period: 'day', 'week', or 'total'
+    :return: the first day of the period the day is in; "" for 'total'
+    """
+    if period == "day":
+        return day
+    elif period == "week":
+        date = datetime.date.fromisoformat(day)
+        return (date - datetime.timedelta(days=date.weekday())).isoformat()
+    return ""
+
+
+def alert_message(alert, sheet):
+    """
+    :param alert: (task, period, seconds of the budget, seconds used, threshold in percent)
+    :param sheet: name of the Timesheet
+    :return: string
+    """
+    task, period, limit, used, threshold = alert
+    who = "Task '{}'".format(task) if task != "" else "Timesheet '{}'".format(sheet)
+    if threshold == 100:
+        what = "has reached its {} budget".format(PERIOD_NAMES[period])
+    else:
+        what = "has used {}% of its {} budget".format(threshold, PERIOD_NAMES[period])
+    return "[BUDGET] {} {} of {} ({} logged).".format(who, what, Duration(limit).hours_minutes(),
+                                                      Duration(used).hours_minutes())
+
+
+################ Tracking ################
+
+class BudgetTracker:
+    """
+    Running counters of the budgets of a Timesheet for their current periods
+    """
+
+    def __init__(self, budgets=(), thresholds=THRESHOLDS):
+        """
+        :param budgets: list of (task, period, seconds)
+        :param thresholds: percents of a budget at which alerts fire
+        """
+        self.budgets = list(budgets)
+        self.thresholds = sorted(thresholds)
+        self.by_task = {}  # task -> numbers of its budgets
+        for i, (task, _, _) in enumerate(self.budgets):
+            self.by_task.setdefault(task, []).append(i)
+        self.periods = [None] * len(self.budgets)  # current period of every budget
+        self.used = [0] * len(self.budgets)  # seconds used in the current period
+        self.fired = set()  # (budget, period, threshold) of the alerts that fired
+
+    def __len__(self):
+        return len(self.budgets)
+
+    @classmethod
+    def from_data(cls, budgets, data, today, thresholds=THRESHOLDS, history=None):
+        """
+        Fills the counters with the time of the current periods
+        :param budgets: list of (task, period, seconds)
+        :param data: timesheet dataframe
+        :param today: date string (YYYY-MM-DD)
+        :param thresholds: percents of a budget at which alerts fire
+        :param history: series of seconds per task that is no longer in the data (retired and rolled up), counted
+                        for the 'total' budgets
+        :return: BudgetTracker
+        """
+        tracker = cls(budgets, thresholds)
+        if len(tracker) == 0:
+            return tracker
+        days = pd.Index(data.columns).to_numpy(dtype=str)
+        values = data.to_numpy()
+        for period in set(period for _, period, _ in tracker.budgets):
+            key = period_key(today, period)
+            if period == "total":
+                seconds = pd.Series(values.sum(axis=1), index=data.index)
+                if history is not None and len(history) > 0:
+                    seconds = seconds.add(history, fill_value=0)
+            else:
+                last = today if period == "day" else (datetime.date.fromisoformat(key) +
+                                                      datetime.timedelta(days=6)).isoformat()
+                seconds = pd.Series(values[:, (days >= key) & (days <= last)].sum(axis=1), index=data.index)
+            names = seconds.index.astype(str)
+            for i, (task, budget_period, limit) in enumerate(tracker.budgets):
+                if budget_period != period:
+                    continue
+                below = (names == task) | names.str.startswith(task + SEPARATOR) if task != "" else \
+                    np.ones(len(names), dtype=bool)
+                tracker.periods[i] = key
+                tracker.used[i] = int(seconds.to_numpy()[below].sum())
+                for threshold in tracker.thresholds:
+                    if tracker.used[i] >= limit * threshold / 100:
+                        tracker.fired.add((i, key, threshold))
+        return tracker
+
+    def _matching(self, task):
+        """
+        :return: numbers of the budgets that count the time of the task
+        """
+        for path in ancestors(task):
+            for i in self.by_task.get(path, ()):
+                yield i
+
+    def _crossed(self, i, key, used):
+        """
+        :return: alerts of the thresholds of a budget that the used time reached for the first time
+        """
+        task, period, limit = self.budgets[i]
+        alerts = []
+        for threshold in self.thresholds:
+            if used >= limit * threshold / 100 and (i, key, threshold) not in self.fired:
+                self.fired.add((i, key, threshold))
+                alerts.append((task, period, limit, used, threshold))
+        return alerts
+
+    def record(self, task, day, seconds):
+        """
+        Adds recorded time to the counters
+        :param task: task name
+        :param day: date string (YYYY-MM-DD)
+        :param seconds: seconds recorded
+        :return: list of alerts, see alert_message
+        """
+        alerts = []
+        for i in self._matching(task):
+            key = period_key(day, self.budgets[i][1])
+            if self.periods[i] is None or key > self.periods[i]:  # a new period started
+                self.periods[i], self.used[i] = key, 0
+            elif key < self.periods[i]:  # time of an earlier period, e.g. imported from another copy
+                continue
+            self.used[i] += seconds
+            alerts += self._crossed(i, key, self.used[i])
+        return alerts
+
+    def check(self, task, day, running):
+        """
+        Checks the time of a running timer that is not recorded yet
+        :param task: task name
+        :param day: date string (YYYY-MM-DD)
+        :param running: seconds the timer has been running
+        :return: list of alerts, see alert_message
+        """
+        alerts = []
+        for i in self._matching(task):
+            key = period_key(day, self.budgets[i][1])
+            if self.periods[i] is not None and key < self.periods[i]:
+                continue
+            used = self.used[i] if key == self.periods[i] else 0
+            alerts += self._crossed(i, key, used + running)
+        return alerts
+
+    def status(self, sheet, today):
+        """
+        :param sheet: name of the Timesheet
+        :param today: date string (YYYY-MM-DD)
+        :return: lines with the time used of every budget in the period of today
+        """
+        lines = []
+        for i, (task, period, limit) in enumerate(self.budgets):
+            who = "'{}'".format(task) if task != "" else "Timesheet '{}'".format(sheet)
+            used = self.used[i] if self.periods[i] == period_key(today, period) else 0
+            lines.append("\t{} {}:\t{} of {} ({:.0f}%)".format(who, PERIOD_NAMES[period],
+                                                            Duration(used).hours_minutes(),
+                                                            Duration(limit).hours_minutes(), 100 * used / limit))
+        return lines
@@ -0,0 +1,121 @@
+"""
+Calendar service: days and weeks in the timezone of a Timesheet.
+Timezone objects and date keys are cached, so asking for today or for the day of a timestamp costs a comparison as long
+as the day has not changed.  Today follows the clock, so a session left open past midnight logs into the new day, and
+intervals running over midnight are split into the days they were worked on.  Weeks run from Monday to Sunday.
+"""
+import datetime, time
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import pendulum
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+@lru_cache(maxsize=None)
+def timezone(name):
+    """
+    :param name: timezone name as in the config, 'local' for the timezone of the system
+    :return: pendulum timezone
+    """
+    if name in ["", "local"]:
+        return pendulum.local_timezone()
+    return pendulum.timezone(name)
+
+
+@lru_cache(maxsize=4096)
+def weekday(day):
+    """
+    :param day: date string (YYYY-MM-DD)
+    :return: name of the weekday
+    """
+    return WEEKDAYS[datetime.date.fromisoformat(day).weekday()]
+
+
+def weekdays(days):
+    """
+    :param days: datetime64[D] array
+    :return: array of weekdays, 0 is Monday
+    """
+    return (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+
+
+def format_moments(timestamps, tz, fmt="%Y-%m-%d %H:%M"):
+    """
+    Formats timestamps as local times in one pass
+    :param timestamps: timestamps
+    :param tz: timezone name
+    :param fmt: strftime format
+    :return: list of strings
+    """
+    if len(timestamps) == 0:
+        return []
+    moments = pd.to_datetime(np.asarray(timestamps, dtype=float), unit="s", utc=True)
+    return list(moments.tz_convert(timezone(tz).name).strftime(fmt))
+
+
+class Calendar:
+    """
+    Today, date keys, and midnights in one timezone
+    """
+
+    def __init__(self, tz="local", clock=time.time):
+        """
+        :param tz: timezone name as in the config
+        :param clock: function returning the current time as a timestamp
+        """
+        self.tz = timezone(tz)
+        self.clock = clock
+        self._today = None  # start of the cached day, with its bounds as timestamps and its date key
+        self._start = self._end = None
+        self._key = None
+
+    def _day_of(self, timestamp):
+        """
+        :return: start of the day holding the timestamp, and the timestamps of its first and of the next midnight
+        """
+        start = pendulum.from_timestamp(timestamp, tz=self.tz).start_of("day")
+        return start, start.timestamp(), start.add(days=1).timestamp()  # days are not always 24 hours long
+
+    def today(self):
+        """
+        :return: start of today, as pendulum datetime; rolls over at midnight
+        """
+        now = self.clock()
+        if self._today is None or not self._start <= now < self._end:
+            self._today, self._start, self._end = self._day_of(now)
+            self._key = self._today.to_date_string()
+        return self._today
+
+    def yesterday(self):
+        return self.today().subtract(days=1)
+
+    def day_key(self, timestamp=None):
+        """
+        :param timestamp: timestamp, or None for now
+        :return: date string (YYYY-MM-DD) of the day holding the timestamp
+        """
+        self.today()
+        if timestamp is None or self._start <= timestamp < self._end:
+            return self._key
+        return pendulum.from_timestamp(timestamp, tz=self.tz).to_date_string()
+
+    def split(self, start, end):
+        """
+        Splits an interval at midnight into the days it was worked on.  The seconds are whole seconds and add up to
+        those of the whole interval.
+        :param start: timestamp
+        :param end: timestamp
+        :return: list of (date string, seconds, start, end)
+        """
+        if end <= start:
+            return [(self.day_key(start), int(end - start), start, end)]
+        pieces = []
+        first = start
+        while first < end:
+            day, _, midnight = self._day_of(first)
+            last = min(end, midnight)
+            pieces.append((day.to_date_string(), int(last - start) - int(first - start), first, last))
+            first = last
+        return pieces
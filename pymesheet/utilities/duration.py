@@ -0,0 +1,157 @@
+"""
+Exact durations built on integer seconds.
+Duration holds a single amount of time and DurationArray many of them in a numpy array.  Both count in whole seconds,
+so sums carry over minutes, hours and days correctly and never pick up float rounding.  Parsing of the baseline format
+(XXdXXhXXm) and all formatting of times for the reports live here.
+"""
+import re
+from functools import total_ordering
+import numpy as np
+
+SECONDS_PER_MINUTE = 60
+SECONDS_PER_HOUR = 60 * SECONDS_PER_MINUTE
+SECONDS_PER_DAY = 24 * SECONDS_PER_HOUR
+DHM_REGEX = re.compile(r"^\s*(\d+)d(\d+)h(\d+)m\s*$")
+
+
+@total_ordering
+class Duration:
+    """
+    An amount of time in whole seconds
+    """
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds=0):
+        self.seconds = int(seconds)
+
+    @classmethod
+    def from_hours(cls, hours):
+        return cls(round(hours * SECONDS_PER_HOUR))
+
+    @classmethod
+    def parse(cls, string):
+        """
+        Parses the baseline format, e.g. '01d05h30m'
+        :param string: time in the XXdXXhXXm format; "" is no time
+        :return: Duration
+        """
+        if string == "":
+            return cls()
+        match = DHM_REGEX.match(string)
+        if match is None:
+            raise ValueError("Invalid time '{}', expected the format XXdXXhXXm".format(string))
+        days, hours, minutes = (int(group) for group in match.groups())
+        return cls(days * SECONDS_PER_DAY + hours * SECONDS_PER_HOUR + minutes * SECONDS_PER_MINUTE)
+
+    ################ Components ################
+
+    @property
+    def hours(self):
+        """Whole hours, not wrapped into days"""
+        return self.seconds // SECONDS_PER_HOUR
+
+    @property
+    def minutes(self):
+        """Whole minutes left over after the hours"""
+        return self.seconds % SECONDS_PER_HOUR // SECONDS_PER_MINUTE
+
+    @property
+    def days(self):
+        return self.seconds // SECONDS_PER_DAY
+
+    @property
+    def hours_of_day(self):
+        """Whole hours left over after the days"""
+        return self.seconds % SECONDS_PER_DAY // SECONDS_PER_HOUR
+
+    ################ Formatting ################
+
+    def hours_minutes(self):
+        """
+        :return: e.g. '29 hours, 30 minutes', or '29 hours' if there are no minutes
+        """
+        if self.minutes != 0:
+            return "{} hours, {} minutes".format(self.hours, self.minutes)
+        return "{} hours".format(self.hours)
+
+    def days_hours_minutes(self):
+        """
+        :return: e.g. '1 days, 5 hours, 30 minutes', or '1 days, 5 hours' if there are no minutes
+        """
+        if self.minutes != 0:
+            return "{} days, {} hours, {} minutes".format(self.days, self.hours_of_day, self.minutes)
+        return "{} days, {} hours".format(self.days, self.hours_of_day)
+
+    def short(self):
+        """
+        :return: like hours_minutes, but leaves out the hours when there are none
+        """
+        if self.hours != 0:
+            return self.hours_minutes()
+        if self.minutes == 0 and self.seconds > 0:
+            return "Less than a minute."
+        return "{} minutes".format(self.minutes)
+
+    ################ Arithmetic ################
+
+    def __add__(self, other):
+        if isinstance(other, Duration):
+            return Duration(self.seconds + other.seconds)
+        return NotImplemented
+
+    def __sub__(self, other):
+        if isinstance(other, Duration):
+            return Duration(self.seconds - other.seconds)
+        return NotImplemented
+
+    def __mul__(self, factor):
+        return Duration(self.seconds * factor)
+
+    __rmul__ = __mul__
+
+    def __floordiv__(self, divisor):
+        return Duration(self.seconds // divisor)
+
+    def __neg__(self):
+        return Duration(-self.seconds)
+
+    def __abs__(self):
+        return Duration(abs(self.seconds))
+
+    def __eq__(self, other):
+        if isinstance(other, Duration):
+            return self.seconds == other.seconds
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Duration):
+            return self.seconds < other.seconds
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.seconds)
+
+    def __bool__(self):
+        return self.seconds != 0
+
+    def __int__(self):
+        return self.seconds
+
+    def __repr__(self):
+        return "Duration({})".format(self.seconds)
+
+
+class DurationArray:
+    """
+    Many durations in a numpy array of int64 seconds, e.g. a column of a Timesheet
+    """
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds):
+        self.seconds = np.asarray(seconds).astype(np.int64)
+
+    def __iter__(self):
+        return (Duration(seconds) for seconds in self.seconds)
+
+    def sum(self):
+        return Duration(self.seconds.sum())
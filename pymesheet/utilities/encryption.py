@@ -0,0 +1,223 @@
+"""
+Encrypted storage of Timesheets.
+An encrypted Timesheet is a folder '<name>.enc' holding one file per month of data plus a manifest with the list of
+tasks.  Every file is encrypted and authenticated with AES-GCM, with the Timesheet name and the month bound to the
+ciphertext, so files cannot be tampered with or swapped between months or Timesheets unnoticed.  Saving only
+re-encrypts the months whose data changed, and loading can decrypt just the months a date range needs.  The files
+kept next to a Timesheet (its archive and its journal, see utilities.archive and utilities.sync) are encrypted into
+the same folder with the same key.
+
+Requires the optional 'cryptography' package.
+"""
+import hashlib, json, os
+import pandas as pd
+from os.path import join as pathjoin
+from utilities import storage
+from utilities.layout import compact, empty_timesheet
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.exceptions import InvalidTag
+except ImportError:
+    AESGCM = None
+
+    class InvalidTag(Exception):
+        pass
+
+ENCRYPTED_SUFFIX = ".enc"
+MANIFEST = "manifest"
+FORMAT_VERSION = 1
+PARTIAL = "partial"  # attrs key marking a Timesheet that was only loaded for a range of days, see load
+
+
+class DecryptionError(ValueError):
+    pass
+
+
+def available():
+    return AESGCM is not None
+
+
+def derive_key(passphrase, salt):
+    """
+    Derives a 256 bit key from a passphrase with scrypt
+    :param passphrase: passphrase string
+    :param salt: random bytes stored with the Timesheet
+    :return: key bytes
+    """
+    return hashlib.scrypt(passphrase.encode(), salt=salt, n=2 ** 14, r=8, p=1, dklen=32)
+
+
+def _month(data, days):
+    """
+    The data of a month as it is stored: only the Tasks with time in the month, so that adding or removing a Task
+    without time in it leaves the month unchanged
+    :param data: timesheet dataframe
+    :param days: mask of the columns of the month
+    """
+    chunk = data.loc[:, days]
+    return chunk.loc[chunk.to_numpy().any(axis=1)]
+
+
+def _digest(frame):
+    """
+    Digest of the content of a month of data, see _month, to tell whether it changed
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(frame.to_numpy().tobytes())
+    digest.update("\0".join(map(str, frame.index)).encode())
+    digest.update("\0".join(map(str, frame.columns)).encode())
+    return digest.digest()
+
+
+class EncryptedStore:
+    """
+    Reads and writes one encrypted Timesheet folder
+    """
+
+    def __init__(self, path, name):
+        if not available():
+            raise RuntimeError("Encrypted Timesheets require the 'cryptography' package (pip install cryptography).")
+        self.name = name
+        self.folder = pathjoin(path, name + ENCRYPTED_SUFFIX)
+        self.key = None
+        self.digests = {}  # month -> digest of the plaintext last written or read, to skip unchanged months
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def exists(self):
+        return os.path.isdir(self.folder)
+
+    def unlock(self, passphrase):
+        """
+        Derives the key of this Timesheet, creating the salt for a new one, and checks it against the manifest
+        :param passphrase: passphrase string
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        salt_path = pathjoin(self.folder, "salt")
+        if not os.path.exists(salt_path):
+            with open(salt_path, "wb") as f:
+                f.write(os.urandom(16))
+        with open(salt_path, "rb") as f:
+            self.key = derive_key(passphrase, f.read())
+        if os.path.exists(pathjoin(self.folder, MANIFEST)):
+            self._read_manifest()  # raises DecryptionError for a wrong passphrase
+
+    ################ Chunks ################
+
+    def encrypt(self, payload, label):
+        """
+        :param payload: bytes
+        :param label: what the payload is, bound to the ciphertext so that it cannot be swapped with another one
+        :return: nonce and ciphertext
+        """
+        nonce = os.urandom(12)
+        aad = "{}/{}/{}".format(FORMAT_VERSION, self.name, label).encode()
+        return nonce + AESGCM(self.key).encrypt(nonce, payload, aad)
+
+    def decrypt(self, blob, label):
+        """
+        :param blob: nonce and ciphertext, see encrypt
+        :param label: label the payload was encrypted with
+        :return: payload bytes
+        """
+        aad = "{}/{}/{}".format(FORMAT_VERSION, self.name, label).encode()
+        try:
+            return AESGCM(self.key).decrypt(blob[:12], blob[12:], aad)
+        except InvalidTag:
+            raise DecryptionError("Wrong passphrase, or '{}' of Timesheet '{}' was modified.".format(label, self.name))
+
+    def write_chunk(self, chunk, payload):
+        """
+        Encrypts a file of the folder
+        :param chunk: file name, e.g. a month
+        :param payload: bytes
+        """
+        blob = self.encrypt(payload, chunk)
+        tmp = pathjoin(self.folder, chunk + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, pathjoin(self.folder, chunk))  # never leave a half written chunk behind
+        self.bytes_written += len(blob)
+
+    def read_chunk(self, chunk):
+        """
+        Decrypts a file of the folder; raises FileNotFoundError if it does not exist
+        :param chunk: file name
+        :return: bytes
+        """
+        with open(pathjoin(self.folder, chunk), "rb") as f:
+            blob = f.read()
+        self.bytes_read += len(blob)
+        return self.decrypt(blob, chunk)
+
+    def _read_manifest(self):
+        return json.loads(self.read_chunk(MANIFEST).decode())
+
+    ################ Timesheet ################
+
+    def months(self):
+        """
+        :return: sorted list of the months (YYYY-MM) stored
+        """
+        return sorted(self._read_manifest()["months"])
+
+    def save(self, data):
+        """
+        Saves a Timesheet.  Months whose data did not change since they were last read or written are left alone.
+        :param data: timesheet dataframe, not one loaded for a range of days, which lacks the other months
+        :return: list of months that were re-encrypted
+        """
+        if data.attrs.get(PARTIAL):
+            raise ValueError("Timesheet '{}' was only loaded from {} to {} and cannot be saved.".format(
+                self.name, *data.attrs[PARTIAL]))
+        columns = pd.Index(data.columns.astype(str))
+        months = columns.str[:7]
+        written = []
+        for month in sorted(set(months)):
+            chunk = _month(data, months == month)
+            digest = _digest(chunk)
+            if self.digests.get(month) != digest:
+                self.write_chunk(month, storage.dumps(chunk))
+                self.digests[month] = digest
+                written.append(month)
+        self.write_chunk(MANIFEST, json.dumps({"version": FORMAT_VERSION, "tasks": list(data.index),
+                                                "months": sorted(set(months))}).encode())
+        for month in set(self.digests) - set(months):  # months without days left
+            os.remove(pathjoin(self.folder, month))
+            del self.digests[month]
+        return written
+
+    def load(self, start=None, end=None):
+        """
+        Loads a Timesheet, decrypting only the months that overlap the given range.  A Timesheet loaded for a range
+        is marked as such, so that it cannot be saved over the whole one.
+        :param start: first day (YYYY-MM-DD) or None
+        :param end: last day (YYYY-MM-DD) or None
+        :return: timesheet dataframe
+        """
+        manifest = self._read_manifest()
+        tasks = manifest["tasks"]
+        frames = {}
+        for month in manifest["months"]:
+            if (start is not None and month < start[:7]) or (end is not None and month > end[:7]):
+                continue
+            frames[month] = storage.loads(self.read_chunk(month))
+        if len(frames) == 0:
+            data = empty_timesheet(tasks)
+            if start is not None or end is not None:
+                data.attrs[PARTIAL] = (start, end)
+            return data
+        # rows of deleted tasks are dropped and new tasks get zeros, as only the manifest is rewritten for those
+        data = compact(pd.concat(list(frames.values()), axis=1).reindex(tasks))
+        months = pd.Index(data.columns).str[:7]
+        for month in frames:
+            self.digests[month] = _digest(_month(data, months == month))
+        days = pd.Index(data.columns)
+        if start is not None:
+            data = data.loc[:, days >= start]
+        if end is not None:
+            data = data.loc[:, pd.Index(data.columns) <= end]
+        if start is not None or end is not None:
+            data.attrs[PARTIAL] = (start, end)
+        return data
@@ -0,0 +1,262 @@
+"""
+Event bus for reacting to what happens in a Timesheet, e.g. to mirror logged time into another tool.
+TimesheetManager emits typed events (task started/stopped, workday started/ended, tasks added/deleted/renamed, time
+moved between tasks, sheet switched, budget threshold crossed) to the bus.  Emitting only puts the event on a bounded
+queue; a background worker takes events off the queue in batches and hands each batch to the subscribers, so a slow
+subscriber never slows down logging.  When the queue is full, emitting waits at most block_timeout seconds for room and
+otherwise drops the event, counting it in dropped.
+"""
+import json, queue, sys, threading, time
+import urllib.request
+
+
+class Event:
+    """
+    Base of all events
+    """
+    type = "event"
+    __slots__ = ("sheet", "time")
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.time = time.time()
+
+    def to_dict(self):
+        values = {"type": self.type}
+        for cls in reversed(type(self).__mro__):
+            for slot in getattr(cls, "__slots__", ()):
+                values[slot] = getattr(self, slot)
+        return values
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join("{}={!r}".format(key, value) for key, value in
+                                                           self.to_dict().items() if key != "type"))
+
+
+class TaskStarted(Event):
+    type = "task_started"
+    __slots__ = ("task", "start")
+
+    def __init__(self, sheet, task, start):
+        super().__init__(sheet)
+        self.task, self.start = task, start
+
+
+class TaskStopped(Event):
+    type = "task_stopped"
+    __slots__ = ("task", "day", "seconds", "start", "end")
+
+    def __init__(self, sheet, task, day, seconds, start, end):
+        super().__init__(sheet)
+        self.task, self.day, self.seconds, self.start, self.end = task, day, int(seconds), start, end
+
+
+class WorkdayStarted(Event):
+    type = "workday_started"
+    __slots__ = ("start",)
+
+    def __init__(self, sheet, start):
+        super().__init__(sheet)
+        self.start = start
+
+
+class WorkdayEnded(Event):
+    type = "workday_ended"
+    __slots__ = ("day", "start", "end", "general_seconds")
+
+    def __init__(self, sheet, day, start, end, general_seconds):
+        super().__init__(sheet)
+        self.day, self.start, self.end, self.general_seconds = day, start, end, int(general_seconds)
+
+
+class TasksAdded(Event):
+    type = "tasks_added"
+    __slots__ = ("tasks",)
+
+    def __init__(self, sheet, tasks):
+        super().__init__(sheet)
+        self.tasks = list(tasks)
+
+
+class TasksDeleted(Event):
+    type = "tasks_deleted"
+    __slots__ = ("tasks",)
+
+    def __init__(self, sheet, tasks):
+        super().__init__(sheet)
+        self.tasks = list(tasks)
+
+
+class TasksRenamed(Event):
+    type = "tasks_renamed"
+    __slots__ = ("renames",)
+
+    def __init__(self, sheet, renames):
+        super().__init__(sheet)
+        self.renames = dict(renames)
+
+
+class TimeReassigned(Event):
+    type = "time_reassigned"
+    __slots__ = ("source", "target", "seconds", "start", "end")
+
+    def __init__(self, sheet, source, target, seconds, start, end):
+        super().__init__(sheet)
+        self.source, self.target, self.seconds, self.start, self.end = source, target, int(seconds), start, end
+
+
+class SheetSwitched(Event):
+    type = "sheet_switched"
+    __slots__ = ("previous",)
+
+    def __init__(self, sheet, previous):
+        super().__init__(sheet)
+        self.previous = previous
+
+
+class BudgetCrossed(Event):
+    type = "budget_crossed"
+    __slots__ = ("task", "period", "budget", "used", "threshold")
+
+    def __init__(self, sheet, task, period, budget, used, threshold):
+        super().__init__(sheet)
+        self.task, self.period, self.budget, self.used, self.threshold = task, period, int(budget), int(used), threshold
+
+
+class EventBus:
+    """
+    Delivers events to subscribers on a background worker.  A subscriber is a function taking a list of events; it
+    only gets the event types it subscribed to.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=100, batch_wait=0.05, block_timeout=0.0):
+        """
+        :param max_queue: number of events that can wait for delivery
+        :param batch_size: largest batch handed to the subscribers
+        :param batch_wait: seconds to wait for more events before delivering a batch
+        :param block_timeout: seconds emit may wait for room in a full queue before dropping the event
+        """
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.block_timeout = block_timeout
+        self.subscribers = []
+        self.worker = None
+        self.emitted = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def subscribe(self, subscriber, types=None):
+        """
+        :param subscriber: function taking a list of events
+        :param types: event classes to deliver, or None for all
+        """
+        self.subscribers.append((subscriber, None if types is None else tuple(types)))
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._run, name="pymesheet-events", daemon=True)
+            self.worker.start()
+
+    def emit(self, event):
+        """
+        Queues an event for delivery.  Without subscribers this does nothing.
+        :param event: Event
+        """
+        if len(self.subscribers) == 0:
+            return
+        self.emitted += 1
+        try:
+            if self.block_timeout > 0:
+                self.queue.put(event, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            events = [event for event in batch if event is not None]
+            for subscriber, types in self.subscribers:
+                selected = events if types is None else [event for event in events if isinstance(event, types)]
+                if len(selected) == 0:
+                    continue
+                try:
+                    subscriber(selected)
+                except Exception as e:  # a broken subscriber must not stop the others
+                    self.errors += 1
+                    print("[WARNING] Event subscriber failed: {}".format(e), file=sys.stderr)
+            self.delivered += len(events)
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def flush(self, timeout=5.0):
+        """
+        Waits until all queued events were delivered
+        :param timeout: seconds to wait at most
+        :return: True if everything was delivered
+        """
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks > 0:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout=5.0):
+        """
+        Delivers the queued events and stops the worker
+        :param timeout: seconds to wait at most
+        """
+        if self.worker is not None and self.worker.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self.worker.join(timeout)
+        self.worker = None
+
+    def stats(self):
+        return {"emitted": self.emitted, "delivered": self.delivered, "dropped": self.dropped, "errors": self.errors,
+                "queued": self.queue.qsize()}
+
+
+################ Subscribers ################
+
+class FileSubscriber:
+    """
+    Appends events to a file, one JSON object per line
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, events):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(event.to_dict(), sort_keys=True) + "\n" for event in events))
+
+
+class HttpSubscriber:
+    """
+    Posts each batch of events as a JSON list to a URL
+    """
+
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, events):
+        body = json.dumps([event.to_dict() for event in events]).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"},
+                                         method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
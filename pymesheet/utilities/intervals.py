@@ -0,0 +1,185 @@
+"""
+Index of the logged intervals of a Timesheet, for time-of-day and overlap queries.
+Every interval (task, day, seconds, start, end) of the journal is kept in arrays sorted by start, with an implicit
+balanced tree over them that stores the latest end in each subtree.  A range query descends only into subtrees that
+can hold an overlapping interval, so it takes about O(log n + k) for k results.  New intervals go to a small unsorted
+tail first, which is merged into the sorted arrays once it grows beyond about sqrt(n) intervals.
+
+The workday 'General' fill is recorded as an interval spanning the whole workday, but only the time not allocated to
+other tasks is counted for it.  Such intervals, whose seconds are less than their span, are fills: they overlap the
+tasks of the workday by design, so they are left out of the overlap pairs and checked for double counted time instead.
+
+The index answers time-of-day questions only; the per-day totals of the reports stay in the Timesheet data, which also
+holds time the journal has no intervals for (time logged before the journal, tasks renamed or time moved in Timesheet
+management, imported sheets).  to_timesheet derives the totals from the intervals to check the two against each other.
+"""
+import heapq
+import numpy as np
+import pandas as pd
+from utilities.layout import SECONDS_DTYPE
+
+FILL_TOLERANCE = 1  # seconds lost to rounding to whole seconds
+
+
+class IntervalIndex:
+    """
+    Sorted, indexed intervals with range, point, and overlap queries
+    """
+
+    def __init__(self):
+        self.tasks = np.empty(0, dtype=object)
+        self.days = np.empty(0, dtype=object)
+        self.seconds = np.empty(0, dtype=np.int64)
+        self.starts = np.empty(0)
+        self.ends = np.empty(0)
+        self.tree = np.full(2, -np.inf)  # latest end per subtree, node 1 is the root
+        self.size = 1  # number of leaves of the tree
+        self.tail = []
+
+    @classmethod
+    def from_entries(cls, entries):
+        """
+        :param entries: journal entries (dictionaries with task, day, seconds, start, end)
+        :return: IntervalIndex
+        """
+        index = cls()
+        index.tail = [(entry["task"], entry["day"], entry["seconds"], entry["start"], entry["end"])
+                      for entry in entries]
+        index._merge()
+        return index
+
+    def __len__(self):
+        return len(self.starts) + len(self.tail)
+
+    def add(self, task, day, seconds, start, end):
+        """
+        Adds an interval.  Amortized O(sqrt(n)).
+        """
+        self.tail.append((task, day, int(seconds), start, end))
+        if len(self.tail) > max(64, int(np.sqrt(len(self.starts)))):
+            self._merge()
+
+    def _merge(self):
+        if len(self.tail) == 0:
+            return
+        tasks, days, seconds, starts, ends = zip(*self.tail)
+        starts = np.concatenate([self.starts, np.asarray(starts, dtype=float)])
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ends = np.concatenate([self.ends, np.asarray(ends, dtype=float)])[order]
+        self.tasks = np.concatenate([self.tasks, np.asarray(tasks, dtype=object)])[order]
+        self.days = np.concatenate([self.days, np.asarray(days, dtype=object)])[order]
+        self.seconds = np.concatenate([self.seconds, np.asarray(seconds, dtype=np.int64)])[order]
+        self.tail = []
+        self._build()
+
+    def _build(self):
+        """
+        Builds the tree of latest ends bottom-up, one vectorized step per level
+        """
+        self.size = 1 << max(0, int(np.ceil(np.log2(max(len(self.starts), 1)))))
+        self.tree = np.full(2 * self.size, -np.inf)
+        self.tree[self.size:self.size + len(self.ends)] = self.ends
+        level = self.size
+        while level > 1:
+            self.tree[level // 2:level] = np.maximum(self.tree[level:2 * level:2], self.tree[level + 1:2 * level:2])
+            level //= 2
+
+    def _search(self, start, end):
+        """
+        :return: sorted positions of the intervals in the sorted arrays that overlap [start, end)
+        """
+        limit = int(np.searchsorted(self.starts, end, side="left"))  # intervals starting before the end
+        found = []
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= limit or self.tree[node] <= start:
+                continue
+            if node >= self.size:
+                found.append(lo)
+            else:
+                middle = (lo + hi) // 2
+                stack.append((2 * node + 1, middle, hi))
+                stack.append((2 * node, lo, middle))
+        return found
+
+    def _interval(self, i):
+        return self.tasks[i], self.days[i], int(self.seconds[i]), float(self.starts[i]), float(self.ends[i])
+
+    def overlapping(self, start, end):
+        """
+        Intervals that overlap the range [start, end)
+        :param start: timestamp
+        :param end: timestamp
+        :return: list of (task, day, seconds, start, end), sorted by start
+        """
+        result = [self._interval(i) for i in self._search(start, end)]
+        result += [interval for interval in self.tail if interval[3] < end and interval[4] > start]
+        return sorted(result, key=lambda interval: interval[3])
+
+    def at(self, timestamp):
+        """
+        Intervals running at a point in time
+        :param timestamp: timestamp
+        :return: list of (task, day, seconds, start, end), sorted by start
+        """
+        return [interval for interval in self.overlapping(timestamp, np.nextafter(timestamp, np.inf))
+                if interval[3] <= timestamp]
+
+    ################ Checks ################
+
+    @staticmethod
+    def is_fill(interval):
+        task, day, seconds, start, end = interval
+        return seconds < end - start - FILL_TOLERANCE
+
+    def overlaps(self):
+        """
+        Pairs of overlapping intervals, leaving out fills.  A sweep over the intervals by start, O(n log n + k).
+        :return: list of (interval, interval, overlapping seconds)
+        """
+        self._merge()
+        pairs = []
+        active = []  # heap of (end, position)
+        for i in range(len(self.starts)):
+            interval = self._interval(i)
+            if self.is_fill(interval):
+                continue
+            while active and active[0][0] <= interval[3]:
+                heapq.heappop(active)
+            for end, j in active:
+                pairs.append((self._interval(j), interval, min(end, interval[4]) - interval[3]))
+            heapq.heappush(active, (interval[4], i))
+        return pairs
+
+    def double_counted(self):
+        """
+        Fills that were counted on top of other intervals: the fill's seconds plus the time of the other intervals
+        within its span are more than the span
+        :return: list of (fill interval, seconds counted twice)
+        """
+        self._merge()
+        result = []
+        for i in range(len(self.starts)):
+            fill = self._interval(i)
+            if not self.is_fill(fill):
+                continue
+            covered = sum(min(end, fill[4]) - max(start, fill[3])
+                          for task, day, seconds, start, end in self.overlapping(fill[3], fill[4])
+                          if not self.is_fill((task, day, seconds, start, end)))
+            excess = fill[2] + covered - (fill[4] - fill[3])
+            if excess > FILL_TOLERANCE:
+                result.append((fill, int(excess)))
+        return result
+
+    def to_timesheet(self):
+        """
+        Per-day totals of the intervals, in the layout of the Timesheet data, for checking them against the Timesheet
+        :return: timesheet dataframe (tasks x days)
+        """
+        self._merge()
+        frame = pd.DataFrame({"task": self.tasks, "day": self.days, "seconds": self.seconds})
+        totals = frame.pivot_table(index="task", columns="day", values="seconds", aggfunc="sum", fill_value=0)
+        totals.index.name, totals.columns.name = None, None
+        return totals.astype(SECONDS_DTYPE)
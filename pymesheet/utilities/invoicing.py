@@ -0,0 +1,177 @@
+"""
+Billing of logged time.
+Every Timesheet can have an hourly rate for the whole sheet ('rate' in its config) and rates for single Tasks ('rates',
+a JSON object of Task to rate).  A rate set on a Task also applies to its subtasks, so a rate for 'client' bills all of
+'client/...' unless a subtask has a rate of its own.  Time is rounded up before it is billed, per day ('day/15': the
+time of a Task on a day is rounded up to 15 minutes) or per entry ('entry/6': every interval in the journal is rounded
+up to 6 minutes).  Tasks without a rate are not billed.
+
+The time of all sheets is first gathered into flat arrays of (Task, seconds, increment), so that rounding, rating, and
+summing happen in one vectorized pass, however many sheets and Tasks are billed.
+"""
+import json
+import numpy as np
+import pandas as pd
+from utilities.duration import SECONDS_PER_HOUR, SECONDS_PER_MINUTE
+from utilities.task_tree import SEPARATOR, ancestors
+
+ROUNDINGS = ["none", "day", "entry"]
+COLUMNS = ["sheet", "client", "task", "seconds", "billable", "rate", "amount"]
+
+
+################ Settings ################
+
+def parse_rate(string):
+    """
+    :param string: hourly rate, or "" for none
+    :return: rate as float, or None
+    """
+    if string == "":
+        return None
+    try:
+        rate = float(string)
+    except ValueError:
+        raise ValueError("Invalid rate '{}', expected a number".format(string))
+    if not rate >= 0:  # also catches nan
+        raise ValueError("Invalid rate '{}', expected a number of at least 0".format(string))
+    return rate
+
+
+def parse_rates(string):
+    """
+    :param string: JSON object of Task to hourly rate, or ""
+    :return: dictionary of Task to rate
+    """
+    if string == "":
+        return {}
+    try:
+        rates = json.loads(string)
+    except ValueError:
+        raise ValueError("Invalid rates '{}', expected a JSON object".format(string))
+    if not isinstance(rates, dict):
+        raise ValueError("Invalid rates '{}', expected a JSON object".format(string))
+    return {task: parse_rate(str(rate)) for task, rate in rates.items()}
+
+
+def format_rates(rates):
+    """
+    :param rates: dictionary of Task to rate
+    :return: JSON string, as stored in the config
+    """
+    return json.dumps(rates, sort_keys=True, ensure_ascii=False)
+
+
+def parse_rounding(string):
+    """
+    :param string: 'day' or 'entry' and the minutes to round up to, e.g. 'day/15'; "" or 'none' for no rounding
+    :return: mode, and the minutes to round up to
+    """
+    if string in ["", "none"]:
+        return "none", 0
+    mode, _, minutes = string.partition("/")
+    if mode not in ROUNDINGS or mode == "none" or not minutes.isdigit() or int(minutes) == 0:
+        raise ValueError("Invalid rounding '{}', expected e.g. 'day/15' or 'entry/6'".format(string))
+    return mode, int(minutes)
+
+
+def rate_of(task, rates, default):
+    """
+    :param task: task name
+    :param rates: dictionary of Task to rate
+    :param default: rate of the sheet, or None
+    :return: rate of the Task, of its closest ancestor with a rate, or the default
+    """
+    for path in reversed(ancestors(task)[1:]):
+        if path in rates:
+            return rates[path]
+    return default
+
+
+################ Billing ################
+
+def round_up(seconds, increments):
+    """
+    Rounds every amount of time up to a multiple of its increment; an increment of 0 leaves it as it is
+    :param seconds: array of seconds
+    :param increments: array of increments in seconds, or one increment for all
+    :return: array of seconds
+    """
+    seconds = np.asarray(seconds, dtype=np.int64)
+    increments = np.broadcast_to(np.asarray(increments, dtype=np.int64), seconds.shape)
+    steps = np.maximum(increments, 1)
+    return np.where(increments > 0, -(-seconds // steps) * steps, seconds)
+
+
+def _cells(data, start, end):
+    """
+    :return: rows, columns, and seconds of the cells with time between the first and the last day
+    """
+    days = pd.Index(data.columns).to_numpy(dtype=str)
+    in_range = np.flatnonzero((days >= start) & (days <= end))
+    values = data.to_numpy()[:, in_range]
+    rows, columns = np.nonzero(values)
+    return rows, in_range[columns], values[rows, columns].astype(np.int64)
+
+
+def _entries(data, entries, start, end):
+    """
+    The intervals of the journal between the first and the last day, and the time of each cell not covered by them,
+    e.g. time added by hand.  A cell whose intervals add up to more than the cell, e.g. after part of its time was
+    moved to another Task, is billed as one entry.
+    :return: rows and seconds
+    """
+    rows, columns, seconds = _cells(data, start, end)
+    if len(entries) == 0 or len(rows) == 0:
+        return rows, seconds
+    frame = pd.DataFrame(entries, columns=["task", "day", "seconds"])
+    entry_rows = pd.Index(data.index).get_indexer(frame["task"])
+    entry_columns = pd.Index(data.columns).get_indexer(frame["day"])
+    entry_seconds = frame["seconds"].to_numpy(dtype=np.int64)
+    width = data.shape[1]
+    cells = pd.Index(rows * width + columns)
+    keys = np.where((entry_rows >= 0) & (entry_columns >= 0), entry_rows * width + entry_columns, -1)
+    covered = pd.Series(entry_seconds).groupby(keys).sum().reindex(cells, fill_value=0).to_numpy()
+    consistent = covered <= seconds
+    used = (keys >= 0) & (pd.Index(cells[consistent]).get_indexer(keys) >= 0) & (entry_seconds != 0)
+    rest = np.where(consistent, seconds - covered, seconds)
+    return (np.concatenate([entry_rows[used], rows[rest != 0]]),
+            np.concatenate([entry_seconds[used], rest[rest != 0]]))
+
+
+def invoice(sheets, start, end):
+    """
+    Billable time and amounts of all Tasks of all sheets between two days
+    :param sheets: list of (name, data, settings, entries): name of the sheet, its timesheet dataframe, its settings
+                   ('rate', 'rates', and 'rounding', as in its config), and its journal entries, which are only read for
+                   'entry' rounding
+    :param start: first day (YYYY-MM-DD)
+    :param end: last day (YYYY-MM-DD)
+    :return: dataframe with a row per billed Task, sorted by client: sheet, client (the top of the Task's path), task,
+             seconds logged, billable seconds after rounding, rate, and amount
+    """
+    names, tasks, rates, rows, seconds, increments = [], [], [], [], [], []
+    for name, data, settings, entries in sheets:
+        default = parse_rate(settings.get("rate", ""))
+        task_rates = parse_rates(settings.get("rates", ""))
+        mode, minutes = parse_rounding(settings.get("rounding", ""))
+        if mode == "entry":
+            sheet_rows, sheet_seconds = _entries(data, entries if entries is not None else [], start, end)
+        else:
+            sheet_rows, _, sheet_seconds = _cells(data, start, end)
+        rows.append(sheet_rows + len(tasks))
+        seconds.append(sheet_seconds)
+        increments.append(np.full(len(sheet_rows), minutes * SECONDS_PER_MINUTE, dtype=np.int64))
+        names += [name] * len(data.index)
+        tasks += list(data.index)
+        rates += [rate_of(task, task_rates, default) for task in data.index]
+    if len(tasks) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+    rows, seconds, increments = np.concatenate(rows), np.concatenate(seconds), np.concatenate(increments)
+    logged = np.bincount(rows, weights=seconds, minlength=len(tasks)).astype(np.int64)
+    billable = np.bincount(rows, weights=round_up(seconds, increments), minlength=len(tasks)).astype(np.int64)
+    rates = np.array([np.nan if rate is None else rate for rate in rates])
+    billed = ~np.isnan(rates) & (logged != 0)
+    items = pd.DataFrame({"sheet": names, "client": [str(task).split(SEPARATOR)[0] for task in tasks], "task": tasks,
+                          "seconds": logged, "billable": billable, "rate": rates,
+                          "amount": np.round(billable / SECONDS_PER_HOUR * rates, 2)})[billed]
+    return items.sort_values(["client", "sheet", "task"], kind="stable").reset_index(drop=True)
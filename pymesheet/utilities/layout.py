@@ -0,0 +1,82 @@
+"""
+Memory layout of the Timesheet dataframe.
+Every cell holds the seconds worked on a task (row) on a day (column), so the cells are by far the largest part of a
+Timesheet.  They are kept as int32, which holds up to 68 years per cell, instead of the float64 that pandas falls back
+to whenever rows or columns are added with missing values.
+"""
+import numpy as np
+import pandas as pd
+
+SECONDS_DTYPE = np.int32
+
+
+def empty_timesheet(tasks=None):
+    """
+    Creates an empty Timesheet
+    :param tasks: optional list of task names
+    :return: dataframe with tasks as index and no days
+    """
+    return pd.DataFrame(index=pd.Index([] if tasks is None else tasks, dtype=object))
+
+
+def add_days(data, days):
+    """
+    Adds empty columns for new days without leaving the compact layout.  All days are added at once, so the cells
+    stay one block instead of a block per added day.
+    :param data: timesheet dataframe
+    :param days: list of date strings that are not in the data yet
+    :return: dataframe including the new days
+    """
+    values = np.zeros((len(data.index), len(data.columns) + len(days)), dtype=SECONDS_DTYPE)
+    values[:, :len(data.columns)] = data.to_numpy(dtype=SECONDS_DTYPE)
+    return pd.DataFrame(values, index=pd.Index(data.index, dtype=object), columns=list(data.columns) + list(days))
+
+
+def is_compact(data):
+    """
+    Checks whether all day columns of a Timesheet already use the compact dtype
+    :param data: timesheet dataframe
+    :return: boolean
+    """
+    return all(dtype == SECONDS_DTYPE for dtype in data.dtypes)
+
+
+def compact(data):
+    """
+    Downcasts a Timesheet to the compact layout.  Missing values become 0 and fractions of seconds are dropped, as
+    they are when time is logged.
+    :param data: timesheet dataframe
+    :return: compacted dataframe
+    """
+    if len(data.columns) == 0:
+        return empty_timesheet(list(data.index))
+    values = np.nan_to_num(data.to_numpy(dtype=np.float64)).astype(SECONDS_DTYPE)
+    return pd.DataFrame(values, index=pd.Index(data.index, dtype=object), columns=list(data.columns))
+
+
+def add_tasks(data, tasks):
+    """
+    Adds empty rows for new tasks without leaving the compact layout
+    :param data: timesheet dataframe
+    :param tasks: list of task names that are not in the data yet
+    :return: dataframe including the new tasks
+    """
+    index = data.index.append(pd.Index(tasks, dtype=object))
+    return data.reindex(index, fill_value=0).astype(SECONDS_DTYPE)
+
+
+def memory_report(data):
+    """
+    Reports how much memory a Timesheet takes
+    :param data: timesheet dataframe
+    :return: dictionary with the sizes and dtypes of the Timesheet
+    """
+    cells = data.memory_usage(index=False, deep=True).sum()
+    labels = data.index.memory_usage(deep=True) + pd.Index(data.columns).memory_usage(deep=True)
+    return {"tasks": len(data.index),
+            "days": len(data.columns),
+            "cell_bytes": int(cells),
+            "label_bytes": int(labels),
+            "total_bytes": int(cells + labels),
+            "dtypes": sorted(set(str(dtype) for dtype in data.dtypes)),
+            "compact": is_compact(data)}
@@ -0,0 +1,132 @@
+"""
+Instrumentation of TimesheetManager operations.
+Records latency histograms per operation, counters (e.g. bytes read and written), and gauges (e.g. sheet size), and
+exports them as JSON or in the Prometheus text format.
+"""
+import functools, json, time
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Metrics:
+    """
+    Collects the metrics of one session.  Time spent waiting for the user is not counted as latency; it is read from
+    the idle clock, a function returning the total seconds spent waiting so far.
+    """
+
+    def __init__(self, idle=lambda: 0.0):
+        self.idle = idle
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, operation, seconds):
+        """
+        Records the latency of an operation
+        :param operation: name of the operation
+        :param seconds: latency in seconds
+        """
+        if operation not in self.histograms:
+            self.histograms[operation] = {"buckets": [0] * len(BUCKETS), "count": 0, "sum": 0.0, "max": 0.0}
+        histogram = self.histograms[operation]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["count"] += 1
+        histogram["sum"] += seconds
+        histogram["max"] = max(histogram["max"], seconds)
+
+    @contextmanager
+    def timed(self, operation):
+        """
+        Context manager recording the latency of the enclosed block
+        :param operation: name of the operation
+        """
+        start, idle = time.perf_counter(), self.idle()
+        try:
+            yield
+        finally:
+            self.observe(operation, max(0.0, time.perf_counter() - start - (self.idle() - idle)))
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def gauge(self, gauge, value):
+        self.gauges[gauge] = value
+
+    def quantile(self, operation, q):
+        """
+        Estimates a quantile of the latency of an operation from its histogram
+        :param operation: name of the operation
+        :param q: quantile between 0 and 1
+        :return: upper bound of the bucket containing the quantile, or the maximum if it is beyond the last bucket
+        """
+        histogram = self.histograms[operation]
+        for bound, count in zip(BUCKETS, histogram["buckets"]):
+            if count >= q * histogram["count"]:
+                return min(bound, histogram["max"])
+        return histogram["max"]
+
+    def summary(self):
+        """
+        Human readable summary of the metrics
+        :return: list of lines
+        """
+        lines = ["{:<28}{:>7}{:>11}{:>11}{:>11}".format("Operation", "Count", "Mean (ms)", "p95 (ms)", "Max (ms)")]
+        for operation, histogram in sorted(self.histograms.items()):
+            lines.append("{:<28}{:>7}{:>11.2f}{:>11.2f}{:>11.2f}".format(
+                operation, histogram["count"], 1000 * histogram["sum"] / histogram["count"],
+                1000 * self.quantile(operation, 0.95), 1000 * histogram["max"]))
+        for name, value in sorted(list(self.counters.items()) + list(self.gauges.items())):
+            lines.append("{:<28}{:>7}".format(name, value))
+        return lines
+
+    def to_json(self):
+        return json.dumps({"buckets": BUCKETS, "histograms": self.histograms, "counters": self.counters,
+                           "gauges": self.gauges}, indent=2, sort_keys=True)
+
+    def to_prometheus(self, labels=""):
+        """
+        Exports the metrics in the Prometheus text exposition format
+        :param labels: extra labels for every sample, e.g. 'sheet="work"'
+        :return: string
+        """
+        extra = "," + labels if labels else ""
+        lines = ["# TYPE pymesheet_operation_seconds histogram"]
+        for operation, histogram in sorted(self.histograms.items()):
+            for bound, count in zip(BUCKETS, histogram["buckets"]):
+                lines.append('pymesheet_operation_seconds_bucket{{operation="{}",le="{}"{}}} {}'.format(
+                    operation, bound, extra, count))
+            lines.append('pymesheet_operation_seconds_bucket{{operation="{}",le="+Inf"{}}} {}'.format(
+                operation, extra, histogram["count"]))
+            lines.append('pymesheet_operation_seconds_sum{{operation="{}"{}}} {}'.format(
+                operation, extra, histogram["sum"]))
+            lines.append('pymesheet_operation_seconds_count{{operation="{}"{}}} {}'.format(
+                operation, extra, histogram["count"]))
+        braces = "{" + labels + "}" if labels else ""
+        for name, value in sorted(self.counters.items()):
+            lines.append("# TYPE pymesheet_{}_total counter".format(name))
+            lines.append("pymesheet_{}_total{} {}".format(name, braces, value))
+        for name, value in sorted(self.gauges.items()):
+            lines.append("# TYPE pymesheet_{} gauge".format(name))
+            lines.append("pymesheet_{}{} {}".format(name, braces, value))
+        return "\n".join(lines) + "\n"
+
+
+def instrumented(operation):
+    """
+    Decorator for TimesheetManager methods that records their latency in self.metrics
+    :param operation: name of the operation
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timed(operation):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,153 @@
+"""
+Profiling of the menu commands of a session.
+Every command runs under cProfile, from showing its menu to showing the page after it, and the profiles of the same
+command code are added up.  The profiler is paused while waiting for the user, so the profiles show where the program
+spends its time, not where the user does.  At the end of the session they are saved per command code, as pstats files
+(for pstats, snakeviz, etc.) and as collapsed stacks for flame graphs (flamegraph.pl, speedscope).  cProfile only
+records which function called which, not whole stacks, so the stacks are estimated from the call graph: the time of a
+function is split between its callers in proportion to the time each caller spent in it.
+"""
+import cProfile, os, pstats
+from os.path import join as pathjoin, basename
+
+MIN_STACK_SECONDS = 1e-6  # stacks with less time are left out of the collapsed stacks
+MAX_STACK_DEPTH = 100
+
+
+def function_name(function):
+    """
+    :param function: (file, line, name) as in pstats
+    :return: short name, e.g. 'storage.py:120(save)'
+    """
+    file, line, name = function
+    if file == "~":  # built-in functions
+        return name
+    return "{}:{}({})".format(basename(file), line, name)
+
+
+def collapsed_stacks(stats):
+    """
+    Estimates the time spent in every stack from the call graph of a profile
+    :param stats: pstats.Stats
+    :return: dictionary of stack (function names separated by ';') to seconds spent in its last function
+    """
+    entries = stats.stats  # function -> (primitive calls, calls, own time, cumulative time, callers)
+    callees = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))
+    stacks = {}
+
+    def walk(function, seconds, path, names):
+        _, _, own, cumulative, _ = entries[function]
+        if cumulative <= 0:
+            return
+        stack = names + [function_name(function)]
+        key = ";".join(stack)
+        stacks[key] = stacks.get(key, 0.0) + seconds * own / cumulative
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge in callees.get(function, ()):
+            share = seconds * edge / cumulative
+            if callee not in path and callee in entries and share >= MIN_STACK_SECONDS:
+                walk(callee, share, path | {callee}, stack)
+
+    for function, (_, _, _, cumulative, callers) in entries.items():
+        if not callers:
+            walk(function, cumulative, {function}, [])
+    return {stack: seconds for stack, seconds in stacks.items() if seconds >= MIN_STACK_SECONDS}
+
+
+class CommandProfiler:
+    """
+    Profiles of the menu commands of a session, added up per command code
+    """
+
+    def __init__(self, folder):
+        """
+        :param folder: folder the profiles are saved to
+        """
+        self.folder = folder
+        self.stats = {}  # command code -> pstats.Stats
+        self.runs = {}  # command code -> number of commands profiled
+        self.profile = None  # profile of the command running
+
+    def start(self):
+        """
+        Starts profiling a command
+        """
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def pause(self):
+        """
+        Leaves what follows out of the profile of the command running, e.g. waiting for the user
+        """
+        if self.profile is not None:
+            self.profile.disable()
+
+    def resume(self):
+        if self.profile is not None:
+            self.profile.enable()
+
+    def stop(self, code):
+        """
+        Stops profiling the command running and adds its profile to the command code
+        :param code: command code, or None to leave the profile out, e.g. when no command was given
+        """
+        profile, self.profile = self.profile, None
+        if profile is None:
+            return
+        profile.disable()
+        if code is None:
+            return
+        code = str(code)
+        if code in self.stats:
+            self.stats[code].add(profile)
+        else:
+            self.stats[code] = pstats.Stats(profile)
+        self.runs[code] = self.runs.get(code, 0) + 1
+
+    def save(self):
+        """
+        Saves a pstats file and a file of collapsed stacks (in microseconds) per command code
+        :return: list of the paths saved
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        paths = []
+        for code, stats in sorted(self.stats.items()):
+            path = pathjoin(self.folder, "command-{}".format(code))
+            stats.dump_stats(path + ".pstats")
+            with open(path + ".collapsed", "w") as f:
+                for stack, seconds in sorted(collapsed_stacks(stats).items()):
+                    f.write("{} {}\n".format(stack, max(1, int(round(seconds * 1e6)))))
+            paths += [path + ".pstats", path + ".collapsed"]
+        return paths
+
+    def hot_functions(self, top=20):
+        """
+        :param top: number of functions
+        :return: list of (function name, calls, own seconds, cumulative seconds) of the functions with the most own
+                 time over all commands
+        """
+        totals = {}
+        for stats in self.stats.values():
+            for function, (_, calls, own, cumulative, _) in stats.stats.items():
+                total = totals.get(function, (0, 0.0, 0.0))
+                totals[function] = (total[0] + calls, total[1] + own, total[2] + cumulative)
+        hot = sorted(totals.items(), key=lambda item: -item[1][1])[:top]
+        return [(function_name(function), calls, own, cumulative) for function, (calls, own, cumulative) in hot]
+
+    def summary(self, top=20):
+        """
+        Human readable summary of the commands profiled and the hot functions
+        :param top: number of functions
+        :return: list of lines
+        """
+        lines = ["{:<10}{:>7}{:>12}".format("Command", "Runs", "Total (ms)")]
+        for code, stats in sorted(self.stats.items(), key=lambda item: -item[1].total_tt):
+            lines.append("{:<10}{:>7}{:>12.2f}".format(code, self.runs[code], 1000 * stats.total_tt))
+        lines += ["", "{:<60}{:>9}{:>11}{:>11}".format("Function", "Calls", "Own (ms)", "Cum. (ms)")]
+        for name, calls, own, cumulative in self.hot_functions(top):
+            lines.append("{:<60}{:>9}{:>11.2f}{:>11.2f}".format(name[-60:], calls, 1000 * own, 1000 * cumulative))
+        return lines
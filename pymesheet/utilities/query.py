@@ -0,0 +1,154 @@
+"""
+Ad-hoc queries over a Timesheet.
+A query selects tasks by a name pattern and days by a date range, and groups the selected time, e.g.:
+
+    tasks~"client/*" between 2026-01-01 and 2026-03-31 group by task, week
+
+Every clause is optional, and clauses can come in any order:
+    tasks~PATTERN               tasks matching the glob pattern (* ? [...])
+    between DATE and DATE       days in the range, both included (dates are YYYY-MM-DD)
+    since DATE / until DATE     open ended ranges
+    group by FIELD[, FIELD]     task, day, week, month, or year
+
+A query is compiled into one boolean mask over the tasks, one over the days, and a single groupby, so it runs without
+Python loops over the data.
+"""
+import fnmatch, re, shlex
+import pandas as pd
+
+GROUPS = ["task", "day", "week", "month", "year"]
+DATE_REGEX = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class QueryError(ValueError):
+    pass
+
+
+class Query:
+    """
+    A parsed query
+    """
+
+    def __init__(self, pattern=None, start=None, end=None, groups=()):
+        self.pattern = pattern
+        self.start = start
+        self.end = end
+        self.groups = list(groups)
+
+    @classmethod
+    def parse(cls, string):
+        """
+        Parses a query string
+        :param string: query
+        :return: Query
+        """
+        try:
+            tokens = shlex.split(string)
+        except ValueError as e:
+            raise QueryError("Invalid query: {}".format(e))
+        query = cls()
+        i = 0
+
+        def take_date():
+            nonlocal i
+            i += 1
+            if i >= len(tokens) or not DATE_REGEX.match(tokens[i]):
+                raise QueryError("Expected a date (YYYY-MM-DD) after '{}'".format(tokens[i - 1]))
+            return tokens[i]
+
+        while i < len(tokens):
+            token = tokens[i].lower()
+            if token.startswith("tasks~") or token.startswith("task~"):
+                query.pattern = tokens[i].split("~", 1)[1]
+                if query.pattern == "":
+                    i += 1
+                    if i >= len(tokens):
+                        raise QueryError("Expected a pattern after 'tasks~'")
+                    query.pattern = tokens[i]
+            elif token == "between":
+                query.start = take_date()
+                i += 1
+                if i >= len(tokens) or tokens[i].lower() != "and":
+                    raise QueryError("Expected 'and' in 'between DATE and DATE'")
+                query.end = take_date()
+            elif token == "since":
+                query.start = take_date()
+            elif token == "until":
+                query.end = take_date()
+            elif token == "group":
+                i += 1
+                if i >= len(tokens) or tokens[i].lower() != "by":
+                    raise QueryError("Expected 'by' after 'group'")
+                fields = []
+                while i + 1 < len(tokens) and (len(fields) == 0 or tokens[i].endswith(",") or
+                                               tokens[i + 1].startswith(",")):
+                    i += 1
+                    fields += [field for field in tokens[i].lower().split(",") if field != ""]
+                for field in fields:
+                    if field not in GROUPS:
+                        raise QueryError("Cannot group by '{}' (options: {})".format(field, ", ".join(GROUPS)))
+                query.groups += fields
+            else:
+                raise QueryError("Unknown clause '{}'".format(tokens[i]))
+            i += 1
+        return query
+
+    def select(self, data):
+        """
+        Selects the tasks and days of the query
+        :param data: timesheet dataframe
+        :return: dataframe with the selected rows and columns
+        """
+        rows = pd.Series(True, index=data.index)
+        if self.pattern is not None:
+            rows = data.index.to_series().str.match(fnmatch.translate(self.pattern))
+        days = pd.Index(data.columns.astype(str))
+        columns = pd.Series(True, index=days)
+        if self.start is not None:
+            columns &= days >= self.start
+        if self.end is not None:
+            columns &= days <= self.end
+        return data.loc[rows.values, columns.values]
+
+    def run(self, data):
+        """
+        Runs the query
+        :param data: timesheet dataframe
+        :return: total seconds if nothing is grouped, otherwise a series of seconds indexed by the groups
+        """
+        selected = self.select(data)
+        periods = [group for group in self.groups if group != "task"]
+        if len(periods) == 0:
+            if "task" in self.groups:
+                return selected.sum(axis=1)
+            return int(selected.values.sum())
+        days = pd.to_datetime(pd.Index(selected.columns))
+        keys = []
+        for period in periods:
+            if period == "day":
+                keys.append(days.strftime("%Y-%m-%d"))
+            elif period == "week":
+                iso = days.isocalendar()
+                keys.append(["{}-W{:02d}".format(year, week) for year, week in zip(iso.year, iso.week)])
+            elif period == "month":
+                keys.append(days.strftime("%Y-%m"))
+            elif period == "year":
+                keys.append(days.strftime("%Y"))
+        by_period = selected.T.groupby(keys).sum()
+        if "task" not in self.groups:
+            return by_period.sum(axis=1)
+        result = by_period.stack()
+        result = result[result != 0]
+        if self.groups.index("task") == 0:
+            result = result.reorder_levels([-1] + list(range(len(periods)))).sort_index()
+        return result
+
+
+def run_query(data, string):
+    """
+    Parses and runs a query
+    :param data: timesheet dataframe
+    :param string: query
+    :return: see Query.run
+    """
+    return Query.parse(string).run(data)
@@ -0,0 +1,97 @@
+"""
+Registry of the Task names of a folder of Timesheets.
+Every Task name gets a stable integer id the first time a sheet with it is saved, and the names are interned, so the
+same Task in several sheets is the same id and the same string object.  Sheets are saved with the ids of their Tasks
+instead of the names (see utilities.storage).
+
+The registry is append-only: ids are never reused or renamed, so sheets saved at any time stay readable.  Renaming a
+Task in a sheet gives it the id of the new name.  The names are stored separated by NUL in '.registry' in the folder of
+the sheets, and new names are appended to it; names appended by another process are read in before new ids are given.
+"""
+import os, sys
+from os.path import join as pathjoin
+import numpy as np
+import pandas as pd
+
+REGISTRY_FILE = ".registry"
+
+
+class RegistryError(KeyError):
+    pass
+
+
+class TaskRegistry:
+    """
+    Integer ids for the Task names of a folder of Timesheets
+    """
+
+    def __init__(self, folder):
+        self.file = pathjoin(folder, REGISTRY_FILE)
+        self.names = np.empty(0, dtype=object)  # name of every id
+        self.index = pd.Index([], dtype=object)  # first id of every name, by position
+        self.index_ids = np.empty(0, dtype=np.int64)
+        self.read = 0  # bytes of the file read so far
+        self._refresh()
+
+    def _refresh(self):
+        """
+        Reads the names appended to the file since it was last read
+        """
+        try:
+            with open(self.file, "rb") as f:
+                f.seek(self.read)
+                payload = f.read()
+        except FileNotFoundError:
+            return
+        complete = payload.rfind(b"\0") + 1  # a name that is still being written is read next time
+        if complete == 0:
+            return
+        names = [sys.intern(name) for name in payload[:complete].decode().split("\0")[:-1]]
+        self.read += complete
+        added = np.empty(len(names), dtype=object)
+        added[:] = names
+        self.names = np.concatenate([self.names, added])
+        # two processes may append the same name at once; its first id is the one given out from then on
+        first = ~pd.Index(self.names, dtype=object).duplicated()
+        self.index = pd.Index(self.names[first], dtype=object)
+        self.index_ids = np.flatnonzero(first)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def ids(self, names, assign=True):
+        """
+        :param names: task names
+        :param assign: give new names the next free ids; otherwise their id is -1
+        :return: array of ids
+        """
+        names = pd.Index(names, dtype=object)
+        positions = self.index.get_indexer(names)
+        if (positions < 0).any() and assign:
+            self._refresh()
+            positions = self.index.get_indexer(names)
+            new = pd.unique(names[positions < 0])
+            if len(new) > 0:
+                if any("\0" in str(name) for name in new):
+                    raise ValueError("Task names cannot contain NUL")
+                os.makedirs(os.path.dirname(self.file) or ".", exist_ok=True)
+                with open(self.file, "ab") as f:
+                    f.write("".join(str(name) + "\0" for name in new).encode())
+                self._refresh()
+                positions = self.index.get_indexer(names)
+        return np.where(positions >= 0, self.index_ids[positions], -1)
+
+    def lookup(self, ids):
+        """
+        :param ids: task ids
+        :return: array of the interned names
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) > 0 and ids.max() >= len(self.names):
+            self._refresh()  # saved by another process since this registry was read
+        if len(ids) > 0 and (ids.min() < 0 or ids.max() >= len(self.names)):
+            raise RegistryError("Unknown task id in '{}'".format(self.file))
+        return self.names[ids]
@@ -0,0 +1,387 @@
+"""
+Report builders for the time summaries.
+Each builder computes a report from the Timesheet data and returns it as a list of lines, so that it can be printed,
+cached, or written to a file.  The ReportCache memoizes built reports for as long as the data does not change.
+"""
+from collections import OrderedDict
+import numpy as np
+from utilities.duration import Duration, DurationArray
+from utilities.query import Query, QueryError
+from utilities.archive import period_starts
+from utilities.calendar import WEEKDAYS, weekday, format_moments
+from utilities.utils import get_current_week_days
+
+
+def _title(string):
+    """
+    A title followed by a row of --- of the same length
+    """
+    return [string, "-" * len(string)]
+
+
+def _no_data(day, rolled_until):
+    if day < rolled_until:
+        return "The days before {} are only kept as totals per week or month; use a custom query.".format(rolled_until)
+    return "There is no data for the selected date ({}).".format(day)
+
+
+def report_time_per_day(data, day, workweek, rolled_until=""):
+    """
+    Total time worked on given day
+    :param data: timesheet dataframe
+    :param day: day to report (YYYY-MM-DD)
+    :param workweek: workweek hours, or "" if not set
+    :param rolled_until: first day that was not rolled up, or "" if no history was rolled up
+    :return: list of lines
+    """
+    if day not in data.columns:
+        return [_no_data(day, rolled_until)]
+    worked = Duration(data[day].sum())
+    if not worked:
+        return ["No Tasks were logged on {}.".format(day)]
+    lines = _title("Summary for {}:".format(day))
+    lines.append(worked.short())
+
+    if type(workweek) == int:
+        per_day = Duration.from_hours(workweek) // 5
+        lines.append("\nWith a workweek of {} hours, the average daily hours equates to: {}.".format(
+            workweek, per_day.hours_minutes()))
+        if worked <= per_day:
+            lines.append("{} is left remaining.".format((per_day - worked).hours_minutes()))
+        else:
+            lines.append("Sufficient hours have been worked today to meet that amount.")
+    return lines
+
+
+def report_time_per_task(tree, task, retired):
+    """
+    Total time worked for given task, including all its subtasks
+    :param tree: TaskTree of the Timesheet
+    :param task: task to report
+    :param retired: whether the task is retired
+    :return: list of lines
+    """
+    if task not in tree:
+        return ["There is no Task named '{}'.".format(task)]
+    lines = []
+    worked = Duration(tree.total(task))
+    if retired:
+        lines.append("[NOTICE] Task '{}' is retired.\n".format(task))
+    if not worked:
+        lines.append("No time was logged for Task '{}'.".format(task))
+        return lines
+    lines += _title("Summary for '{}':".format(task))
+    lines.append(worked.short())
+    if worked.days != 0: lines.append(worked.days_hours_minutes())
+    subtasks = tree.subtasks(task)
+    if len(subtasks) > 0:
+        lines.append("\nSubtasks:")
+        for subtask, seconds in subtasks:
+            lines.append("\t{}:\t{}".format(subtask, Duration(seconds).hours_minutes()))
+    return lines
+
+
+def report_time_per_taskday(data, task, day, rolled_until=""):
+    """
+    Total time for a given task on a given day
+    :param data: timesheet dataframe
+    :param task: task to report
+    :param day: day to report on (YYYY-MM-DD)
+    :param rolled_until: first day that was not rolled up, or "" if no history was rolled up
+    :return: list of lines
+    """
+    lines = []
+    if task not in data.index:
+        lines.append("There is no Task named '{}'.".format(task))
+    if day not in data.columns:
+        lines.append(_no_data(day, rolled_until))
+    if len(lines) > 0:
+        return lines
+    worked = Duration(data.at[task, day])
+    if not worked:
+        return ["No time was logged for Task '{}' on {}.".format(task, day)]
+    return _title("Summary for '{}' on {}:".format(task, day)) + [worked.short()]
+
+
+def report_total_time(data, archived, baseline, name, rolled_days=0):
+    """
+    Total time worked
+    :param data: timesheet dataframe
+    :param archived: total seconds of retired tasks and of rolled-up history
+    :param baseline: baseline string (XXdXXhXXm), or "" if not set
+    :param name: name of the Timesheet
+    :param rolled_days: number of days in the rolled-up history
+    :return: list of lines
+    """
+    worked = Duration(data.values.sum() + archived)
+    if not worked:
+        return ["No time has been logged in this Timesheet yet."]
+    lines = _title("Summary of all time worked stored in Timesheet '{}':".format(name))
+    lines.append(worked.short())
+    lines.append(worked.days_hours_minutes())
+    if baseline != "":
+        string = "Summary of all time worked including baseline:"
+        lines += ["\n" + string, "-" * len(string)]
+        total = worked + Duration.parse(baseline)
+        lines.append(total.hours_minutes())
+        lines.append(total.days_hours_minutes())
+    lines.append("\nSince the creation of this Timesheet, {} individual days have been worked.".format(
+        len(data.columns.values) + rolled_days))
+    return lines
+
+
+def report_weekly(data, today, workweek):
+    """
+    All task information and their corresponding times for the current work week
+    :param data: timesheet dataframe
+    :param today: today as pendulum date
+    :param workweek: workweek hours, or "" if not set
+    :return: list of lines
+    """
+    # Only days with data are reported
+    workdays = [day for day in get_current_week_days(today) if day in data.columns]
+    tasks = data.index
+    # Get max length of tasks so that spacing works out
+    max_len = max([len(task) for task in tasks] + [0])
+    labels = ["\t{}:".format(task) + (" " * (max_len - len(task))) for task in tasks]
+    lines = _title("Current Week Report")
+    for day_string in reversed(workdays):
+        lines.append("{}, {}".format(weekday(day_string), day_string[5:]))
+        lines.append("-" * 16)  # length of Wednesday string
+        values = DurationArray(data[day_string].values)
+        # tasks with less than a minute are left out
+        for label, value, minutes in zip(labels, values, values.seconds // 60):
+            if minutes != 0:
+                lines.append(label + "\t" + value.short())
+        daily = values.sum()  # Daily sums
+        if daily.seconds >= 60:
+            lines.append("\n\tDaily Total:\t\t{}\n".format(daily.short()))
+
+    lines += ["\n------------", "Weekly Total", "------------"]
+    total = Duration(data[workdays].values.sum())
+    lines.append(total.short())
+    if total.days != 0:
+        lines.append(total.days_hours_minutes())
+
+    if type(workweek) == int:
+        if total > Duration.from_hours(workweek):
+            lines.append("Sufficient hours have been worked this week to meet the workweek requirements.")
+        else:
+            lines.append("{} still need to be worked this week in order to meet workweek requirements.".format(
+                (Duration.from_hours(workweek) - total).hours_minutes()))
+    return lines
+
+
+def _cuts_rollup(query, rollup):
+    """
+    Whether a query splits periods of the rolled-up history, whose totals are only known per period
+    """
+    cutoff, granularity = rollup["cutoff"], rollup["granularity"]
+    if query.start is not None and query.start >= cutoff:
+        return False
+    coarser = ["day"] + (["month", "year"] if granularity == "week" else ["week"])
+    if any(group in coarser for group in query.groups):
+        return True
+    bounds = [np.datetime64(query.start, "D")] if query.start is not None else []
+    if query.end is not None and query.end < cutoff:
+        bounds.append(np.datetime64(query.end, "D") + 1)
+    return any(period_starts(np.array(bounds), granularity) != np.array(bounds))
+
+
+def report_query(data, string, rollup=None):
+    """
+    Result of an ad-hoc query, see utilities.query
+    :param data: timesheet dataframe
+    :param string: query
+    :param rollup: rolled-up history (see utilities.archive.load_rollup), or None
+    :return: list of lines
+    """
+    try:
+        query = Query.parse(string)
+        if rollup is not None and rollup["totals"].shape[1] > 0:
+            data = rollup["totals"].add(data, fill_value=0).fillna(0).astype(np.int64)
+        result = query.run(data)
+    except QueryError as e:
+        return ["[ERROR] {}".format(e)]
+    lines = _title("Query: {}".format(string if string != "" else "all time"))
+    if rollup is not None and rollup["totals"].shape[1] > 0 and _cuts_rollup(query, rollup):
+        lines += ["[NOTICE] The days before {} are kept as {}ly totals, counted on the first day of each {}.".format(
+            rollup["cutoff"], rollup["granularity"], rollup["granularity"]), ""]
+    if isinstance(result, int):
+        lines.append(Duration(result).short())
+        return lines
+    if len(result) == 0:
+        lines.append("No time matches the query.")
+        return lines
+    labels = [" ".join(key) if isinstance(key, tuple) else str(key) for key in result.index]
+    width = max(len(label) for label in labels)
+    for label, value in zip(labels, DurationArray(result.values)):
+        lines.append("\t{}:{}\t{}".format(label, " " * (width - len(label)), value.short()))
+    lines.append("\n\tTotal:{}\t{}".format(" " * (max(0, width - 5)), Duration(result.values.sum()).short()))
+    return lines
+
+
+def report_trends(analytics, today, workweek, weeks=4):
+    """
+    Rolling averages, time per weekday, the balance against the workweek, and the forecast for the current week
+    :param analytics: Analytics of the Timesheet, extended up to today
+    :param today: today (YYYY-MM-DD)
+    :param workweek: workweek hours, or "" if not set
+    :param weeks: number of weeks to average over
+    :return: list of lines
+    """
+    if analytics.total() == 0:
+        return ["No time has been logged in this Timesheet yet."]
+    lines = _title("Trends")
+    rolling = analytics.rolling_weekly(weeks)
+    lines.append("Average per week over the last {} weeks:  \t{}".format(weeks, Duration(round(rolling[-1])).short()))
+    if len(rolling) > 7 * weeks:
+        lines.append("Average per week over the {} weeks before:\t{}".format(
+            weeks, Duration(round(rolling[-1 - 7 * weeks])).short()))
+
+    lines += ["\nAverage per weekday since {}:".format(analytics.start)]
+    _, averages = analytics.weekday_distribution()
+    for weekday, average in zip(WEEKDAYS, averages):
+        lines.append("\t{}:{}\t{}".format(weekday, " " * (9 - len(weekday)), Duration(round(average)).short()))
+
+    worked, projected = analytics.forecast(today, weeks)
+    string = "Forecast for this week"
+    lines += ["\n" + string, "-" * len(string)]
+    lines.append("Worked so far:{}\t{}".format(" " * 24, Duration(worked).short()))
+    lines.append("Projected by Sunday at the usual pace:\t{}".format(Duration(projected).short()))
+
+    if type(workweek) == int:
+        target = Duration.from_hours(workweek)
+        if Duration(projected) >= target:
+            lines.append("At this pace the workweek of {} hours will be met.".format(workweek))
+        else:
+            lines.append("At this pace {} will be missing to the workweek of {} hours.".format(
+                (target - Duration(projected)).hours_minutes(), workweek))
+        balance = Duration(analytics.balance(workweek)[-1])  # the last day is today
+        string = "Balance against the workweek"
+        lines += ["\n" + string, "-" * len(string)]
+        lines.append("Since {}, {} were worked and {} were expected.".format(
+            analytics.since(), Duration(analytics.total()).hours_minutes(),
+            Duration(analytics.expected(workweek)[-1]).hours_minutes()))
+        if balance.seconds >= 0:
+            lines.append("{} of overtime.".format(balance.hours_minutes()))
+        else:
+            lines.append("{} of undertime.".format(abs(balance).hours_minutes()))
+    else:
+        lines.append("\nSet the workweek hours to see the balance against the workweek.")
+    return lines
+
+
+def report_intervals(index, start, end, tz):
+    """
+    Logged intervals running at a point in time, or overlapping a range
+    :param index: IntervalIndex of the Timesheet
+    :param start: timestamp
+    :param end: timestamp, or None for the point in time start
+    :param tz: timezone to show times in
+    :return: list of lines
+    """
+    if end is None:
+        intervals = index.at(start)
+        lines = _title("Logged at {}:".format(*format_moments([start], tz)))
+    else:
+        intervals = index.overlapping(start, end)
+        lines = _title("Logged between {} and {}:".format(*format_moments([start, end], tz)))
+    if len(intervals) == 0:
+        lines.append("No logged intervals.")
+    moments = format_moments([moment for interval in intervals for moment in interval[3:]], tz)
+    for i, (task, day, seconds, first, last) in enumerate(intervals):
+        note = " (workday fill)" if index.is_fill((task, day, seconds, first, last)) else ""
+        lines.append("\t{} - {}\t{}{}\t{}".format(moments[2 * i], moments[2 * i + 1][11:], task, note,
+                                                   Duration(seconds).short()))
+    return lines
+
+
+def report_overlaps(index, tz):
+    """
+    Overlapping intervals, and workday fills that counted time twice
+    :param index: IntervalIndex of the Timesheet
+    :param tz: timezone to show times in
+    :return: list of lines
+    """
+    pairs = index.overlaps()
+    doubles = index.double_counted()
+    if len(pairs) == 0 and len(doubles) == 0:
+        return ["No overlapping intervals in {} logged intervals.".format(len(index))]
+    lines = []
+    if len(pairs) > 0:
+        lines += _title("Overlapping intervals:")
+        moments = format_moments([moment for first, second, _ in pairs for moment in first[3:] + second[3:]], tz)
+        for i, (first, second, seconds) in enumerate(pairs):
+            lines.append("\t'{}' ({} - {}) and '{}' ({} - {}):\t{}".format(
+                first[0], moments[4 * i], moments[4 * i + 1][11:], second[0], moments[4 * i + 2],
+                moments[4 * i + 3][11:], Duration(seconds).short()))
+    if len(doubles) > 0:
+        if len(lines) > 0:
+            lines.append("")
+        lines += _title("Workday time counted twice:")
+        moments = format_moments([moment for fill, _ in doubles for moment in fill[3:]], tz)
+        for i, (fill, seconds) in enumerate(doubles):
+            lines.append("\t'{}' of the workday {} - {}:\t{}".format(
+                fill[0], moments[2 * i], moments[2 * i + 1][11:], Duration(seconds).short()))
+    return lines
+
+
+def report_invoice(items, start, end):
+    """
+    Billable time and amounts per client
+    :param items: billed Tasks, see utilities.invoicing.invoice
+    :param start: first day (YYYY-MM-DD)
+    :param end: last day (YYYY-MM-DD)
+    :return: list of lines
+    """
+    if len(items) == 0:
+        return ["No billable time between {} and {}.  Tasks are only billed if they have a rate.".format(start, end)]
+    lines = _title("Invoice for {} to {}:".format(start, end))
+    several = items["sheet"].nunique() > 1
+    for client, group in items.groupby("client", sort=False):
+        lines.append("\nClient '{}'".format(client))
+        lines.append("\t{:<32}{:>10}{:>10}{:>10}{:>12}".format("Task", "Logged", "Billed", "Rate", "Amount"))
+        for item in group.itertuples():
+            task = "{}: {}".format(item.sheet, item.task) if several else item.task
+            lines.append("\t{:<32}{:>9.2f}h{:>9.2f}h{:>10.2f}{:>12.2f}".format(
+                task, item.seconds / 3600, item.billable / 3600, item.rate, item.amount))
+        lines.append("\t{:<32}{:>10}{:>9.2f}h{:>10}{:>12.2f}".format("Total", "", group["billable"].sum() / 3600, "",
+                                                                     group["amount"].sum()))
+    lines.append("\nTotal of all clients: {:.2f} for {:.2f} hours".format(items["amount"].sum(),
+                                                                          items["billable"].sum() / 3600))
+    return lines
+
+
+class ReportCache:
+    """
+    Bounded LRU cache of built reports.  Keys contain the data version of the Timesheet, so any write makes all
+    previously built reports unreachable, and they are evicted as new reports come in.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.reports = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """
+        Returns the cached report for the key, building it if needed
+        :param key: hashable key, e.g. (report name, arguments, version)
+        :param build: function building the report
+        :return: report
+        """
+        if key in self.reports:
+            self.reports.move_to_end(key)
+            self.hits += 1
+            return self.reports[key]
+        self.misses += 1
+        report = build()
+        self.reports[key] = report
+        if len(self.reports) > self.maxsize:
+            self.reports.popitem(last=False)
+        return report
+
+    def clear(self):
+        self.reports.clear()
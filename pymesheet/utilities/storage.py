@@ -0,0 +1,274 @@
+"""
+Compact on-disk format of Timesheets.
+Most cells of a Timesheet are zero, and the days are mostly consecutive, so instead of pickling the dataframe only the
+non-zero cells are stored, day by day, as varints:
+
+    header      b"PYMS", format version, codec, number of tasks, number of days
+    tasks       the task names, separated by NUL; in format 3, their ids in the task registry of the folder,
+                followed by a CRC32 of the names
+    days        the days as ordinals, each as the difference to the day before
+    counts      the number of non-zero cells of each day
+    rows        the row of each non-zero cell, as the difference to the row before on the same day
+    seconds     the seconds of each non-zero cell
+
+Differences and seconds are zigzag encoded so that negative values stay short.  Each of the five blocks is compressed
+on its own with zlib or lzma from the standard library, and stored with its length.  Encoding and decoding are
+vectorized with numpy.  Files that do not start with the magic bytes are read as pickles, so Timesheets saved before
+this format load as before.
+
+Sheets saved with a task registry (utilities.registry) store the ids of their Tasks instead of the names, as format 3;
+without one, e.g. in the chunks of encrypted sheets, where the names must not leave the encryption, format 1 is
+written.  The checksum of the names tells when a sheet is read with the registry of another folder, e.g. after it was
+copied without its '.registry'; format 2 is format 3 without the checksum.
+"""
+import lzma, os, pickle, struct, zlib
+import numpy as np
+import pandas as pd
+from utilities.layout import SECONDS_DTYPE, compact, is_compact
+from utilities.registry import TaskRegistry, RegistryError
+
+MAGIC = b"PYMS"
+FORMAT_VERSION = 3
+NAMES_VERSION = 1  # the format with the names instead of ids
+UNCHECKED_VERSION = 2  # the format with ids, without the checksum of the names
+CODECS = {"none": 0, "zlib": 1, "lzma": 2}
+HEADER = struct.Struct("<4sBBII")
+BLOCK = struct.Struct("<I")
+CHECKSUM = struct.Struct("<I")
+
+
+class StorageError(ValueError):
+    pass
+
+
+################ Varints ################
+
+def _zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def _unzigzag(values):
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def encode_varints(values):
+    """
+    LEB128 encoding of unsigned integers, 7 bits per byte, in one pass per byte position
+    :param values: array of unsigned integers
+    :return: bytes
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b""
+    lengths = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        lengths += values >= np.uint64(1) << np.uint64(7 * k)
+    offsets = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max())):
+        part = lengths > k
+        byte = (values[part] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        byte |= np.where(lengths[part] > k + 1, np.uint64(0x80), np.uint64(0))
+        out[offsets[part] + k] = byte
+    return out.tobytes()
+
+
+def decode_varints(data):
+    """
+    :param data: bytes of LEB128 encoded integers
+    :return: array of unsigned integers
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    if len(data) == 0:
+        return np.empty(0, dtype=np.uint64)
+    if data[-1] & 0x80:
+        raise StorageError("Truncated varint")
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7f).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.bitwise_or.reduceat(parts, starts)
+
+
+################ Encoding ################
+
+def _compress(payload, codec):
+    if codec == CODECS["zlib"]:
+        return zlib.compress(payload, 6)
+    elif codec == CODECS["lzma"]:
+        return lzma.compress(payload, preset=1)
+    return payload
+
+
+def _decompress(payload, codec):
+    if codec == CODECS["zlib"]:
+        return zlib.decompress(payload)
+    elif codec == CODECS["lzma"]:
+        return lzma.decompress(payload)
+    elif codec == CODECS["none"]:
+        return payload
+    raise StorageError("Unknown codec {}".format(codec))
+
+
+def encode(data, codec="zlib", registry=None):
+    """
+    Encodes a Timesheet in the compact format
+    :param data: timesheet dataframe with date strings (YYYY-MM-DD) as columns
+    :param codec: 'zlib', 'lzma', or 'none'
+    :param registry: TaskRegistry to store the ids of the Tasks with, or None to store the names
+    :return: bytes
+    """
+    if not is_compact(data):
+        data = compact(data)
+    try:
+        ordinals = pd.Index(data.columns).to_numpy(dtype=str).astype("datetime64[D]").astype(np.int64)
+    except ValueError:
+        raise StorageError("The days of the Timesheet are not dates")
+    if "\0" in "".join(map(str, data.index)):
+        raise StorageError("Task names cannot contain NUL")
+    cells = data.to_numpy().T  # column-major, so that the cells of a day are next to each other
+    days, rows = np.nonzero(cells)
+    seconds = cells[days, rows]
+    counts = np.bincount(days, minlength=len(ordinals))
+    gaps = np.diff(rows, prepend=0)
+    first = np.cumsum(counts) - counts  # first cell of every day
+    gaps[first[counts > 0]] = rows[first[counts > 0]]
+    names = "\0".join(map(str, data.index)).encode()
+    tasks = encode_varints(registry.ids(data.index)) + CHECKSUM.pack(zlib.crc32(names)) if registry is not None \
+        else names
+    blocks = [tasks,
+              encode_varints(_zigzag(np.diff(ordinals, prepend=0))),
+              encode_varints(counts),
+              encode_varints(gaps),
+              encode_varints(_zigzag(seconds))]
+    version = FORMAT_VERSION if registry is not None else NAMES_VERSION
+    out = [HEADER.pack(MAGIC, version, CODECS[codec], len(data.index), len(ordinals))]
+    for block in blocks:
+        block = _compress(block, CODECS[codec])
+        out += [BLOCK.pack(len(block)), block]
+    return b"".join(out)
+
+
+def decode(payload, registry=None):
+    """
+    Decodes a Timesheet in the compact format
+    :param payload: bytes
+    :param registry: TaskRegistry of the folder the sheet was saved in; only needed for format 2
+    :return: timesheet dataframe
+    """
+    if len(payload) < HEADER.size:
+        raise StorageError("Truncated header")
+    magic, version, codec, n_tasks, n_days = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise StorageError("Not a Timesheet")
+    if version > FORMAT_VERSION:
+        raise StorageError("Timesheet format {} is newer than this program (format {})".format(version,
+                                                                                             FORMAT_VERSION))
+    blocks, offset = [], HEADER.size
+    for _ in range(5):
+        if offset + BLOCK.size > len(payload):
+            raise StorageError("Truncated block")
+        (length,) = BLOCK.unpack_from(payload, offset)
+        offset += BLOCK.size
+        if offset + length > len(payload):
+            raise StorageError("Truncated block")
+        blocks.append(_decompress(payload[offset:offset + length], codec))
+        offset += length
+    if version == NAMES_VERSION:
+        tasks = blocks[0].decode().split("\0") if n_tasks > 0 else []
+    elif registry is None:
+        raise StorageError("The Timesheet is saved with task ids, but there is no task registry")
+    else:
+        ids, checksum = blocks[0], None
+        if version != UNCHECKED_VERSION:
+            if len(ids) < CHECKSUM.size:
+                raise StorageError("Corrupt Timesheet")
+            ids, (checksum,) = ids[:-CHECKSUM.size], CHECKSUM.unpack(ids[-CHECKSUM.size:])
+        try:
+            tasks = registry.lookup(decode_varints(ids).astype(np.int64))
+        except RegistryError:
+            tasks = None
+        if tasks is None or (checksum is not None and checksum != zlib.crc32("\0".join(map(str, tasks)).encode())):
+            raise StorageError("The task names of the Timesheet are not in '{}'; copy the '.registry' of the folder "
+                               "the Timesheet was saved in along with it".format(registry.file))
+    ordinals = np.cumsum(_unzigzag(decode_varints(blocks[1])))
+    counts = decode_varints(blocks[2]).astype(np.int64)
+    gaps = decode_varints(blocks[3]).astype(np.int64)
+    seconds = _unzigzag(decode_varints(blocks[4]))
+    if len(tasks) != n_tasks or len(ordinals) != n_days or len(counts) != n_days or \
+            len(gaps) != counts.sum() or len(seconds) != len(gaps):
+        raise StorageError("Corrupt Timesheet")
+    days = np.repeat(np.arange(n_days), counts)
+    first = np.cumsum(counts) - counts
+    cumulative = np.cumsum(gaps)  # undo the row differences, starting over on every day
+    rows = cumulative - np.repeat(cumulative[first[counts > 0]] - gaps[first[counts > 0]], counts[counts > 0])
+    if len(rows) > 0 and (rows.min() < 0 or rows.max() >= n_tasks):
+        raise StorageError("Corrupt Timesheet")
+    values = np.zeros((n_tasks, n_days), dtype=SECONDS_DTYPE)
+    values[rows, days] = seconds
+    columns = np.datetime_as_string(ordinals.astype("datetime64[D]"), unit="D").tolist()
+    return pd.DataFrame(values, index=pd.Index(tasks, dtype=object), columns=columns)
+
+
+################ Files ################
+
+def dumps(data, codec="zlib", registry=None):
+    """
+    :param data: timesheet dataframe
+    :param codec: 'zlib', 'lzma', 'none', or 'pickle' for the plain pickle
+    :param registry: TaskRegistry to store the ids of the Tasks with, or None to store the names
+    :return: bytes; a pickle if the Timesheet cannot be encoded in the compact format
+    """
+    if codec != "pickle":
+        try:
+            return encode(data, codec, registry)
+        except StorageError:
+            pass
+    return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads(payload, registry=None):
+    """
+    :param payload: bytes in the compact format, or a pickle
+    :param registry: TaskRegistry of the folder the sheet was saved in; only needed for format 2
+    :return: timesheet dataframe
+    """
+    if payload[:len(MAGIC)] == MAGIC:
+        return decode(payload, registry)
+    return pickle.loads(payload)
+
+
+def check_codec(codec):
+    """
+    :param codec: name of a codec, as set with 'storage=' in the config
+    :return: the codec
+    """
+    if codec not in CODECS and codec != "pickle":
+        raise StorageError("Unknown storage '{}', expected one of {}, pickle".format(codec, ", ".join(CODECS)))
+    return codec
+
+
+def save(path, data, codec="zlib", registry=None):
+    """
+    Saves a Timesheet.  The file is written under a temporary name and then replaces the old one, so a failed save
+    leaves the old file as it was.
+    """
+    payload = dumps(data, check_codec(codec), registry)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(payload)
+    os.replace(temporary, path)
+
+
+def load(path, registry=None):
+    """
+    :param path: path of the file
+    :param registry: TaskRegistry of the folder of the file; defaults to the registry in that folder
+    :return: timesheet dataframe
+    """
+    with open(path, "rb") as f:
+        payload = f.read()
+    if registry is None and payload[:len(MAGIC)] == MAGIC and payload[len(MAGIC)] != NAMES_VERSION:
+        registry = TaskRegistry(os.path.dirname(path))
+    return loads(payload, registry)
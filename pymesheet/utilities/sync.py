@@ -0,0 +1,265 @@
+"""
+Offline sync of Timesheets between several copies, e.g. on a laptop and a desktop.
+Every recorded interval is appended to a journal next to the Timesheet, tagged with the origin (the copy of the
+program that recorded it) and a sequence number per origin.  Syncing exchanges only the journal entries written since
+the last export, as a compressed delta file.  The journal keeps the ranges of sequence numbers it has seen per origin,
+and importing a delta applies only entries whose sequence number was not seen yet, so importing the same delta twice,
+or entries that travelled back to where they were recorded, never counts time twice, and two copies end up with the
+same totals whatever the order of the imports.
+
+Renaming Tasks and moving time between Tasks are journaled as operations next to the intervals.  An operation applies
+to the intervals before it in the journal, so the intervals read back, and every copy a delta with the operation is
+imported into, carry the Task names the operation gave them.
+
+The journal of an encrypted Timesheet is kept in its encrypted folder, every line encrypted on its own so that the
+journal stays append-only.  Delta files are not encrypted: they are meant to be carried to another copy.
+"""
+import base64, bisect, gzip, json, os, uuid
+from os.path import join as pathjoin
+
+JOURNAL_FOLDER = ".journal"
+DELTA_VERSION = 1
+
+
+def load_origin(config_path):
+    """
+    Loads the id of this copy of the program, creating it on first use
+    :param config_path: path of the config folder
+    :return: origin id
+    """
+    path = pathjoin(config_path, "origin")
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        origin = uuid.uuid4().hex
+        with open(path, "w") as f:
+            f.write(origin)
+        return origin
+
+
+def _seen(ranges, seq):
+    """
+    :param ranges: sorted list of [first, last] sequence numbers, not overlapping
+    :return: whether the sequence number is in one of the ranges
+    """
+    i = bisect.bisect_right(ranges, [seq, float("inf")]) - 1
+    return i >= 0 and ranges[i][0] <= seq <= ranges[i][1]
+
+
+def _add(ranges, seq):
+    """
+    Adds a sequence number to the ranges, merging ranges that touch
+    :param ranges: sorted list of [first, last] sequence numbers, not overlapping
+    """
+    if _seen(ranges, seq):
+        return
+    i = bisect.bisect_right(ranges, [seq, float("inf")])
+    if i > 0 and ranges[i - 1][1] == seq - 1:
+        ranges[i - 1][1] = seq
+        i -= 1
+    else:
+        ranges.insert(i, [seq, seq])
+    if i + 1 < len(ranges) and ranges[i + 1][0] == ranges[i][1] + 1:
+        ranges[i][1] = ranges.pop(i + 1)[1]
+
+
+def apply_operations(entries):
+    """
+    Applies the renames and reassignments of a journal to the intervals journaled before them
+    :param entries: journal entries, in the order of the journal
+    :return: list of the interval entries, with the Task names the operations gave them
+    """
+    intervals = []
+    for entry in entries:
+        op = entry.get("op")
+        if op is None:
+            intervals.append(entry)
+        elif op == "rename":
+            renames = entry["renames"]
+            intervals = [dict(interval, task=renames[interval["task"]]) if interval["task"] in renames else interval
+                         for interval in intervals]
+        elif op == "reassign":
+            start, end = entry["start"] or "", entry["end"] or "9999-12-31"
+            intervals = [dict(interval, task=entry["target"])
+                         if interval["task"] == entry["source"] and start <= interval["day"] <= end else interval
+                         for interval in intervals]
+    return intervals
+
+
+class Journal:
+    """
+    Append-only journal of the intervals recorded in a Timesheet, and of the operations on its Tasks
+    """
+
+    def __init__(self, path, name, origin, store=None):
+        """
+        :param path: path of the Timesheets folder
+        :param name: name of Timesheet
+        :param origin: id of this copy of the program
+        :param store: unlocked EncryptedStore of an encrypted Timesheet, or None
+        """
+        self.origin = origin
+        self.store = store
+        if store is not None:
+            self.file = pathjoin(store.folder, "journal")
+            self.state_file = pathjoin(store.folder, "journal.state")
+        else:
+            self.file = pathjoin(path, JOURNAL_FOLDER, "{}.jsonl".format(name))
+            self.state_file = pathjoin(path, JOURNAL_FOLDER, "{}.state".format(name))
+        self.name = name
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        self.clock = state.get("clock", {})  # origin -> highest sequence number known
+        # origin -> ranges of the sequence numbers known; journals from before the ranges knew every number up to
+        # their clock
+        self.seen = state.get("seen", {origin: [[1, seq]] for origin, seq in self.clock.items()})
+        self.exported = state.get("exported", 0)  # byte offset in the journal up to which it was exported
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with open(self.state_file, "w") as f:
+            json.dump({"clock": self.clock, "seen": self.seen, "exported": self.exported}, f)
+
+    def _line(self, entry):
+        line = json.dumps(entry, sort_keys=True)
+        if self.store is not None:
+            line = base64.b64encode(self.store.encrypt(line.encode(), "journal")).decode()
+        return line + "\n"
+
+    def _entry(self, line):
+        if self.store is not None:
+            line = self.store.decrypt(base64.b64decode(line), "journal").decode()
+        return json.loads(line)
+
+    def _write(self, entries):
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        with open(self.file, "a") as f:
+            for entry in entries:
+                f.write(self._line(entry))
+                self.clock[entry["origin"]] = max(self.clock.get(entry["origin"], 0), entry["seq"])
+                _add(self.seen.setdefault(entry["origin"], []), entry["seq"])
+        self._save_state()
+
+    def append(self, task, day, seconds, start, end):
+        """
+        Records an interval
+        :param task: task name
+        :param day: day the time is logged on (YYYY-MM-DD)
+        :param seconds: seconds logged
+        :param start: timestamp the interval started at
+        :param end: timestamp the interval ended at
+        :return: the journal entry
+        """
+        entry = {"origin": self.origin, "seq": self.clock.get(self.origin, 0) + 1, "task": task, "day": day,
+                 "seconds": int(seconds), "start": start, "end": end}
+        self._write([entry])
+        return entry
+
+    def _operation(self, op, **fields):
+        entry = {"origin": self.origin, "seq": self.clock.get(self.origin, 0) + 1, "op": op}
+        entry.update(fields)
+        self._write([entry])
+        return entry
+
+    def rename(self, renames):
+        """
+        Records that Tasks were renamed, or merged into other Tasks
+        :param renames: dictionary of old name to new name
+        :return: the journal entry
+        """
+        return self._operation("rename", renames=dict(renames))
+
+    def reassign(self, source, target, start=None, end=None):
+        """
+        Records that the time of a Task within a range of days was moved to another Task
+        :param source: task the time was taken from
+        :param target: task the time was given to
+        :param start: first day (YYYY-MM-DD) or None
+        :param end: last day (YYYY-MM-DD) or None
+        :return: the journal entry
+        """
+        return self._operation("reassign", source=source, target=target, start=start, end=end)
+
+    def intervals(self):
+        """
+        :return: list of the intervals of the journal, with the renames and reassignments applied
+        """
+        return apply_operations(self.entries())
+
+    def entries(self, offset=0):
+        """
+        Reads the journal, intervals and operations
+        :param offset: byte offset to start reading at
+        :return: list of entries
+        """
+        try:
+            with open(self.file, "r") as f:
+                f.seek(offset)
+                return [self._entry(line) for line in f if line.strip() != ""]
+        except FileNotFoundError:
+            return []
+
+    def export(self, delta_path):
+        """
+        Writes all entries since the last export to a delta file.  Only the new part of the journal is read.
+        :param delta_path: path of the delta file
+        :return: number of exported entries
+        """
+        entries = self.entries(self.exported)
+        with gzip.open(delta_path, "wt") as f:
+            f.write(json.dumps({"version": DELTA_VERSION, "sheet": self.name, "origin": self.origin}) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+        self.exported = os.path.getsize(self.file) if os.path.exists(self.file) else 0
+        self._save_state()
+        return len(entries)
+
+    def read_delta(self, delta_path):
+        """
+        Reads the entries of a delta file that are not in this journal yet
+        :param delta_path: path of the delta file
+        :return: header of the delta file, and list of new entries
+        """
+        with gzip.open(delta_path, "rt") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != DELTA_VERSION:
+                raise ValueError("Unsupported delta file version {}".format(header.get("version")))
+            entries = [json.loads(line) for line in f if line.strip() != ""]
+        seen = {origin: [list(r) for r in ranges] for origin, ranges in self.seen.items()}
+        new = []
+        for entry in sorted(entries, key=lambda e: (e["origin"], e["seq"])):
+            ranges = seen.setdefault(entry["origin"], [])
+            if not _seen(ranges, entry["seq"]):
+                _add(ranges, entry["seq"])
+                new.append(entry)
+        return header, new
+
+    def move_to(self, store):
+        """
+        Moves the journal of a Timesheet that was just encrypted into its encrypted folder
+        :param store: unlocked EncryptedStore of the Timesheet
+        :return: the journal in the encrypted folder
+        """
+        journal = Journal(None, self.name, self.origin, store)
+        entries = self.entries()
+        journal._write(entries)
+        if self.exported > 0 and self.exported >= (os.path.getsize(self.file) if os.path.exists(self.file) else 0):
+            journal.exported = os.path.getsize(journal.file) if entries else 0
+        journal.seen = {origin: [list(r) for r in ranges] for origin, ranges in self.seen.items()}
+        journal.clock = dict(self.clock)
+        journal._save_state()
+        for file in [self.file, self.state_file]:
+            if os.path.exists(file):
+                os.remove(file)
+        return journal
+
+    def accept(self, entries):
+        """
+        Adds entries of another copy to this journal, after they were applied to the Timesheet
+        :param entries: list of entries from read_delta
+        """
+        self._write(entries)
@@ -0,0 +1,85 @@
+"""
+Batch operations on the Tasks of a Timesheet.
+Each operation is a single vectorized change of the dataframe, however many tasks it touches, so that a batch can be
+saved with one write.
+"""
+import pandas as pd
+from utilities.layout import SECONDS_DTYPE
+
+
+def parse_names(string):
+    """
+    Splits a comma separated list of task names
+    :param string: e.g. 'a, b/c, d'
+    :return: list of names without duplicates, in order
+    """
+    names = [name.strip() for name in string.split(",")]
+    return list(dict.fromkeys(name for name in names if name != ""))
+
+
+def parse_renames(string):
+    """
+    Parses a comma separated list of renames
+    :param string: e.g. 'old=new, other=new'
+    :return: dictionary of old name to new name
+    """
+    renames = {}
+    for pair in string.split(","):
+        if pair.strip() == "":
+            continue
+        if "=" not in pair:
+            raise ValueError("'{}' is not of the form old=new".format(pair.strip()))
+        old, new = pair.split("=", 1)
+        if old.strip() == "" or new.strip() == "":
+            raise ValueError("'{}' is not of the form old=new".format(pair.strip()))
+        renames[old.strip()] = new.strip()
+    return renames
+
+
+def delete_tasks(data, tasks):
+    """
+    :param data: timesheet dataframe
+    :param tasks: list of task names in the data
+    :return: dataframe without the tasks
+    """
+    return data.drop(index=tasks)
+
+
+def rename_tasks(data, renames):
+    """
+    Renames tasks.  Tasks renamed to the same name, or to the name of an existing task, are merged by adding up their
+    time.
+    :param data: timesheet dataframe
+    :param renames: dictionary of old name to new name
+    :return: dataframe with the renamed tasks
+    """
+    index = data.index.map(lambda task: renames.get(task, task))
+    if index.is_unique:
+        renamed = data.copy()
+        renamed.index = index
+        return renamed
+    return data.groupby(index, sort=False).sum().astype(SECONDS_DTYPE)
+
+
+def reassign_time(data, source, target, start=None, end=None):
+    """
+    Moves all time of one task to another task within a date range
+    :param data: timesheet dataframe
+    :param source: task to take the time from
+    :param target: task to give the time to (must exist)
+    :param start: first day (YYYY-MM-DD) or None
+    :param end: last day (YYYY-MM-DD) or None
+    :return: dataframe with the moved time, and the number of seconds moved
+    """
+    days = pd.Index(data.columns.astype(str))
+    columns = pd.Series(True, index=days)
+    if start is not None:
+        columns &= days >= start
+    if end is not None:
+        columns &= days <= end
+    columns = columns.values
+    moved = data.loc[source, columns]
+    data = data.copy()
+    data.loc[target, columns] += moved.values
+    data.loc[source, columns] = 0
+    return data, int(moved.sum())
@@ -0,0 +1,89 @@
+"""
+Roll-up totals for hierarchical Task names.
+Tasks named like 'client/project/subtask' are nodes of a tree, and every node keeps the total seconds of itself and
+all Tasks below it.  Recording time updates the totals along the path of ancestors, so a summary of any level of the
+tree is a single lookup instead of a scan over the Timesheet.
+"""
+
+SEPARATOR = "/"
+
+
+def ancestors(task):
+    """
+    Returns the paths from the root down to the task itself, e.g. 'a/b/c' -> ['', 'a', 'a/b', 'a/b/c']
+    :param task: task name
+    :return: list of paths
+    """
+    parts = task.split(SEPARATOR)
+    return [""] + [SEPARATOR.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+class TaskTree:
+    """
+    Maintains roll-up totals (in seconds) for every node of the Task hierarchy.  The root node is ''.
+    """
+
+    def __init__(self):
+        self.totals = {"": 0}
+        self.children = {"": set()}
+
+    @classmethod
+    def build(cls, task_totals):
+        """
+        Builds a tree from the total seconds of each task
+        :param task_totals: iterable of (task name, seconds) pairs
+        :return: TaskTree
+        """
+        tree = cls()
+        for task, seconds in task_totals:
+            tree.add(task, seconds)
+        return tree
+
+    def __contains__(self, path):
+        return path.strip(SEPARATOR) in self.totals and path.strip(SEPARATOR) != ""
+
+    def add(self, task, seconds=0):
+        """
+        Adds time to a task and all its ancestors, creating the nodes if needed.  O(depth).
+        :param task: task name
+        :param seconds: seconds to add (negative to remove time)
+        """
+        path = ancestors(task.strip(SEPARATOR))
+        for parent, node in zip(path[:-1], path[1:]):
+            if node not in self.totals:
+                self.totals[node] = 0
+                self.children[node] = set()
+                self.children[parent].add(node)
+        for node in path:
+            self.totals[node] += int(seconds)
+
+    def remove(self, task):
+        """
+        Removes a task (and everything below it) from the tree, subtracting its time from the ancestors
+        :param task: task name
+        """
+        task = task.strip(SEPARATOR)
+        if task in self:
+            self.add(task, -self.totals[task])
+            stack = [task]
+            while stack:
+                node = stack.pop()
+                stack.extend(self.children.pop(node))
+                del self.totals[node]
+            self.children[ancestors(task)[-2]].discard(task)
+
+    def total(self, path):
+        """
+        Returns the roll-up total of a node
+        :param path: task name or partial path
+        :return: seconds, 0 if the path is unknown
+        """
+        return self.totals.get(path.strip(SEPARATOR), 0)
+
+    def subtasks(self, path):
+        """
+        Returns the direct children of a node with their roll-up totals
+        :param path: task name or partial path
+        :return: list of (child name, seconds), sorted by name
+        """
+        return [(child, self.totals[child]) for child in sorted(self.children.get(path.strip(SEPARATOR), ()))]
@@ -16,19 +16,3 @@ def get_current_week_days(today):
         new_day = today.subtract(days=day)
         days.append(new_day)
     return [d.to_date_string() for d in days]
-
-
-def generate_day_dict(days, tasks):
-    """
-    Creates a dictionary of days as keys and values as dictionaries of tasks with keys as empty lists
-    :param days: days to use as keys
-    :param tasks: tasks to use in the inner dicts
-    :return: dictionary
-    """
-    day_dict = {}
-    task_dict = {}
-    for task in tasks:
-        task_dict[task] = []
-    for day in days:
-        day_dict[day] = task_dict.copy()
-    return day_dict